@@ -0,0 +1,345 @@
+"""
+Benchmark end-to-end tanpa strava.com dan tanpa MySQL produksi.
+
+- Server HTTP lokal menyajikan halaman contoh di bench/fixtures/ dengan
+  latensi yang bisa diatur:
+      /athletes/<id>    athlete_feed.html / athlete_next.html / athlete_private.html
+      /activities/<id>  activity_next.html (id genap) / activity_legacy.html (id ganjil)
+- Pengganti database: koneksi palsu yang meniru begin/executemany/commit
+  pymysql dengan latensi per round-trip (tanpa jaringan/tunnel).
+
+Tahap yang diukur: recent_activity_ids, get_activity_payload, save_activity.
+Dengan `--driver none` Chrome tidak dipakai: halaman diambil lewat urllib dan
+diekstrak dengan jalur statis (profile_ids_from_html / payload_from_html),
+sama seperti engine HTTP.
+
+    python bench/bench_e2e.py --athletes 50 --latency-ms 80 --out hasil.json
+    python bench/bench_e2e.py --driver none --baseline hasil.json
+
+Dengan `--baseline`, p50 tiap tahap dibandingkan dengan hasil sebelumnya dan
+skrip keluar dengan kode 1 bila ada yang lebih lambat dari `--tolerance`.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:          # Windows
+    resource = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import scrape_strava_db_split as scraper  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+STAGES = ("recent_activity_ids", "get_activity_payload", "save_activity")
+
+
+# ───────── server Strava tiruan ─────────
+def _load_fixtures() -> Dict[str, bytes]:
+    pages = {}
+    for name in ("athlete_feed", "athlete_next", "athlete_private", "activity_next", "activity_legacy"):
+        with open(os.path.join(FIXTURES, f"{name}.html"), "rb") as f:
+            pages[name] = f.read()
+    return pages
+
+def athlete_page(ath_id: int, private_every: int) -> str:
+    if private_every and ath_id % private_every == 0:
+        return "athlete_private"
+    return "athlete_feed" if ath_id % 2 else "athlete_next"
+
+def make_server(latency: float, private_every: int) -> ThreadingHTTPServer:
+    pages = _load_fixtures()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = self.path.split("?")[0].strip("/").split("/")
+            name = None
+            if len(parts) == 2 and parts[1].isdigit():
+                if parts[0] == "athletes":
+                    name = athlete_page(int(parts[1]), private_every)
+                elif parts[0] == "activities":
+                    name = "activity_legacy" if int(parts[1]) % 2 else "activity_next"
+            if latency:
+                time.sleep(latency)
+            if name is None:
+                self.send_error(404)
+                return
+            body = pages[name]
+            if parts[0] == "athletes":
+                # fixture feed ditulis untuk atlet 90000001; sesuaikan pemiliknya
+                body = body.replace(b"90000001", parts[1].encode())
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *a):
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+# ───────── pengganti MySQL ─────────
+class FakeCursor:
+    def __init__(self, conn: "FakeConn"):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        self.conn.round_trip()
+
+    def executemany(self, sql, rows):
+        self.conn.round_trip()
+        if "INSERT INTO strava_activities" in sql:
+            self.conn.n_upserts += len(rows)
+        for row in rows:
+            self.conn.rows[row[0]] = row
+
+    def close(self):
+        pass
+
+class FakeConn:
+    """Meniru API pymysql yang dipakai save_activities(); tiap panggilan = satu round-trip."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.rows: Dict[Any, tuple] = {}      # per activity_id (baris terakhir)
+        self.n_upserts = 0                     # baris upsert yang benar-benar dieksekusi
+
+    def round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def begin(self):
+        self.round_trip()
+
+    def commit(self):
+        self.round_trip()
+
+    def rollback(self):
+        self.round_trip()
+
+    def close(self):
+        pass
+
+
+# ───────── driver ─────────
+class UrlFetcher:
+    """--driver none: ambil HTML mentah lewat urllib (jalur statis, tanpa JavaScript)."""
+
+    def fetch(self, url: str) -> str:
+        with urllib.request.urlopen(url, timeout=30) as r:
+            return r.read().decode("utf-8")
+
+def stage_athlete(drv, ath_id: str, args) -> List[str]:
+    if drv is None:
+        html = UrlFetcher().fetch(f"{scraper.STRAVA_URL}/athletes/{ath_id}")
+        scraper._check_profile(html)
+        items = scraper.profile_ids_from_html(html, args.per_athlete, athlete_id=ath_id) or []
+    else:
+        items = scraper.recent_activity_ids(drv, ath_id, limit=args.per_athlete, wait=args.wait)
+    return [it.act_id for it in items]
+
+def stage_activity(drv, act_id: str, args) -> Dict[str, Any]:
+    if drv is None:
+        return scraper.payload_from_html(UrlFetcher().fetch(f"{scraper.STRAVA_URL}/activities/{act_id}"))
+    drv.get(f"{scraper.STRAVA_URL}/activities/{act_id}")
+    return scraper.get_activity_payload(drv, act_id, wait=args.wait, use_cdp=False)
+
+
+# ───────── laporan ─────────
+def peak_rss_kb() -> Dict[str, Optional[int]]:
+    if resource is None:
+        return {"self": None, "children": None}
+    scale = 1024 if sys.platform == "darwin" else 1      # macOS: byte, Linux: KB
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale,
+    }
+
+def current_rss_kb() -> Optional[int]:
+    """RSS proses benchmark saat ini (psutil, atau /proc di Linux)."""
+    if scraper.psutil is not None:
+        return scraper.psutil.Process().memory_info().rss // 1024
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class StageMemory:
+    """
+    RSS sebelum/sesudah tiap tahap (proses + Chrome bila psutil ada):
+    total kenaikan dan nilai tertinggi per tahap. Sampling di luar timer.
+    """
+
+    def __init__(self, stats: scraper.Stats, drv=None):
+        self.stats = stats
+        self.drv = drv
+        self.grow_kb: Dict[str, int] = {}
+        self.peak_kb: Dict[str, int] = {}
+
+    def sample(self) -> Optional[int]:
+        rss = current_rss_kb()
+        if rss is not None and self.drv is not None:
+            rss += int((scraper.driver_rss_mb(self.drv) or 0) * 1024)
+        return rss
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        before = self.sample()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stats.observe(name, time.perf_counter() - t0)
+            after = self.sample()
+            if before is not None and after is not None:
+                self.grow_kb[name] = self.grow_kb.get(name, 0) + after - before
+                self.peak_kb[name] = max(self.peak_kb.get(name, 0), after)
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+def summarize(stats: scraper.Stats, wall: float, mem: StageMemory) -> Dict[str, Dict[str, float]]:
+    out = {}
+    for stage in STAGES:
+        n = stats.count(stage)
+        if not n:
+            continue
+        v = sorted(stats.values(stage))
+        out[stage] = {
+            "n": n,
+            "p50_ms": stats._pct(v, .5) * 1e3,
+            "p95_ms": stats._pct(v, .95) * 1e3,
+            "per_s": n / wall,
+            "rss_grow_kb": mem.grow_kb.get(stage),
+            "rss_peak_kb": mem.peak_kb.get(stage),
+        }
+    return out
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> bool:
+    print(f"[i] Dibanding baseline {baseline.get('commit') or '?'} (toleransi {tolerance:.0%}):")
+    ok = True
+    for stage, cur in result["stages"].items():
+        old = baseline.get("stages", {}).get(stage)
+        if not old or not old.get("p50_ms"):
+            continue
+        delta = cur["p50_ms"] / old["p50_ms"] - 1
+        flag = "REGRESI" if delta > tolerance else ""
+        ok = ok and not flag
+        print(f"    {stage:<22} p50 {old['p50_ms']:8.1f} → {cur['p50_ms']:8.1f} ms ({delta:+.0%}) {flag}")
+    return ok
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser("Benchmark end-to-end dengan server Strava tiruan")
+    ap.add_argument("--athletes", type=int, default=20)
+    ap.add_argument("--per-athlete", type=int, default=2)
+    ap.add_argument("--latency-ms", type=float, default=50, help="Latensi tiap respons server tiruan.")
+    ap.add_argument("--db-latency-ms", type=float, default=5, help="Latensi tiap round-trip DB tiruan.")
+    ap.add_argument("--private-every", type=int, default=10, help="Tiap atlet ke-N profilnya privat (0 = tidak ada).")
+    ap.add_argument("--driver", choices=("chrome", "none"), default="chrome")
+    ap.add_argument("--chrome-binary", help="Path Chrome custom.")
+    ap.add_argument("--lean", action="store_true", help="Chrome dengan profil --lean (eager + blocklist default).")
+    ap.add_argument("--wait", type=int, default=10)
+    ap.add_argument("--out", help="Simpan hasil (JSON).")
+    ap.add_argument("--baseline", help="Hasil JSON sebelumnya untuk deteksi regresi.")
+    ap.add_argument("--tolerance", type=float, default=0.10, help="Batas kenaikan p50 sebelum dianggap regresi.")
+    args = ap.parse_args()
+
+    srv = make_server(args.latency_ms / 1e3, args.private_every)
+    scraper.STRAVA_URL = f"http://127.0.0.1:{srv.server_address[1]}"
+    conn = FakeConn(args.db_latency_ms / 1e3)
+    stats = scraper.Stats()
+
+    drv = None
+    if args.driver == "chrome":
+        drv = scraper.build_chrome(
+            headless=True, profile=None, chrome_bin=args.chrome_binary,
+            blocklist=scraper.LEAN_BLOCKLIST if args.lean else None,
+        )
+
+    mem = StageMemory(stats, drv)
+    athletes = [str(90000001 + i) for i in range(args.athletes)]
+    print(f"[i] Server tiruan {scraper.STRAVA_URL}, driver={args.driver}, {len(athletes)} atlet")
+    t_start = time.perf_counter()
+    try:
+        for ath_id in athletes:
+            ids: List[str] = []
+            with mem.stage("recent_activity_ids"):
+                try:
+                    ids = stage_athlete(drv, ath_id, args)
+                except scraper.ScrapeError:
+                    pass
+            for act_id in ids:
+                with mem.stage("get_activity_payload"):
+                    payload = stage_activity(drv, act_id, args)
+                if not payload:
+                    continue
+                with mem.stage("save_activity"):
+                    scraper.save_activity(conn, ath_id, act_id, payload)
+    finally:
+        if drv is not None:
+            drv.quit()
+        srv.shutdown()
+    wall = time.perf_counter() - t_start
+
+    n_pages = stats.count("recent_activity_ids") + stats.count("get_activity_payload")
+    rss = peak_rss_kb()                       # sebelum `git rev-parse` ikut terhitung sebagai child
+    result = {
+        "commit": git_commit(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+        "wall_s": wall,
+        "pages_per_s": n_pages / wall if wall else 0.0,
+        "rows_saved": conn.n_upserts,
+        "rows_distinct": len(conn.rows),
+        "stages": summarize(stats, wall, mem),
+        "peak_rss_kb": rss,
+    }
+
+    print(f"[i] {n_pages} halaman dalam {wall:.1f}s = {result['pages_per_s']:.2f} halaman/s, "
+          f"{result['rows_saved']} upsert ({result['rows_distinct']} activity_id unik)")
+    for stage, s in result["stages"].items():
+        mem_txt = ""
+        if s["rss_peak_kb"] is not None:
+            mem_txt = f" RSS {s['rss_grow_kb'] / 1024:+.1f} MB (puncak {s['rss_peak_kb'] / 1024:.0f} MB)"
+        print(f"    {stage:<22} n={s['n']:<5} p50={s['p50_ms']:8.1f}ms p95={s['p95_ms']:8.1f}ms{mem_txt}")
+    if rss["self"] is not None:
+        print(f"[i] Peak RSS: proses {rss['self'] / 1024:.0f} MB, child {rss['children'] / 1024:.0f} MB")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"[i] Hasil disimpan ke {args.out}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            if not compare(result, json.load(f), args.tolerance):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Microbenchmark biaya parse per halaman aktivitas.
+
+Membandingkan cara lama (dua pohon BeautifulSoup html.parser + regex
+<time> di seluruh page_source) dengan scan_page() (satu parse, satu jalan
+di pohon dokumen), dan memastikan hasil keduanya identik.
+
+    python bench/bench_extract.py [--repeat 200] [halaman.html ...]
+"""
+from __future__ import annotations
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import scrape_strava_db_split as scraper  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def legacy_extract(html: str) -> Dict[str, Any]:
+    """Alur lama get_activity_payload untuk bagian berbasis HTML."""
+    soup = BeautifulSoup(html, "html.parser")              # parse #1
+    data: Dict[str, Any] = {}
+    sc = soup.find("script", id="__NEXT_DATA__")
+    if sc and sc.string:
+        try:
+            data = scraper.json.loads(scraper._sanitize(sc.string))
+        except Exception:
+            data = {}
+    act = dict(data.get("props", {}).get("pageProps", {}).get("activity", {}))
+    if not act:
+        act = scraper._extract_data_from_legacy_scripts(html)
+
+    page: Dict[str, Any] = {"next_data": data, "time": None, "title": None, "elapsed": None, "pace": None}
+    m = re.search(r'<time[^>]*>\s*([^<]+?)\s*</time>', html, re.I)
+    if m:
+        page["time"] = m.group(1).strip()
+    soup = BeautifulSoup(html, "html.parser")              # parse #2
+    span = soup.select_one("span.title")
+    page["title"] = span.text if span else None
+    lab = soup.find("span", string=re.compile("Elapsed Time", re.I))
+    if lab:
+        strong = lab.find_parent().find_next("strong")
+        page["elapsed"] = strong.text.strip() if strong else None
+    lab = soup.find("span", string=re.compile(r"\bPace\b", re.I))
+    if lab:
+        strong = lab.find_previous("strong")
+        page["pace"] = strong.text.strip() if strong else None
+    scraper._fill_page_fields(act, page)
+    return act
+
+
+def single_pass_extract(html: str) -> Dict[str, Any]:
+    page = scraper.scan_page(html)
+    act = dict(page["next_data"].get("props", {}).get("pageProps", {}).get("activity", {}))
+    if not act:
+        act = scraper._extract_data_from_legacy_scripts(html)
+    scraper._fill_page_fields(act, page)
+    return act
+
+
+def _time_per_page(fn: Callable[[str], Any], html: str, repeat: int) -> float:
+    fn(html)                                                 # warm-up
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(html)
+    return (time.perf_counter() - t0) / repeat
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser("Benchmark ekstraksi halaman aktivitas")
+    ap.add_argument("pages", nargs="*", help="File HTML (default: bench/fixtures/activity_*.html).")
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    pages: List[str] = args.pages or sorted(glob.glob(os.path.join(FIXTURES, "activity_*.html")))
+    backend = "lxml" if scraper.lxml_html is not None else "html.parser"
+    print(f"[i] scan_page backend: {backend}, repeat={args.repeat}")
+    print(f"    {'halaman':<28} {'KB':>6} {'lama (ms)':>10} {'baru (ms)':>10} {'speedup':>8}")
+    for path in pages:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        if legacy_extract(html) != single_pass_extract(html):
+            sys.exit(f"[!] Hasil berbeda untuk {path}")
+        old = _time_per_page(legacy_extract, html, args.repeat)
+        new = _time_per_page(single_pass_extract, html, args.repeat)
+        print(
+            f"    {os.path.basename(path):<28} {len(html) / 1024:6.1f} "
+            f"{old * 1e3:10.3f} {new * 1e3:10.3f} {old / new:7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
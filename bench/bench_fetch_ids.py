@@ -0,0 +1,167 @@
+"""
+Benchmark query daftar atlet: UNION ALL lama (5 scan, tanpa DISTINCT,
+hanya jersey_data[0..4]) vs JSON_TABLE + DISTINCT + server-side cursor,
+lewat fungsi yang dipanggil main(): fetch_strava_ids (list, untuk shard /
+jadwal / incremental) dan stream_strava_ids (default: array ringkas).
+
+Membuat tabel sintetis `bench_orders` / `bench_users` (default 1 juta order)
+di database tujuan, lalu mengukur waktu, jumlah baris dan jumlah ID unik.
+Butuh MySQL 8.0+ (JSON_TABLE).
+
+    python bench/bench_fetch_ids.py --host 127.0.0.1 --user root --password x --database bench
+    python bench/bench_fetch_ids.py --tunnel          # lewat SSH_CFG / DB_BASE_CFG skrip utama
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from contextlib import ExitStack
+
+import pymysql as mysql
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import scrape_strava_db_split as scraper  # noqa: E402
+
+ORDERS = "bench_orders"
+USERS = "bench_users"
+
+# Query lama fetch_strava_ids(), disalin apa adanya untuk pembanding.
+LEGACY_SQL = " UNION ALL ".join(
+    f"""
+    SELECT o.id AS order_id,
+           JSON_UNQUOTE(JSON_EXTRACT(o.jersey_data,'$[{i}].id')) AS user_id
+    FROM   {ORDERS} o
+    WHERE  o.status = 'paid'"""
+    for i in range(5)
+)
+LEGACY_SQL = f"""
+    WITH jersey_ids AS ({LEGACY_SQL})
+    SELECT u.strava_id
+    FROM   jersey_ids ji
+    JOIN   {USERS} u ON u.id = ji.user_id
+    WHERE  ji.user_id IS NOT NULL
+          AND u.strava_id IS NOT NULL
+"""
+
+
+def generate(conn, n_orders: int, n_users: int, seed: int) -> None:
+    rnd = random.Random(seed)
+    cur = conn.cursor()
+    cur.execute(f"DROP TABLE IF EXISTS {ORDERS}")
+    cur.execute(f"DROP TABLE IF EXISTS {USERS}")
+    cur.execute(f"""
+        CREATE TABLE {USERS} (
+          id INT UNSIGNED NOT NULL PRIMARY KEY,
+          strava_id BIGINT UNSIGNED NULL
+        ) ENGINE=InnoDB""")
+    cur.execute(f"""
+        CREATE TABLE {ORDERS} (
+          id INT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+          status VARCHAR(20) NOT NULL,
+          jersey_data JSON NULL,
+          KEY status (status)
+        ) ENGINE=InnoDB""")
+
+    t0 = time.perf_counter()
+    users = [(uid, None if rnd.random() < 0.1 else 10_000_000 + uid) for uid in range(1, n_users + 1)]
+    for i in range(0, len(users), 10_000):
+        cur.executemany(f"INSERT INTO {USERS} (id, strava_id) VALUES (%s,%s)", users[i:i + 10_000])
+
+    batch = []
+    for _ in range(n_orders):
+        # 1-8 jersey per order, sebagian besar 1-2; sebagian user memesan berulang
+        n_j = min(8, max(1, int(rnd.expovariate(0.8)) + 1))
+        jerseys = [{"id": rnd.randint(1, n_users), "size": rnd.choice("SMLX")} for _ in range(n_j)]
+        status = "paid" if rnd.random() < 0.7 else rnd.choice(("pending", "cancelled"))
+        batch.append((status, json.dumps(jerseys)))
+        if len(batch) >= 5_000:
+            cur.executemany(f"INSERT INTO {ORDERS} (status, jersey_data) VALUES (%s,%s)", batch)
+            batch.clear()
+    if batch:
+        cur.executemany(f"INSERT INTO {ORDERS} (status, jersey_data) VALUES (%s,%s)", batch)
+    conn.commit()
+    cur.close()
+    print(f"[i] Data sintetis: {n_orders} order, {n_users} user ({time.perf_counter() - t0:.1f}s)")
+
+
+def run_legacy(conn):
+    cur = conn.cursor()
+    cur.execute(LEGACY_SQL)
+    ids = [str(r["strava_id"]) for r in cur.fetchall()]
+    cur.close()
+    return ids
+
+
+def run_list(conn):
+    return scraper.fetch_strava_ids(conn, orders=ORDERS, users=USERS)
+
+
+def run_stream(conn):
+    # jalur default main(): db_call pada koneksi biasa = fn(conn)
+    return scraper.stream_strava_ids(conn, orders=ORDERS, users=USERS)
+
+
+def held_bytes(ids) -> int:
+    """Perkiraan memori yang ditahan daftar ID selama run."""
+    if isinstance(ids, list):
+        return sys.getsizeof(ids) + sum(sys.getsizeof(i) for i in ids)
+    return ids[0].buffer_info()[1] * ids[0].itemsize + sum(sys.getsizeof(i) for i in ids[1])
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser("Benchmark fetch_strava_ids")
+    ap.add_argument("--tunnel", action="store_true", help="Pakai SSH tunnel + DB_BASE_CFG skrip utama.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=3306)
+    ap.add_argument("--user", default="root")
+    ap.add_argument("--password", default="")
+    ap.add_argument("--database", default="bench")
+    ap.add_argument("--orders", type=int, default=1_000_000)
+    ap.add_argument("--users", type=int, default=200_000)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--reuse", action="store_true", help="Jangan generate ulang tabel bench_*.")
+    ap.add_argument("--keep", action="store_true", help="Jangan hapus tabel bench_* setelah selesai.")
+    args = ap.parse_args()
+
+    with ExitStack() as stack:
+        if args.tunnel:
+            tunnel = stack.enter_context(scraper.open_tunnel())
+            conn = scraper.db_connect(tunnel)
+        else:
+            conn = mysql.connect(
+                host=args.host, port=args.port, user=args.user, password=args.password,
+                database=args.database, charset="utf8mb4", cursorclass=mysql.cursors.DictCursor,
+            )
+        stack.callback(conn.close)
+
+        if not args.reuse:
+            generate(conn, args.orders, args.users, args.seed)
+
+        for name, fn in (
+            ("lama (UNION ALL x5)", run_legacy),
+            ("baru list", run_list),
+            ("baru stream", run_stream),
+        ):
+            t0 = time.perf_counter()
+            ids = list(fn(conn))
+            sec = time.perf_counter() - t0
+            if fn is run_stream:
+                # yang ditahan generator selama run: array ringkas + sisa non-angka
+                held = held_bytes(scraper.fetch_strava_ids_compact(conn, orders=ORDERS, users=USERS))
+            else:
+                held = held_bytes(ids)
+            print(f"    {name:<22} {sec:7.2f}s  baris={len(ids):<9} unik={len(set(ids)):<9} "
+                  f"memori={held / 1e6:.1f} MB")
+
+        if not args.keep:
+            cur = conn.cursor()
+            cur.execute(f"DROP TABLE IF EXISTS {ORDERS}")
+            cur.execute(f"DROP TABLE IF EXISTS {USERS}")
+            cur.close()
+
+
+if __name__ == "__main__":
+    main()
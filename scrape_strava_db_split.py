@@ -1,22 +1,45 @@
 from __future__ import annotations
 import argparse
+import asyncio
+import bisect
+import gzip
+import hashlib
+import itertools
 import json
+import multiprocessing
 import os
+import random
 import re
+import shutil
+import socket
+import sqlite3
 import sys
+import tempfile
+import threading
 import time
+import uuid
+import zlib
 import datetime as dt
 from tqdm import tqdm
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 from mysql.connector import Error
 from bs4 import BeautifulSoup
+try:
+    import lxml.html as lxml_html
+    from lxml import etree as lxml_etree
+except ImportError:          # opsional; tanpa lxml scan_page memakai html.parser
+    lxml_html = None
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import InvalidSessionIdException, NoSuchWindowException, TimeoutException
 from sshtunnel import SSHTunnelForwarder, BaseSSHTunnelForwarderError
-from contextlib import contextmanager
-from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Konfigurasi & helper MySQL
@@ -33,6 +56,8 @@ SSH_CFG = dict(
     host_pkey_directories=[],
 )
 
+STRAVA_URL = "https://www.strava.com"
+
 DB_BASE_CFG = dict(
     user="...",
     password="...",          
@@ -75,59 +100,232 @@ def db_connect(tunnel: SSHTunnelForwarder):
     except Error as e:
         sys.exit(f"[DB] Gagal koneksi: {e}")
 
-def fetch_strava_ids(conn) -> List[str]:
+# Kode MySQL yang berarti koneksi/tunnel putus atau konflik lock sesaat:
+# 2003 tak bisa konek, 2006 server gone away, 2013/2055 koneksi hilang saat
+# query, 1205 lock wait timeout, 1213 deadlock. Aman di-retry karena semua
+# tulisan skrip ini idempoten (upsert / INSERT IGNORE / UPDATE). Error data /
+# skema (1054 kolom tak dikenal, 1292 nilai salah, ...) juga bisa berupa
+# OperationalError di pymysql, tapi tak akan sembuh dengan retry → langsung dilempar.
+_DB_RETRY_CODES = frozenset({2003, 2006, 2013, 2055, 1205, 1213})
+
+def db_retryable(e: BaseException) -> bool:
+    """True bila error berarti koneksi putus / lock sesaat (bukan salah data)."""
+    if isinstance(e, (mysql.err.InterfaceError, OSError, EOFError)):
+        return True
+    return isinstance(e, mysql.err.OperationalError) and bool(e.args) and e.args[0] in _DB_RETRY_CODES
+
+class DbPool:
+    """
+    Pool kecil koneksi pymysql di atas SATU SSH tunnel, aman dipakai banyak
+    thread. Koneksi yang lama menganggur di-ping sebelum dipinjam. Bila
+    MySQL atau tunnel putus di tengah run, tunnel dibuka ulang (restart),
+    koneksi dibangun lagi dan pemanggilan di-retry dengan backoff
+    eksponensial, jadi tulisan yang tertunda tidak hilang.
+    """
+
+    def __init__(
+        self,
+        tunnel: SSHTunnelForwarder,
+        size: int = 4,
+        *,
+        ping_after: float = 30.0,
+        max_retry: int = 8,
+        max_backoff: float = 60.0,
+    ):
+        self.tunnel = tunnel
+        self.size = max(1, size)
+        self.ping_after = ping_after
+        self.max_retry = max_retry
+        self.max_backoff = max_backoff
+        self._idle: Deque[Tuple[Any, float]] = deque()
+        self._n_open = 0
+        self._cond = threading.Condition()
+        self._tunnel_lock = threading.Lock()
+        self._closed = False
+
+    # ── tunnel & koneksi ───────────────────────────────────────────
+    def _ensure_tunnel(self) -> None:
+        with self._tunnel_lock:
+            try:
+                self.tunnel.check_tunnels()
+                if self.tunnel.is_active and all(self.tunnel.tunnel_is_up.values()):
+                    return
+            except Exception:
+                pass
+            print("[SSH] Tunnel putus, membuka ulang …", file=sys.stderr)
+            STATS.incr("ssh.restart")
+            try:
+                self.tunnel.restart()
+                print(f"[SSH] Tunnel siap di localhost:{self.tunnel.local_bind_port}")
+            except Exception as e:
+                print(f"[SSH] Gagal membuka ulang tunnel: {e}", file=sys.stderr)
+
+    def connect(self):
+        """Koneksi baru (di luar pool) lewat port tunnel saat ini."""
+        conn = mysql.connect(host="127.0.0.1", port=self.tunnel.local_bind_port, **DB_BASE_CFG)
+        conn.autocommit(True)
+        return conn
+
+    def _acquire(self):
+        conn = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("DbPool sudah ditutup")
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    break
+                if self._n_open < self.size:
+                    self._n_open += 1
+                    idle_since = None
+                    break
+                self._cond.wait()
+        if conn is not None and time.monotonic() - idle_since > self.ping_after:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                self._discard(conn)
+                with self._cond:
+                    self._n_open += 1
+                conn = None
+        if conn is None:
+            try:
+                conn = self.connect()
+            except BaseException:
+                with self._cond:
+                    self._n_open -= 1
+                    self._cond.notify()
+                raise
+        return conn
+
+    def _discard(self, conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._n_open -= 1
+            self._cond.notify()
+
+    def _release(self, conn) -> None:
+        with self._cond:
+            if not self._closed:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+                return
+        self._discard(conn)
+
+    # ── API ────────────────────────────────────────────────────────
+    def run(self, fn: Callable[[Any], Any]) -> Any:
+        """Jalankan fn(conn) dengan koneksi pinjaman; reconnect + retry hanya bila db_retryable."""
+        for attempt in range(1, self.max_retry + 1):
+            try:
+                conn = self._acquire()
+            except Exception as e:
+                if not db_retryable(e):
+                    raise
+                err = e
+            else:
+                try:
+                    out = fn(conn)
+                except Exception as e:
+                    if not db_retryable(e):
+                        self._release(conn)
+                        raise
+                    self._discard(conn)
+                    err = e
+                except BaseException:
+                    self._release(conn)
+                    raise
+                else:
+                    self._release(conn)
+                    return out
+            if attempt == self.max_retry:
+                raise err
+            wait = min(self.max_backoff, 2 ** (attempt - 1))
+            print(f"[DB] Koneksi bermasalah ({err.__class__.__name__}: {err}); "
+                  f"coba lagi {attempt}/{self.max_retry - 1} dalam {wait}s", file=sys.stderr)
+            STATS.incr("db.reconnect")
+            time.sleep(wait)
+            self._ensure_tunnel()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+def db_call(db, fn: Callable[[Any], Any]) -> Any:
+    """fn(conn) lewat DbPool (reconnect + retry) atau langsung pada koneksi biasa."""
+    return db.run(fn) if isinstance(db, DbPool) else fn(db)
+
+# Satu scan `orders`: JSON_TABLE memecah seluruh array jersey_data (berapa pun
+# panjangnya), DISTINCT membuang atlet yang muncul di beberapa order/jersey.
+# ORDER BY menjaga urutan stabil supaya --total-shards konsisten antar PC.
+_STRAVA_IDS_SQL = """
+        SELECT DISTINCT u.strava_id
+        FROM   {orders} o
+        JOIN   JSON_TABLE(
+                   o.jersey_data, '$[*]'
+                   COLUMNS (user_id VARCHAR(64) PATH '$.id')
+               ) AS jt
+        JOIN   {users} u ON u.id = jt.user_id
+        WHERE  o.status = 'paid'
+          AND  u.strava_id IS NOT NULL
+        ORDER  BY u.strava_id
+"""
+
+def iter_strava_ids(conn, *, orders: str = "orders", users: str = "users") -> Iterator[str]:
+    """
+    Stream strava_id unik dari server-side cursor (tidak di-buffer di klien).
+    Cursor harus dihabiskan sebelum koneksi dipakai query lain.
+    """
+    cur = conn.cursor(mysql.cursors.SSDictCursor)
+    try:
+        cur.execute(_STRAVA_IDS_SQL.format(orders=orders, users=users))
+        for row in cur:
+            yield str(row["strava_id"])
+    finally:
+        cur.close()
+
+def fetch_strava_ids(conn, *, orders: str = "orders", users: str = "users") -> List[str]:
     """
-    Mengambil strava_id user yang:
-      • Tercantum di kolom jersey_data (index JSON 0-4)
+    Mengambil strava_id unik dari user yang:
+      • Tercantum di kolom jersey_data (semua elemen array JSON)
       • Pesanannya berstatus 'paid'
     """
-    cur = conn.cursor()
-    cur.execute(
-        """
-        WITH jersey_ids AS (
-            SELECT o.id            AS order_id,
-                   JSON_UNQUOTE(JSON_EXTRACT(o.jersey_data,'$[0].id')) AS user_id
-            FROM   orders o
-            WHERE  o.status = 'paid'
-            UNION ALL
-            SELECT o.id,
-                   JSON_UNQUOTE(JSON_EXTRACT(o.jersey_data,'$[1].id'))
-            FROM   orders o
-            WHERE  o.status = 'paid'
-            UNION ALL
-            SELECT o.id,
-                   JSON_UNQUOTE(JSON_EXTRACT(o.jersey_data,'$[2].id'))
-            FROM   orders o
-            WHERE  o.status = 'paid'
-            UNION ALL
-            SELECT o.id,
-                   JSON_UNQUOTE(JSON_EXTRACT(o.jersey_data,'$[3].id'))
-            FROM   orders o
-            WHERE  o.status = 'paid'
-            UNION ALL
-            SELECT o.id,
-                   JSON_UNQUOTE(JSON_EXTRACT(o.jersey_data,'$[4].id'))
-            FROM   orders o
-            WHERE  o.status = 'paid'
-        )
-        SELECT u.strava_id
-        FROM   jersey_ids ji
-        JOIN   users u ON u.id = ji.user_id
-        WHERE  ji.user_id IS NOT NULL
-              AND u.strava_id IS NOT NULL;
-        """
-    )
-    ids = [str(row["strava_id"]) for row in cur.fetchall()]
-    cur.close()
-    return ids
+    return list(iter_strava_ids(conn, orders=orders, users=users))
+
+def fetch_strava_ids_compact(conn, *, orders: str = "orders", users: str = "users") -> Tuple[array, List[str]]:
+    """
+    Seperti fetch_strava_ids, tapi ke array('Q') ringkas (8 byte/ID, bukan
+    objek str per atlet); strava_id yang bukan angka disimpan di list kecil.
+    """
+    ids, other = array("Q"), []
+    for sid in iter_strava_ids(conn, orders=orders, users=users):
+        if sid.isdigit():
+            ids.append(int(sid))
+        else:
+            other.append(sid)
+    return ids, other
 
+def stream_strava_ids(db, *, orders: str = "orders", users: str = "users") -> Iterator[str]:
+    """
+    Daftar atlet untuk engine tanpa list str penuh: satu scan `orders`
+    (fetch_strava_ids_compact, diulang utuh lewat db_call bila koneksi putus)
+    lalu strava_id diteruskan satu per satu. Cursor server-side langsung
+    dihabiskan, jadi tidak tertahan selama scraping yang lambat (MySQL
+    memutusnya setelah net_write_timeout).
+    """
+    ids, other = db_call(db, lambda c: fetch_strava_ids_compact(c, orders=orders, users=users))
+    for sid in ids:
+        yield str(sid)
+    yield from other
 
-def save_activity(conn, strava_id: str, act_id: str, payload: Dict[str, Any]):
-    dist, elev, mv_sec, cal, cad, trainer, sport, elapsed_sec, pace_sec, pace_txt, disp_name, act_dt = extract_metrics(payload)
 
-    cur = conn.cursor()
-    cur.execute(
-        """
+_UPSERT_ACTIVITY_SQL = """
         INSERT INTO strava_activities
           (activity_id, strava_id, activity_date,
            distance_m, elev_gain_m, moving_time_s,
@@ -150,19 +348,887 @@ def save_activity(conn, strava_id: str, act_id: str, payload: Dict[str, Any]):
           pace_text        = VALUES(pace_text),
           athlete_name  = VALUES(athlete_name),
           payload       = VALUES(payload),
-          scraped_at    = CURRENT_TIMESTAMP;
-        """,
-        (
-            act_id, strava_id, act_dt,
-            dist, elev, mv_sec, 
-            cal, cad, trainer, 
-            sport, elapsed_sec, pace_sec, pace_txt,
-            disp_name,
-            json.dumps(payload),
-        ),
+          scraped_at    = CURRENT_TIMESTAMP
+"""
+
+# Varian dengan content_hash (+ payload_z terkompresi); dipakai bila
+# --unchanged touch|skip atau --compress-payload (kolom dari ensure_activity_columns).
+_UPSERT_ACTIVITY_HASHED_SQL = """
+        INSERT INTO strava_activities
+          (activity_id, strava_id, activity_date,
+           distance_m, elev_gain_m, moving_time_s,
+           calories, avg_cadence, trainer,
+           sport_type, elapsed_time_s, pace_sec_per_km, pace_text,
+           athlete_name, payload, payload_z, content_hash)
+        VALUES
+          (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+        ON DUPLICATE KEY UPDATE
+          activity_date = VALUES(activity_date),
+          distance_m    = VALUES(distance_m),
+          elev_gain_m   = VALUES(elev_gain_m),
+          moving_time_s = VALUES(moving_time_s),
+          calories      = VALUES(calories),
+          avg_cadence   = VALUES(avg_cadence),
+          trainer       = VALUES(trainer),
+          sport_type       = VALUES(sport_type),
+          elapsed_time_s   = VALUES(elapsed_time_s),
+          pace_sec_per_km  = VALUES(pace_sec_per_km),
+          pace_text        = VALUES(pace_text),
+          athlete_name  = VALUES(athlete_name),
+          payload       = VALUES(payload),
+          payload_z     = VALUES(payload_z),
+          content_hash  = VALUES(content_hash),
+          scraped_at    = CURRENT_TIMESTAMP
+"""
+
+_ACTIVITY_EXTRA_COLUMNS = {
+    "content_hash": "BIGINT UNSIGNED NULL",
+    "payload_z": "MEDIUMBLOB NULL",
+}
+
+def ensure_activity_columns(conn) -> None:
+    """Tambahkan kolom content_hash / payload_z ke strava_activities bila belum ada."""
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """SELECT COLUMN_NAME FROM information_schema.COLUMNS
+               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'strava_activities'"""
+        )
+        have = {str(r["COLUMN_NAME"] if isinstance(r, dict) else r[0]).lower() for r in cur.fetchall()}
+        missing = [f"ADD COLUMN {c} {ddl}" for c, ddl in _ACTIVITY_EXTRA_COLUMNS.items() if c not in have]
+        if missing:
+            print(f"[DB] Menambah kolom strava_activities: {', '.join(m.split()[2] for m in missing)}")
+            cur.execute(f"ALTER TABLE strava_activities {', '.join(missing)}")
+    finally:
+        cur.close()
+
+
+def activity_row(strava_id: str, act_id: str, payload: Dict[str, Any]) -> Tuple:
+    """Satu baris parameter untuk _UPSERT_ACTIVITY_SQL."""
+    dist, elev, mv_sec, cal, cad, trainer, sport, elapsed_sec, pace_sec, pace_txt, disp_name, act_dt = extract_metrics(payload)
+    return (
+        act_id, strava_id, act_dt,
+        dist, elev, mv_sec,
+        cal, cad, trainer,
+        sport, elapsed_sec, pace_sec, pace_txt,
+        disp_name,
+        json.dumps(payload),
     )
+
+def content_hash(row: Tuple) -> int:
+    """
+    Hash kanonik 64-bit dari metrik + payload satu baris activity_row()
+    (key JSON diurutkan, jadi urutan field dari Strava tidak berpengaruh).
+    """
+    payload = json.loads(row[14]) if row[14] else None
+    canon = json.dumps([list(row[1:14]), payload], sort_keys=True, separators=(",", ":"), default=str)
+    return int.from_bytes(hashlib.blake2b(canon.encode("utf-8"), digest_size=8).digest(), "big")
+
+def hashed_row(row: Tuple, digest: int, compress: bool = False) -> Tuple:
+    """Baris activity_row() → parameter _UPSERT_ACTIVITY_HASHED_SQL."""
+    if compress:
+        return row[:14] + (None, zlib.compress(row[14].encode("utf-8"), 6), digest)
+    return row[:14] + (row[14], None, digest)
+
+class ContentHashes:
+    """
+    content_hash per activity_id: dua array('Q') paralel terurut + bisect
+    (16 byte/aktivitas), ditambah dict untuk hash yang ditulis selama run.
+    """
+
+    def __init__(self, pairs: Iterable[Tuple[int, int]] = ()):
+        pairs = sorted(pairs)
+        self._ids = array("Q", (a for a, _ in pairs))
+        self._hash = array("Q", (h for _, h in pairs))
+        self._new: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids) + len(self._new)
+
+    def get(self, act_id) -> Optional[int]:
+        key = int(act_id)
+        with self._lock:
+            if key in self._new:
+                return self._new[key]
+        i = bisect.bisect_left(self._ids, key)
+        if i < len(self._ids) and self._ids[i] == key:
+            return self._hash[i]
+        return None
+
+    def set(self, act_id, digest: int) -> None:
+        with self._lock:
+            self._new[int(act_id)] = digest
+
+def load_content_hashes(conn, athlete_ids: List[str], *, chunk: int = 1000) -> ContentHashes:
+    """Muat (activity_id, content_hash) milik atlet shard ini, per batch `chunk` atlet."""
+    pairs: List[Tuple[int, int]] = []
+    cur = conn.cursor(mysql.cursors.SSCursor)
+    try:
+        for i in range(0, len(athlete_ids), chunk):
+            part = athlete_ids[i:i + chunk]
+            cur.execute(
+                "SELECT activity_id, content_hash FROM strava_activities "
+                f"WHERE strava_id IN ({','.join(['%s'] * len(part))}) AND content_hash IS NOT NULL",
+                list(part),
+            )
+            pairs.extend((int(a), int(h)) for a, h in cur)
+    finally:
+        cur.close()
+    return ContentHashes(pairs)
+
+# Watermark per atlet: activity_id tertinggi yang sudah tersimpan.
+_ATHLETE_STATE_DDL = """
+        CREATE TABLE IF NOT EXISTS strava_athlete_state (
+          strava_id        BIGINT UNSIGNED NOT NULL,
+          last_activity_id BIGINT UNSIGNED NOT NULL DEFAULT 0,
+          updated_at       TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                           ON UPDATE CURRENT_TIMESTAMP,
+          PRIMARY KEY (strava_id)
+        ) ENGINE=InnoDB
+"""
+
+_UPSERT_WATERMARK_SQL = """
+        INSERT INTO strava_athlete_state (strava_id, last_activity_id)
+        VALUES (%s,%s)
+        ON DUPLICATE KEY UPDATE
+          last_activity_id = GREATEST(last_activity_id, VALUES(last_activity_id))
+"""
+
+def ensure_athlete_state(conn) -> None:
+    cur = conn.cursor()
+    cur.execute(_ATHLETE_STATE_DDL)
+    cur.close()
+
+def load_watermarks(
+    conn,
+    athlete_ids: List[str],
+    *,
+    refresh_days: Optional[float] = None,
+    chunk: int = 1000,
+) -> Dict[str, int]:
+    """
+    Watermark atlet shard ini dari strava_athlete_state. Atlet yang belum
+    punya baris di sana di-bootstrap dari MAX(activity_id) strava_activities.
+    Dengan `refresh_days`, atlet yang masih punya baris basi tidak diberi
+    watermark supaya aktivitas lamanya ikut terjangkau untuk di-scrape ulang.
+    """
+    marks: Dict[str, int] = {}
+    cur = conn.cursor(mysql.cursors.SSCursor)
+    try:
+        for i in range(0, len(athlete_ids), chunk):
+            part = athlete_ids[i:i + chunk]
+            ph = ",".join(["%s"] * len(part))
+            cur.execute(
+                f"SELECT strava_id, last_activity_id FROM strava_athlete_state WHERE strava_id IN ({ph})",
+                part,
+            )
+            marks.update((str(sid), int(mark)) for sid, mark in cur)
+
+            missing = [a for a in part if str(a) not in marks]
+            if missing:
+                cur.execute(
+                    "SELECT strava_id, MAX(activity_id) FROM strava_activities "
+                    f"WHERE strava_id IN ({','.join(['%s'] * len(missing))}) GROUP BY strava_id",
+                    missing,
+                )
+                marks.update((str(sid), int(mark)) for sid, mark in cur if mark is not None)
+
+            if refresh_days is not None:
+                cur.execute(
+                    "SELECT DISTINCT strava_id FROM strava_activities "
+                    f"WHERE strava_id IN ({ph}) AND scraped_at < NOW() - INTERVAL %s SECOND",
+                    list(part) + [int(refresh_days * 86400)],
+                )
+                for (sid,) in cur:
+                    marks.pop(str(sid), None)
+    finally:
+        cur.close()
+    return marks
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Jadwal kunjungan atlet (--schedule)
+# ──────────────────────────────────────────────────────────────────────────────
+_SCHEDULE_DDL = """
+        CREATE TABLE IF NOT EXISTS strava_athlete_schedule (
+          strava_id        BIGINT UNSIGNED NOT NULL,
+          last_activity_id BIGINT UNSIGNED NOT NULL DEFAULT 0,
+          last_visit       BIGINT NULL,            -- unix time kunjungan profil terakhir
+          last_new_at      BIGINT NULL,            -- unix time aktivitas baru terakhir terlihat
+          interval_sec     DOUBLE NULL,            -- rata-rata jarak antar aktivitas (EWMA)
+          idle_streak      INT NOT NULL DEFAULT 0, -- kunjungan beruntun tanpa aktivitas baru
+          fail_streak      INT NOT NULL DEFAULT 0, -- gagal beruntun (privat / tanpa aktivitas)
+          last_reason      VARCHAR(32) NULL,
+          next_visit       BIGINT NULL,            -- NULL = jatuh tempo kapan saja
+          PRIMARY KEY (strava_id)
+        ) ENGINE=InnoDB
+"""
+
+_SCHEDULE_COLS = (
+    "last_activity_id", "last_visit", "last_new_at", "interval_sec",
+    "idle_streak", "fail_streak", "last_reason", "next_visit",
+)
+
+_UPSERT_SCHEDULE_SQL = f"""
+        INSERT INTO strava_athlete_schedule (strava_id, {', '.join(_SCHEDULE_COLS)})
+        VALUES ({','.join(['%s'] * (len(_SCHEDULE_COLS) + 1))})
+        ON DUPLICATE KEY UPDATE
+          {', '.join(f'{c} = VALUES({c})' for c in _SCHEDULE_COLS)}
+"""
+
+def ensure_athlete_schedule(conn) -> None:
+    cur = conn.cursor()
+    cur.execute(_SCHEDULE_DDL)
     cur.close()
 
+class AthleteSchedule:
+    """
+    Statistik kunjungan per atlet untuk mengurutkan dan menyaring atlet tiap run:
+      • urutan: perkiraan jumlah aktivitas baru sejak kunjungan terakhir
+        (waktu sejak kunjungan ÷ rata-rata jarak antar aktivitas), terbesar dulu
+      • atlet tanpa aktivitas baru, atau yang gagal karena privat / kosong,
+        baru dikunjungi lagi setelah base_hours · 2^(streak-1), maks. max_days
+    Kegagalan sementara (timeout, throttle, crash) tidak menggeser jadwal.
+    """
+
+    BACKOFF_REASONS = ("private", "no_activity")
+    DEFAULT_INTERVAL = 7 * 86400      # atlet yang belum pernah terlihat posting
+    EWMA = 0.3
+
+    def __init__(
+        self,
+        rows: Optional[Dict[str, Dict[str, Any]]] = None,
+        *,
+        base_hours: float = 12,
+        max_days: float = 30,
+    ):
+        self.rows: Dict[str, Dict[str, Any]] = rows or {}
+        self.base = base_hours * 3600
+        self.max = max_days * 86400
+        self._dirty: set = set()
+        self._lock = threading.Lock()
+        self.n_active = self.n_idle = self.n_backoff = 0
+
+    def _row(self, ath_id: str) -> Dict[str, Any]:
+        row = self.rows.get(ath_id)
+        if row is None:
+            row = self.rows[ath_id] = {c: None for c in _SCHEDULE_COLS}
+            row.update(last_activity_id=0, idle_streak=0, fail_streak=0)
+        return row
+
+    def priority(self, ath_id: str, now: float) -> float:
+        row = self.rows.get(ath_id)
+        if row is None or row["last_visit"] is None:
+            return 1.0                  # belum ada data: setara satu aktivitas baru
+        # atlet yang sudah lama diam dianggap memposting paling cepat selama diamnya itu
+        silent = row["last_visit"] - row["last_new_at"] if row["last_new_at"] is not None else self.max
+        interval = max(row["interval_sec"] or self.DEFAULT_INTERVAL, silent, 60.0)
+        return max(0.0, now - row["last_visit"]) / interval
+
+    def order(self, athlete_ids: Iterable[str], now: Optional[float] = None) -> Tuple[List[str], int]:
+        """(atlet yang jatuh tempo, urut prioritas menurun; jumlah yang ditunda)."""
+        now = time.time() if now is None else now
+        due, n_later = [], 0
+        for ath_id in athlete_ids:
+            row = self.rows.get(str(ath_id))
+            if row is not None and row["next_visit"] is not None and row["next_visit"] > now:
+                n_later += 1
+                continue
+            due.append(str(ath_id))
+        # sort stabil: atlet dengan prioritas sama tetap dalam urutan asal
+        due.sort(key=lambda a: -self.priority(a, now))
+        return due, n_later
+
+    def _backoff(self, streak: int) -> float:
+        return min(self.max, self.base * 2 ** max(0, streak - 1))
+
+    def visited(
+        self,
+        ath_id: str,
+        act_ids: Optional[Iterable[str]] = None,
+        reason: Optional[str] = None,
+        now: Optional[float] = None,
+    ) -> None:
+        """Catat hasil satu kunjungan profil: ID aktivitas di feed, atau alasan gagal."""
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self._row(str(ath_id))
+            if reason is not None:
+                if reason not in self.BACKOFF_REASONS:
+                    return
+                row["fail_streak"] += 1
+                row["last_reason"] = reason
+                row["last_visit"] = int(now)
+                row["next_visit"] = int(now + self._backoff(row["fail_streak"]))
+                self.n_backoff += 1
+            else:
+                ids = [int(a) for a in act_ids or ()]
+                n_new = sum(1 for a in ids if a > row["last_activity_id"])
+                row.update(fail_streak=0, last_reason=None, last_visit=int(now))
+                if n_new:
+                    if row["last_new_at"] is not None:
+                        gap = max(60.0, (now - row["last_new_at"]) / n_new)
+                        old = row["interval_sec"]
+                        row["interval_sec"] = gap if old is None else (1 - self.EWMA) * old + self.EWMA * gap
+                    row["last_new_at"] = int(now)
+                    row["last_activity_id"] = max(ids)
+                    row["idle_streak"] = 0
+                    row["next_visit"] = None
+                    self.n_active += 1
+                else:
+                    row["idle_streak"] += 1
+                    row["next_visit"] = int(now + self._backoff(row["idle_streak"]))
+                    self.n_idle += 1
+            self._dirty.add(str(ath_id))
+
+    def save(self, conn, chunk: int = 1000) -> int:
+        """Upsert baris yang berubah selama run; return jumlah atlet."""
+        with self._lock:
+            dirty, self._dirty = sorted(self._dirty), set()
+            params = [(a, *(self.rows[a][c] for c in _SCHEDULE_COLS)) for a in dirty]
+        if not params:
+            return 0
+        cur = conn.cursor()
+        try:
+            for i in range(0, len(params), chunk):
+                cur.executemany(_UPSERT_SCHEDULE_SQL, params[i:i + chunk])
+            conn.commit()
+        finally:
+            cur.close()
+        return len(params)
+
+    def summary(self) -> str:
+        return (
+            f"[i] Jadwal: {self.n_active} atlet dengan aktivitas baru, {self.n_idle} tanpa aktivitas baru, "
+            f"{self.n_backoff} privat/kosong (ditunda dengan backoff)."
+        )
+
+def load_athlete_schedule(
+    conn,
+    athlete_ids: List[str],
+    *,
+    base_hours: float = 12,
+    max_days: float = 30,
+    chunk: int = 1000,
+) -> AthleteSchedule:
+    """
+    Statistik jadwal atlet shard ini dari strava_athlete_schedule. Atlet yang
+    belum punya baris di-bootstrap dari strava_activities: aktivitas terakhir,
+    scrape terakhir dan rata-rata jarak antar aktivitas 180 hari terakhir.
+    """
+    rows: Dict[str, Dict[str, Any]] = {}
+    cur = conn.cursor(mysql.cursors.SSCursor)
+    try:
+        for i in range(0, len(athlete_ids), chunk):
+            part = athlete_ids[i:i + chunk]
+            ph = ",".join(["%s"] * len(part))
+            cur.execute(
+                f"SELECT strava_id, {', '.join(_SCHEDULE_COLS)} FROM strava_athlete_schedule "
+                f"WHERE strava_id IN ({ph})",
+                part,
+            )
+            for r in cur:
+                rows[str(r[0])] = dict(zip(_SCHEDULE_COLS, r[1:]))
+
+            missing = [a for a in part if str(a) not in rows]
+            if not missing:
+                continue
+            cur.execute(
+                """SELECT strava_id, MAX(activity_id),
+                          SUM(activity_date >= NOW() - INTERVAL 180 DAY),
+                          UNIX_TIMESTAMP(MIN(CASE WHEN activity_date >= NOW() - INTERVAL 180 DAY
+                                                  THEN activity_date END)),
+                          UNIX_TIMESTAMP(MAX(activity_date)),
+                          UNIX_TIMESTAMP(MAX(scraped_at))
+                   FROM strava_activities """
+                f"WHERE strava_id IN ({','.join(['%s'] * len(missing))}) GROUP BY strava_id",
+                missing,
+            )
+            for sid, top, n_recent, first, last, scraped in cur:
+                n_recent = int(n_recent or 0)
+                interval = (float(last) - float(first)) / (n_recent - 1) if n_recent > 1 and first and last else None
+                rows[str(sid)] = {
+                    "last_activity_id": int(top or 0),
+                    "last_visit": int(scraped) if scraped else None,
+                    "last_new_at": int(last) if last else None,
+                    "interval_sec": interval,
+                    "idle_streak": 0,
+                    "fail_streak": 0,
+                    "last_reason": None,
+                    "next_visit": None,
+                }
+    finally:
+        cur.close()
+    for row in rows.values():
+        for c in ("last_activity_id", "idle_streak", "fail_streak"):
+            row[c] = int(row[c] or 0)
+        row["interval_sec"] = float(row["interval_sec"]) if row["interval_sec"] is not None else None
+    return AthleteSchedule(rows, base_hours=base_hours, max_days=max_days)
+
+def save_activities(
+    conn,
+    rows: List[Tuple],
+    *,
+    watermarks: bool = False,
+    hashed: bool = False,
+    touch: Iterable[Any] = (),
+) -> None:
+    """
+    Upsert banyak baris dalam satu transaksi eksplisit (opsional + watermark
+    atlet). `hashed`: rows berformat hashed_row(). `touch`: activity_id yang
+    isinya tidak berubah; hanya scraped_at yang diperbarui.
+    """
+    touch = sorted({int(a) for a in touch})
+    if not rows and not touch:
+        return
+    cur = conn.cursor()
+    try:
+        conn.begin()
+        # pymysql menulis ulang executemany INSERT ... VALUES menjadi
+        # INSERT multi-baris (dipecah otomatis sesuai max_stmt_length)
+        if rows:
+            cur.executemany(_UPSERT_ACTIVITY_HASHED_SQL if hashed else _UPSERT_ACTIVITY_SQL, rows)
+        if touch:
+            cur.execute(
+                "UPDATE strava_activities SET scraped_at = CURRENT_TIMESTAMP "
+                f"WHERE activity_id IN ({','.join(['%s'] * len(touch))})",
+                touch,
+            )
+        if watermarks and rows:
+            top: Dict[str, int] = {}
+            for row in rows:
+                act_id, strava_id = int(row[0]), str(row[1])
+                top[strava_id] = max(top.get(strava_id, 0), act_id)
+            cur.executemany(_UPSERT_WATERMARK_SQL, list(top.items()))
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass           # koneksi sudah putus; error aslinya yang dilempar
+        raise
+    finally:
+        cur.close()
+
+def save_activity(conn, strava_id: str, act_id: str, payload: Dict[str, Any]):
+    save_activities(conn, [activity_row(strava_id, act_id, payload)])
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Sink keluaran: MySQL, NDJSON, Parquet terpartisi
+# ──────────────────────────────────────────────────────────────────────────────
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:          # opsional, hanya untuk --parquet-out
+    pa = pq = None
+
+# urutan kolom activity_row() (= kolom _UPSERT_ACTIVITY_SQL)
+ACTIVITY_COLUMNS = (
+    "activity_id", "strava_id", "activity_date",
+    "distance_m", "elev_gain_m", "moving_time_s",
+    "calories", "avg_cadence", "trainer",
+    "sport_type", "elapsed_time_s", "pace_sec_per_km", "pace_text",
+    "athlete_name", "payload",
+)
+
+def plain_row(row: Tuple) -> Tuple:
+    """Baris hashed_row() → bentuk activity_row() (payload JSON didekompresi bila perlu)."""
+    if len(row) == len(ACTIVITY_COLUMNS):
+        return row
+    payload = row[14] if row[14] is not None else zlib.decompress(row[15]).decode("utf-8")
+    return row[:14] + (payload,)
+
+class MysqlSink:
+    """Upsert ke strava_activities (+ watermark / touch) lewat koneksi atau DbPool."""
+
+    name = "mysql"
+    stage = "db.flush"
+
+    def __init__(self, db, *, watermarks: bool = False, hashed: bool = False):
+        self.db = db
+        self.watermarks = watermarks
+        self.hashed = hashed
+
+    def write(self, rows: List[Tuple], touch: List[int]) -> None:
+        db_call(self.db, lambda c: save_activities(
+            c, rows, watermarks=self.watermarks, hashed=self.hashed, touch=touch,
+        ))
+
+    def close(self) -> None:
+        pass
+
+class NdjsonSink:
+    """Satu objek JSON per aktivitas (kolom ACTIVITY_COLUMNS, payload sebagai objek); .gz → gzip."""
+
+    name = "ndjson"
+    stage = "sink.ndjson"
+
+    def __init__(self, path: str):
+        self.path = path
+        if path.endswith(".gz"):
+            self._f = gzip.open(path, "at", encoding="utf-8")
+        else:
+            self._f = open(path, "a", encoding="utf-8", buffering=1 << 16)
+
+    def write(self, rows: List[Tuple], touch: List[int]) -> None:
+        if not rows:             # flush touch-saja: jangan tulis baris kosong
+            return
+        out = []
+        for row in rows:
+            rec = dict(zip(ACTIVITY_COLUMNS, plain_row(row)))
+            rec["payload"] = json.loads(rec["payload"]) if rec["payload"] else None
+            rec["scraped_at"] = dt.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+            out.append(json.dumps(rec, ensure_ascii=False, default=str))
+        self._f.write("\n".join(out) + "\n")
+        self._f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+
+def _as(cast: Callable[[Any], Any], v: Any) -> Any:
+    try:
+        return cast(v) if v is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def _as_datetime(v: Any) -> Optional[dt.datetime]:
+    try:
+        return dt.datetime.fromisoformat(str(v)) if v else None
+    except ValueError:
+        return None
+
+class ParquetSink:
+    """
+    Dataset Parquet terpartisi gaya Hive:
+        <root>/date=YYYY-MM-DD/sport=<sport_type>/part-<run>-<n>.parquet
+    (nama partisi sengaja beda dari kolom activity_date / sport_type di file).
+    Baris di-buffer per (tanggal, sport) dan baru ditulis sebagai satu row
+    group saat buffer partisi mencapai `row_group_rows`, saat file digulir atau
+    saat close(); bila total buffer melewati `max_buffer_mb`, partisi terbesar
+    ditulis lebih dulu. Maks. `max_open` writer sekaligus (LRU). Footer Parquet
+    baru ditulis saat file ditutup, jadi file digulir (ditutup, part berikutnya
+    dibuka) tiap `roll_rows` baris: bila proses crash, yang hilang hanya baris
+    di buffer dan file yang masih terbuka.
+    """
+
+    name = "parquet"
+    stage = "sink.parquet"
+
+    def __init__(self, root: str, *, compression: str = "zstd", max_open: int = 64,
+                 roll_rows: int = 200000, row_group_rows: int = 50000, max_buffer_mb: int = 256):
+        if pa is None:
+            raise RuntimeError("--parquet-out membutuhkan paket pyarrow (pip install pyarrow).")
+        self.root = root
+        self.compression = compression
+        self.max_open = max(1, max_open)
+        self.roll_rows = max(1, roll_rows)
+        self.row_group_rows = max(1, min(row_group_rows, self.roll_rows))
+        self.max_buffer_bytes = max(1, max_buffer_mb) << 20
+        self.run = dt.datetime.utcnow().strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}"
+        self._writers: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._parts: Dict[Tuple[str, str], int] = {}
+        self._n_rows: Dict[Tuple[str, str], int] = {}     # baris di file partisi yang terbuka
+        self._buf: Dict[Tuple[str, str], List[Any]] = {}  # tabel Arrow yang belum ditulis
+        self._buf_rows: Dict[Tuple[str, str], int] = {}
+        self._buf_bytes = 0
+        self.schema = pa.schema([
+            ("activity_id", pa.int64()), ("strava_id", pa.int64()),
+            ("activity_date", pa.timestamp("s")),
+            ("distance_m", pa.int64()), ("elev_gain_m", pa.int64()), ("moving_time_s", pa.int64()),
+            ("calories", pa.float64()), ("avg_cadence", pa.float64()), ("trainer", pa.int8()),
+            ("sport_type", pa.string()), ("elapsed_time_s", pa.int64()),
+            ("pace_sec_per_km", pa.int64()), ("pace_text", pa.string()),
+            ("athlete_name", pa.string()), ("payload", pa.string()),
+            ("scraped_at", pa.timestamp("s")),
+        ])
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def _part_value(v: Any) -> str:
+        v = re.sub(r"[^0-9A-Za-z_.-]+", "_", str(v or "")).strip("_")
+        return v or "unknown"
+
+    def _writer(self, key: Tuple[str, str]):
+        w = self._writers.get(key)
+        if w is not None:
+            self._writers.move_to_end(key)
+            return w
+        while len(self._writers) >= self.max_open:
+            self._close(next(iter(self._writers)))
+        n = self._parts[key] = self._parts.get(key, -1) + 1
+        d = os.path.join(self.root, f"date={key[0]}", f"sport={key[1]}")
+        os.makedirs(d, exist_ok=True)
+        w = pq.ParquetWriter(os.path.join(d, f"part-{self.run}-{n}.parquet"), self.schema,
+                             compression=self.compression)
+        self._writers[key] = w
+        self._n_rows[key] = 0
+        return w
+
+    def _close(self, key: Tuple[str, str]) -> None:
+        self._n_rows.pop(key, None)
+        self._writers.pop(key).close()
+
+    def _flush(self, key: Tuple[str, str], force: bool = False) -> None:
+        """
+        Tulis buffer partisi sebagai row group penuh (`force`: termasuk sisanya);
+        file digulir tiap `roll_rows`. Baris baru dilepas dari buffer setelah tertulis.
+        """
+        tables = self._buf.pop(key)
+        size = sum(t.nbytes for t in tables)
+        table = tables[0] if len(tables) == 1 else pa.concat_tables(tables)
+        try:
+            while table.num_rows:
+                room = self.roll_rows - self._n_rows.get(key, 0)
+                if table.num_rows >= room:
+                    n = room
+                else:
+                    n = table.num_rows if force else table.num_rows - table.num_rows % self.row_group_rows
+                if not n:
+                    break
+                try:
+                    self._writer(key).write_table(table.slice(0, n), row_group_size=self.row_group_rows)
+                except Exception:
+                    # writer yang gagal di tengah jalan tidak dipakai lagi; part berikutnya dibuka baru
+                    w = self._writers.pop(key, None)
+                    self._n_rows.pop(key, None)
+                    if w is not None:
+                        try:
+                            w.close()
+                        except Exception:
+                            pass
+                    raise
+                table = table.slice(n)
+                self._n_rows[key] += n
+                if self._n_rows[key] >= self.roll_rows:
+                    self._close(key)
+        finally:
+            self._buf_bytes -= size
+            if table.num_rows:
+                self._buf[key] = [table]
+                self._buf_rows[key] = table.num_rows
+                self._buf_bytes += table.nbytes
+            else:
+                self._buf_rows.pop(key, None)
+
+    def write(self, rows: List[Tuple], touch: List[int]) -> None:
+        now = dt.datetime.utcnow().replace(microsecond=0)
+        groups: Dict[Tuple[str, str], List[Tuple]] = {}
+        for row in rows:
+            row = plain_row(row)
+            when = _as_datetime(row[2])
+            key = (when.strftime("%Y-%m-%d") if when else "unknown", self._part_value(row[9]))
+            groups.setdefault(key, []).append((
+                _as(int, row[0]), _as(int, row[1]), when,
+                _as(int, row[3]), _as(int, row[4]), _as(int, row[5]),
+                _as(float, row[6]), _as(float, row[7]), _as(int, row[8]),
+                _as(str, row[9]), _as(int, row[10]), _as(int, row[11]), _as(str, row[12]),
+                _as(str, row[13]), row[14], now,
+            ))
+        # semua tabel dibangun dulu: baris yang salah tipe gagal sebelum ada
+        # yang masuk buffer, jadi batch bisa diulang/dibelah tanpa dobel
+        tables = {
+            key: pa.Table.from_arrays(
+                [pa.array(c, type=f.type) for c, f in zip(zip(*recs), self.schema)], schema=self.schema,
+            )
+            for key, recs in groups.items()
+        }
+        for key, table in tables.items():
+            self._buf.setdefault(key, []).append(table)
+            self._buf_rows[key] = self._buf_rows.get(key, 0) + table.num_rows
+            self._buf_bytes += table.nbytes
+        # batch ini sudah diterima (ada di buffer): gagal tulis di bawah tidak
+        # dilempar ke ActivityWriter, supaya retry batch tidak menulis dobel;
+        # buffer tetap dan dicoba lagi di flush berikutnya / close()
+        full = [key for key in tables
+                if self._buf_rows[key] >= self.row_group_rows
+                or self._n_rows.get(key, 0) + self._buf_rows[key] >= self.roll_rows]
+        try:
+            for key in full:
+                self._flush(key)
+            while self._buf_bytes > self.max_buffer_bytes:
+                self._flush(max(self._buf_rows, key=self._buf_rows.get), force=True)
+        except Exception as e:
+            print(f"[!] Parquet: gagal menulis row group ({e}); baris tetap di buffer.", file=sys.stderr)
+
+    def close(self) -> None:
+        err = None
+        for key in list(self._buf):
+            try:
+                self._flush(key, force=True)
+            except Exception as e:
+                err = err or e
+        while self._writers:
+            self._close(next(iter(self._writers)))
+        if err is not None:
+            raise err
+
+def open_sinks(args: argparse.Namespace) -> List[Any]:
+    """Sink file dari --ndjson-out / --parquet-out (MySQL ditambahkan ActivityWriter)."""
+    sinks: List[Any] = []
+    if args.ndjson_out:
+        sinks.append(NdjsonSink(args.ndjson_out))
+    if args.parquet_out:
+        sinks.append(ParquetSink(args.parquet_out, roll_rows=args.parquet_roll_rows,
+                                 row_group_rows=args.parquet_row_group_rows))
+    return sinks
+
+class ActivityWriter:
+    """
+    Buffer baris strava_activities lalu flush massal dari thread latar,
+    setiap `batch_size` baris atau `flush_sec` detik (mana yang lebih dulu),
+    ke MySQL (`conn`, boleh None dengan --no-db) dan ke `sinks` tambahan
+    (NDJSON / Parquet). Pemanggil add() tidak pernah menunggu DB. close()
+    mem-flush sisa buffer, termasuk saat Ctrl-C.
+    """
+
+    max_retry = 3
+
+    def __init__(
+        self,
+        conn,
+        batch_size: int = 100,
+        flush_sec: float = 5.0,
+        watermarks: bool = False,
+        *,
+        hashes: Optional[ContentHashes] = None,
+        unchanged: str = "write",
+        compress: bool = False,
+        sinks: Iterable[Any] = (),
+    ):
+        """
+        `hashes` + `unchanged`: baris yang content_hash-nya sama dengan yang
+        tersimpan tidak ditulis ulang ('skip') atau hanya scraped_at-nya
+        diperbarui ('touch'). `compress`: payload disimpan zlib di payload_z.
+        """
+        self.conn = conn
+        self.watermarks = watermarks
+        self.batch_size = max(1, batch_size)
+        self.flush_sec = flush_sec
+        self.hashes = hashes
+        self.unchanged = unchanged
+        self.compress = compress
+        self.hashed = hashes is not None or compress
+        self.sinks: List[Any] = []
+        if conn is not None:
+            self.sinks.append(MysqlSink(conn, watermarks=watermarks, hashed=self.hashed))
+        self.sinks.extend(sinks)
+        self._buf: Deque[Tuple] = deque()
+        self._touch: List[int] = []
+        self._cond = threading.Condition()
+        self._closing = False
+        self.n_written = 0
+        self.n_unchanged = 0
+        self.n_dropped = 0
+        self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, strava_id: str, act_id: str, payload: Dict[str, Any], row: Optional[Tuple] = None) -> None:
+        """`row` = activity_row() yang sudah dihitung (mis. di process pool --parse-procs)."""
+        if row is None:
+            row = activity_row(strava_id, act_id, payload)
+        if self.hashed:
+            digest = content_hash(row)
+            if self.hashes is not None:
+                if self.unchanged != "write" and self.hashes.get(act_id) == digest:
+                    STATS.incr("db.unchanged")
+                    with self._cond:
+                        self.n_unchanged += 1
+                        if self.unchanged == "touch":
+                            self._touch.append(int(act_id))
+                    return
+                self.hashes.set(act_id, digest)
+            row = hashed_row(row, digest, self.compress)
+        with self._cond:
+            self._buf.append(row)
+            if len(self._buf) + len(self._touch) >= self.batch_size:
+                self._cond.notify()
+
+    def _take(self) -> Tuple[List[Tuple], List[int]]:
+        with self._cond:
+            deadline = time.monotonic() + self.flush_sec
+            while not self._closing and len(self._buf) + len(self._touch) < self.batch_size:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                self._cond.wait(left)
+            n = min(len(self._buf), self.batch_size)
+            touch, self._touch = self._touch, []
+            return [self._buf.popleft() for _ in range(n)], touch
+
+    def _flush_sink(self, sink: Any, rows: List[Tuple], touch: List[int]) -> List[Tuple]:
+        """Tulis batch ke satu sink; return baris yang akhirnya gagal (dibuang)."""
+        for attempt in range(1, self.max_retry + 1):
+            t0 = time.monotonic()
+            try:
+                sink.write(rows, touch)
+            except Exception as e:
+                if not db_retryable(e):
+                    # salah data, bukan koneksi: retry sia-sia → belah batch
+                    return self._bisect(sink, rows, touch, e)
+                print(f"[DB] Flush {len(rows)} baris ke {sink.name} gagal ({attempt}/{self.max_retry}): {e}",
+                      file=sys.stderr)
+                time.sleep(attempt)
+                continue
+            STATS.observe(sink.stage, time.monotonic() - t0)
+            return []
+        return rows
+
+    def _bisect(self, sink: Any, rows: List[Tuple], touch: List[int], err: Exception) -> List[Tuple]:
+        # satu baris rusak tidak boleh menyeret seluruh batch: belah dua sampai
+        # tinggal baris yang memang ditolak sink
+        if len(rows) > 1:
+            mid = len(rows) // 2
+            return self._flush_sink(sink, rows[:mid], touch) + self._flush_sink(sink, rows[mid:], [])
+        if rows:
+            print(f"[DB] Baris {rows[0][0]} ditolak {sink.name}: {err}", file=sys.stderr)
+            if touch:
+                self._flush_sink(sink, [], touch)
+        else:
+            print(f"[DB] Touch {len(touch)} aktivitas ke {sink.name} gagal: {err}", file=sys.stderr)
+        return rows
+
+    def _flush(self, rows: List[Tuple], touch: List[int]) -> None:
+        # tiap sink di-retry sendiri supaya sink yang sudah berhasil tidak menulis dobel
+        bad: Dict[Any, Tuple] = {}
+        for sink in self.sinks:
+            for r in self._flush_sink(sink, rows, touch):
+                bad[r[0]] = r
+        n_bad = sum(1 for r in rows if r[0] in bad)
+        self.n_written += len(rows) - n_bad
+        if not bad:
+            return
+        self.n_dropped += n_bad
+        if self.hashes is not None:
+            for act_id in bad:          # jangan dianggap "tidak berubah" bila muncul lagi
+                self.hashes.set(act_id, 0)
+        print(f"[DB] {n_bad} baris dibuang: {', '.join(str(a) for a in bad)}", file=sys.stderr)
+
+    def _loop(self) -> None:
+        while True:
+            rows, touch = self._take()
+            if rows or touch:
+                self._flush(rows, touch)
+            with self._cond:
+                if self._closing and not self._buf and not self._touch:
+                    return
+
+    def close(self) -> None:
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._thread.join()
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                print(f"[!] Gagal menutup sink {sink.name}: {e}", file=sys.stderr)
+        flush_total = sum(STATS.total(sink.stage) for sink in self.sinks)
+        rate = f", {self.n_written / flush_total:.0f} baris/s" if flush_total else ""
+        names = "+".join(sink.name for sink in self.sinks)
+        print(f"[DB] {self.n_written} baris tersimpan ({names}){rate}" +
+              (f", {self.n_unchanged} tidak berubah ({self.unchanged})" if self.n_unchanged else "") +
+              (f", {self.n_dropped} gagal" if self.n_dropped else ""))
+
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Selenium / Chrome setup
@@ -172,10 +1238,22 @@ def build_chrome(
     headless: bool,
     profile: Optional[str],
     chrome_bin: Optional[str],
+    cdp_capture: Optional[str] = None,
+    blocklist: Optional[List[str]] = None,
 ) -> webdriver.Chrome:
-    """Membangun instance Chrome dengan Selenium WebDriver Manager terintegrasi."""
+    """
+    Membangun instance Chrome dengan Selenium WebDriver Manager terintegrasi.
+    `cdp_capture`: 'hook' = pasang penangkap fetch/XHR api/v4/activities di
+    setiap dokumen baru, 'log' = performance log lama, None = tanpa keduanya.
+    `blocklist` (profil --lean): pageLoadStrategy 'eager', gambar dimatikan,
+    dan URL yang cocok pola diblokir lewat Network.setBlockedURLs.
+    """
     opts = Options()
-    opts.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    if blocklist is not None:
+        opts.page_load_strategy = "eager"
+        opts.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    if cdp_capture == "log":
+        opts.set_capability("goog:loggingPrefs", {"performance": "ALL"})
     args = [
         "--disable-gpu",
         "--window-size=1920,1080",
@@ -193,35 +1271,819 @@ def build_chrome(
 
     try:
         # Selenium akan otomatis mengunduh & mengelola chromedriver yang sesuai
-        return webdriver.Chrome(options=opts)
+        drv = webdriver.Chrome(options=opts)
+    except Exception as e:
+        # raise (bukan sys.exit) supaya worker lain di pool tetap jalan
+        raise RuntimeError(f"Gagal memulai ChromeDriver: {e}") from e
+    try:
+        if cdp_capture == "hook":
+            drv.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": _CAPTURE_HOOK_JS})
+        if blocklist:
+            drv.execute_cdp_cmd("Network.enable", {})
+            drv.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(blocklist)})
     except Exception as e:
-        sys.exit(f"[!] Gagal memulai ChromeDriver: {e}")
+        drv.quit()
+        raise RuntimeError(f"Gagal menyiapkan CDP: {e}") from e
+    return drv
+
+# Pola Network.setBlockedURLs untuk --lean (wildcard '*'). Extractor hanya membaca
+# JSON di <script> dan beberapa teks, jadi gambar, font, peta dan tracker tidak perlu.
+LEAN_BLOCKLIST = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*.mp4", "*.webm",
+    "*mapbox*", "*tiles*", "*maps.googleapis.com*", "*maps.gstatic.com*",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*facebook.net*", "*connect.facebook.*", "*branch.io*", "*segment.io*",
+    "*sentry.io*", "*hotjar.com*", "*onetrust.com*", "*cookielaw.org*",
+]
+
+def lean_blocklist(args: argparse.Namespace) -> Optional[List[str]]:
+    """Blocklist efektif untuk --lean (default + --block-pattern + --blocklist-file), None bila tidak lean."""
+    if not args.lean:
+        return None
+    patterns = list(LEAN_BLOCKLIST)
+    patterns.extend(args.block_pattern or [])
+    if args.blocklist_file:
+        with open(args.blocklist_file, encoding="utf-8") as f:
+            patterns.extend(l.strip() for l in f if l.strip() and not l.lstrip().startswith("#"))
+    return patterns
+
+# Total byte yang benar-benar lewat jaringan untuk dokumen + sub-resource.
+# transferSize = 0 untuk resource dari cache dan resource lintas origin tanpa
+# Timing-Allow-Origin, jadi ini batas bawah.
+_PAGE_BYTES_JS = """
+var n = 0;
+performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'))
+    .forEach(function (e) { n += e.transferSize || 0; });
+return n;
+"""
+
+def page_bytes(drv: webdriver.Chrome) -> Optional[int]:
+    try:
+        return int(drv.execute_script(_PAGE_BYTES_JS))
+    except Exception:
+        return None
 
 # ──────────────────────────────────────────────────────────────────────────────
-# Ekstraksi JSON / payload
+# Statistik run (latensi per tahap)
 # ──────────────────────────────────────────────────────────────────────────────
-def _sanitize(raw: str) -> str:
-    junk = "]) }while(1);</x>"
-    return raw[len(junk) :] if raw.startswith(junk) else raw
+# Batas bucket histogram Prometheus (kumulatif, "le"); tetap sepanjang run.
+STAGE_BUCKETS_S = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120)
+STAGE_BUCKETS_KB = (4, 16, 64, 128, 256, 512, 1024, 2048, 4096, 16384)
+STATS_RESERVOIR = 4096  # sampel per tahap untuk p50/p95 ringkasan akhir run
 
-def _find_json_in_scripts(html: str) -> Dict[str, Any]:
-    soup = BeautifulSoup(html, "html.parser")
-    sc = soup.find("script", id="__NEXT_DATA__")
-    if sc and sc.string:
-        try:
-            return json.loads(_sanitize(sc.string))
-        except Exception:
-            pass
-    for sc in soup.find_all("script", type="application/json"):
-        txt = sc.get_text()
-        if '"pageProps"' in txt and '"activity"' in txt:
-            try:
-                return json.loads(txt)
-            except Exception:
-                continue
-    return {}
 
-def _json_from_js_execution(drv: webdriver.Chrome) -> Dict[str, Any]:
+class _Series:
+    """Satu tahap: n + total persis, hitungan per bucket, reservoir sampel terbatas."""
+
+    __slots__ = ("bounds", "buckets", "n", "total", "sample")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)  # slot terakhir = +Inf
+        self.n = 0
+        self.total = 0.0
+        self.sample: List[float] = []
+
+    def add(self, value: float, rng: random.Random) -> None:
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.n += 1
+        self.total += value
+        # reservoir sampling (Algorithm R): memori tetap, sampel tetap seragam
+        if len(self.sample) < STATS_RESERVOIR:
+            self.sample.append(value)
+        else:
+            j = rng.randrange(self.n)
+            if j < STATS_RESERVOIR:
+                self.sample[j] = value
+
+
+class Stats:
+    """
+    Durasi per tahap + penghitung kejadian (tier ekstraksi, gagal per alasan);
+    thread-safe supaya bisa dipakai semua worker. Memori per tahap tetap:
+    n/total persis, bucket histogram untuk /metrics dan reservoir sampel untuk
+    p50/p95 ringkasan. Opsional: setiap observasi juga ditulis ke file NDJSON
+    (open_ndjson) dan disajikan dalam format teks Prometheus di /metrics (serve).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._obs: Dict[str, _Series] = {}
+        self._counts: Dict[str, int] = {}
+        self._rng = random.Random()
+        self._ndjson = None
+        self._server = None
+
+    def observe(self, stage: str, value: float) -> None:
+        with self._lock:
+            series = self._obs.get(stage)
+            if series is None:
+                bounds = STAGE_BUCKETS_KB if stage.endswith(".kb") else STAGE_BUCKETS_S
+                series = self._obs[stage] = _Series(bounds)
+            series.add(value, self._rng)
+            self._emit("timer", stage, value)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + n
+            self._emit("counter", name, n)
+
+    @contextmanager
+    def timed(self, stage: str):
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.monotonic() - t0)
+
+    def values(self, stage: str) -> List[float]:
+        """Sampel observasi (persis selama n <= STATS_RESERVOIR)."""
+        with self._lock:
+            series = self._obs.get(stage)
+            return list(series.sample) if series else []
+
+    def count(self, stage: str) -> int:
+        with self._lock:
+            series = self._obs.get(stage)
+            return series.n if series else 0
+
+    def total(self, stage: str) -> float:
+        with self._lock:
+            series = self._obs.get(stage)
+            return series.total if series else 0.0
+
+    def counts(self, prefix: str = "") -> Dict[str, int]:
+        with self._lock:
+            return {k: v for k, v in self._counts.items() if k.startswith(prefix)}
+
+    # ── ekspor ─────────────────────────────────────────────────────
+    def _emit(self, kind: str, name: str, value: float) -> None:
+        # dipanggil dengan _lock dipegang
+        if self._ndjson is not None:
+            self._ndjson.write(json.dumps({"ts": round(time.time(), 3), "type": kind, "name": name, "value": value}) + "\n")
+
+    def open_ndjson(self, path: str) -> None:
+        with self._lock:
+            self._ndjson = open(path, "a", encoding="utf-8", buffering=1 << 16)
+
+    def prometheus(self) -> str:
+        # hanya menyalin bucket berukuran tetap di bawah lock; tanpa sort
+        with self._lock:
+            obs = {k: (v.bounds, list(v.buckets), v.total, v.n) for k, v in self._obs.items() if v.n}
+            counts = dict(self._counts)
+        lines = [
+            "# TYPE strava_stage_seconds histogram",
+            "# TYPE strava_stage_kilobytes histogram",
+            "# TYPE strava_events_total counter",
+        ]
+        for stage, (bounds, buckets, total, n) in sorted(obs.items()):
+            metric = "strava_stage_kilobytes" if stage.endswith(".kb") else "strava_stage_seconds"
+            cum = 0
+            for le, c in zip(bounds, buckets):
+                cum += c
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{le}"}} {cum}')
+            lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {n}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {n}')
+        for name, n in sorted(counts.items()):
+            lines.append(f'strava_events_total{{event="{name}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "0.0.0.0") -> None:
+        """Endpoint GET /metrics (format teks Prometheus) di thread latar."""
+        stats = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = stats.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *a):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._lock:
+            if self._ndjson is not None:
+                self._ndjson.close()
+                self._ndjson = None
+
+    # ── ringkasan ──────────────────────────────────────────────────
+    @staticmethod
+    def _pct(sorted_vals: List[float], p: float) -> float:
+        idx = min(len(sorted_vals) - 1, max(0, int(round(p * (len(sorted_vals) - 1)))))
+        return sorted_vals[idx]
+
+    def summary(self) -> str:
+        with self._lock:
+            items = sorted((k, v.n, v.total, list(v.sample)) for k, v in self._obs.items() if v.n)
+        lines = []
+        for stage, n, total, sample in items:
+            v = sorted(sample)
+            u = "KB" if stage.endswith(".kb") else "s"
+            lines.append(
+                f"    {stage:<20} n={n:<6} mean={total / n:6.2f}{u} "
+                f"p50={self._pct(v, .5):6.2f}{u} p95={self._pct(v, .95):6.2f}{u} "
+                f"total={total:8.1f}{u}"
+            )
+        return "\n".join(lines)
+
+STATS = Stats()
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Cache halaman mentah (content-addressed, terkompresi)
+# ──────────────────────────────────────────────────────────────────────────────
+try:
+    import zstandard
+except ImportError:          # opsional; tanpa zstandard cache memakai gzip
+    zstandard = None
+
+class PageCache:
+    """
+    Simpan page_source mentah (dan JSON hasil tier JS/CDP) di disk supaya
+    ekstraksi bisa diulang tanpa scraping ulang (--replay).
+
+      <root>/objects/ab/<sha256>.zst|.gz   isi terkompresi, dedup per hash isi
+      <root>/index.sqlite                  (kind, key) → hash, ath_id, waktu
+
+    `kind` = 'activity' (key activity_id) atau 'athlete' (key strava_id).
+    Entri lebih tua dari `ttl_days` dan entri tertua saat total ukuran melewati
+    `max_mb` dibuang oleh evict(); objek tanpa referensi ikut dihapus. evict()
+    juga jalan selama run: begitu ukuran yang dilacak put() melewati `max_mb`
+    (dibuang sampai ±90% batas) dan tiap `evict_every` put untuk TTL.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        *,
+        ttl_days: Optional[float] = 30,
+        max_mb: Optional[float] = 2048,
+        evict_every: int = 1000,
+    ):
+        self.root = root
+        self.ttl_days = ttl_days
+        self.max_bytes = int(max_mb * 1024 * 1024) if max_mb else None
+        self.evict_every = max(1, evict_every)
+        self.codec = "zst" if zstandard is not None else "gz"
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self._db = sqlite3.connect(
+            os.path.join(root, "index.sqlite"), timeout=30, isolation_level=None, check_same_thread=False,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS pages (
+                 kind TEXT NOT NULL, key TEXT NOT NULL, ath_id TEXT,
+                 sha TEXT NOT NULL, cap_sha TEXT, ts REAL NOT NULL,
+                 PRIMARY KEY (kind, key))"""
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS objects (sha TEXT PRIMARY KEY, codec TEXT NOT NULL, size INTEGER NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+        self._n_puts = 0
+
+    # ── blob ───────────────────────────────────────────────────────
+    def _path(self, sha: str, codec: str) -> str:
+        return os.path.join(self.root, "objects", sha[:2], f"{sha}.{codec}")
+
+    def _put_blob(self, data: bytes) -> str:
+        sha = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM objects WHERE sha = ?", (sha,)).fetchone():
+                return sha
+        if self.codec == "zst":
+            blob = zstandard.ZstdCompressor(level=10).compress(data)
+        else:
+            blob = gzip.compress(data, compresslevel=6)
+        path = self._path(sha, self.codec)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, path)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO objects (sha, codec, size) VALUES (?, ?, ?)", (sha, self.codec, len(blob)),
+            )
+            self._size += len(blob)
+        return sha
+
+    def _get_blob(self, sha: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._db.execute("SELECT codec FROM objects WHERE sha = ?", (sha,)).fetchone()
+        if not row:
+            return None
+        try:
+            with open(self._path(sha, row[0]), "rb") as f:
+                blob = f.read()
+        except OSError:
+            return None
+        if row[0] == "zst":
+            return zstandard.ZstdDecompressor().decompress(blob)
+        return gzip.decompress(blob)
+
+    # ── API ────────────────────────────────────────────────────────
+    def put(
+        self,
+        kind: str,
+        key: str,
+        html: str,
+        *,
+        ath_id: Optional[str] = None,
+        captured: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        sha = self._put_blob(html.encode("utf-8"))
+        cap_sha = self._put_blob(json.dumps(captured).encode("utf-8")) if captured else None
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages (kind, key, ath_id, sha, cap_sha, ts) VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, str(key), ath_id and str(ath_id), sha, cap_sha, time.time()),
+            )
+            self._n_puts += 1
+            due = (self.max_bytes and self._size > self.max_bytes) or self._n_puts % self.evict_every == 0
+        if due:
+            self.evict()
+
+    def _fresh_after(self) -> float:
+        return time.time() - self.ttl_days * 86400 if self.ttl_days else 0.0
+
+    def get(self, kind: str, key: str) -> Optional[Tuple[str, Optional[Dict[str, Any]], Optional[str]]]:
+        """(html, captured, ath_id) atau None bila tidak ada / kedaluwarsa."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT sha, cap_sha, ath_id FROM pages WHERE kind = ? AND key = ? AND ts >= ?",
+                (kind, str(key), self._fresh_after()),
+            ).fetchone()
+        if not row:
+            return None
+        data = self._get_blob(row[0])
+        if data is None:
+            return None
+        cap = self._get_blob(row[1]) if row[1] else None
+        return data.decode("utf-8"), (json.loads(cap) if cap else None), row[2]
+
+    def keys(self, kind: str) -> List[Tuple[str, Optional[str]]]:
+        """Semua (key, ath_id) yang belum kedaluwarsa."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, ath_id FROM pages WHERE kind = ? AND ts >= ? ORDER BY key",
+                (kind, self._fresh_after()),
+            ).fetchall()
+        return [(str(k), a) for k, a in rows]
+
+    def evict(self) -> Tuple[int, int]:
+        """Buang entri kedaluwarsa / melebihi batas ukuran. Return (entri, objek) yang dihapus."""
+        with self._lock:
+            n_pages = self._db.execute("DELETE FROM pages WHERE ts < ?", (self._fresh_after(),)).rowcount
+            if self.max_bytes:
+                total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+                if total > self.max_bytes:
+                    # buang sampai di bawah batas dengan sedikit ruang, supaya
+                    # put() berikutnya tidak langsung memicu evict lagi
+                    target = self.max_bytes * 0.9
+                    # entri tertua dulu; ukuran per entri = html + captured
+                    rows = self._db.execute(
+                        """SELECT p.kind, p.key, COALESCE(o1.size, 0) + COALESCE(o2.size, 0)
+                           FROM pages p
+                           LEFT JOIN objects o1 ON o1.sha = p.sha
+                           LEFT JOIN objects o2 ON o2.sha = p.cap_sha
+                           ORDER BY p.ts"""
+                    ).fetchall()
+                    for kind, key, size in rows:
+                        if total <= target:
+                            break
+                        self._db.execute("DELETE FROM pages WHERE kind = ? AND key = ?", (kind, key))
+                        total -= size
+                        n_pages += 1
+            orphans = self._db.execute(
+                """SELECT sha, codec FROM objects
+                   WHERE sha NOT IN (SELECT sha FROM pages)
+                     AND sha NOT IN (SELECT cap_sha FROM pages WHERE cap_sha IS NOT NULL)"""
+            ).fetchall()
+            for sha, codec in orphans:
+                try:
+                    os.remove(self._path(sha, codec))
+                except OSError:
+                    pass
+                self._db.execute("DELETE FROM objects WHERE sha = ?", (sha,))
+            self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+        return n_pages, len(orphans)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+PAGE_CACHE: Optional[PageCache] = None
+
+def _cache_put(kind: str, key: str, html: str, **kw) -> None:
+    if PAGE_CACHE is None or not html:
+        return
+    try:
+        PAGE_CACHE.put(kind, key, html, **kw)
+    except Exception as e:
+        print(f"[!] Gagal menyimpan cache {kind} {key}: {e}", file=sys.stderr)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Rate limiter adaptif (token bucket + AIMD), state dibagi antar proses/mesin
+# ──────────────────────────────────────────────────────────────────────────────
+try:
+    import fcntl
+except ImportError:          # Windows
+    fcntl = None
+    import msvcrt
+
+# Halaman pembatasan Strava: kecil, tanpa data halaman normal.
+_THROTTLE_RE = re.compile(
+    r"too many requests|rate limit(?:ed| exceeded)|unusual traffic|"
+    r"temporarily (?:blocked|unavailable)|please try again (?:later|in a few minutes)",
+    re.I,
+)
+
+def is_throttled(html: str, status: Optional[int] = None) -> bool:
+    if status in (429, 503):
+        return True
+    if not html or "__NEXT_DATA__" in html or "pageView" in html:
+        return False
+    return bool(_THROTTLE_RE.search(html))
+
+class _LocalRateState:
+    """State limiter di memori (satu proses)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._st: Dict[str, float] = {}
+
+    def transact(self, fn: Callable[[Dict[str, float]], Any]) -> Any:
+        with self._lock:
+            return fn(self._st)
+
+    def close(self) -> None:
+        pass
+
+class FileRateState:
+    """State limiter di file JSON, dikunci (flock / msvcrt) per transaksi; dibagi semua proses di satu mesin."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        open(path, "a").close()
+
+    @staticmethod
+    def _flock(f, lock: bool) -> None:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if lock else fcntl.LOCK_UN)
+            return
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if lock else msvcrt.LK_UNLCK, 1)
+                return
+            except OSError:
+                if not lock:
+                    return
+                time.sleep(0.05)
+
+    def transact(self, fn: Callable[[Dict[str, float]], Any]) -> Any:
+        with self._lock, open(self.path, "r+", encoding="utf-8") as f:
+            self._flock(f, True)
+            try:
+                f.seek(0)
+                try:
+                    st = json.loads(f.read() or "{}")
+                except ValueError:
+                    st = {}
+                out = fn(st)
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(st))
+                f.flush()
+                return out
+            finally:
+                self._flock(f, False)
+
+    def close(self) -> None:
+        pass
+
+_RATE_DDL = """
+CREATE TABLE IF NOT EXISTS strava_rate_limit (
+  name        VARCHAR(64) NOT NULL PRIMARY KEY,
+  state       JSON        NOT NULL,
+  updated_at  TIMESTAMP   NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB
+"""
+
+class DbRateState:
+    """State limiter di satu baris MySQL (SELECT … FOR UPDATE); dibagi semua mesin/shard."""
+
+    def __init__(self, db, name: str = "strava"):
+        self.db = db             # DbPool atau koneksi pymysql
+        self.name = name
+        self._lock = threading.Lock()
+
+        def init(conn) -> None:
+            cur = conn.cursor()
+            try:
+                cur.execute(_RATE_DDL)
+                cur.execute("INSERT IGNORE INTO strava_rate_limit (name, state) VALUES (%s, '{}')", (name,))
+                conn.commit()
+            finally:
+                cur.close()
+
+        db_call(db, init)
+
+    def transact(self, fn: Callable[[Dict[str, float]], Any]) -> Any:
+        def body(conn) -> Any:
+            conn.begin()
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT state FROM strava_rate_limit WHERE name = %s FOR UPDATE", (self.name,))
+                row = cur.fetchone()
+                raw = (row["state"] if isinstance(row, dict) else row[0]) if row else None
+                st = json.loads(raw) if raw else {}
+                out = fn(st)
+                cur.execute("UPDATE strava_rate_limit SET state = %s WHERE name = %s", (json.dumps(st), self.name))
+                conn.commit()
+                return out
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                raise
+            finally:
+                cur.close()
+
+        with self._lock:
+            return db_call(self.db, body)
+
+    def close(self) -> None:
+        if isinstance(self.db, DbPool):
+            return               # pool milik pemanggil
+        try:
+            self.db.close()
+        except Exception:
+            pass
+
+class RateLimiter:
+    """
+    Token bucket (GCRA) dengan AIMD: tiap halaman sukses menaikkan laju
+    `step` req/s sampai `max_rate`; halaman/respons throttle memotong laju
+    jadi separuh dan menahan SEMUA request selama backoff eksponensial
+    (`backoff` · 2^(strike-1), maks `max_backoff`). Dengan state bersama
+    (FileRateState / DbRateState) semua worker, proses dan shard berbagi
+    satu anggaran request.
+    """
+
+    def __init__(
+        self,
+        state=None,
+        *,
+        rate: float = 1.0,
+        min_rate: float = 0.05,
+        max_rate: float = 10.0,
+        burst: int = 3,
+        step: float = 0.02,
+        backoff: float = 30.0,
+        max_backoff: float = 900.0,
+    ):
+        self.state = state or _LocalRateState()
+        self.rate0 = rate
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, rate)
+        self.burst = max(1, burst)
+        self.step = step
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def _defaults(self, st: Dict[str, float]) -> None:
+        st.setdefault("rate", self.rate0)
+        st.setdefault("tat", 0.0)
+        st.setdefault("cooldown_until", 0.0)
+        st.setdefault("strikes", 0)
+
+    def acquire(self) -> float:
+        """Ambil satu slot request; tidur sampai slot tiba. Return detik menunggu."""
+        def take(st):
+            self._defaults(st)
+            now = time.time()
+            interval = 1.0 / st["rate"]
+            slot = max(st["tat"], now - (self.burst - 1) * interval, st["cooldown_until"])
+            st["tat"] = slot + interval
+            return slot - now
+
+        wait = self.state.transact(take)
+        if wait > 0:
+            STATS.observe("rate.wait", wait)
+            time.sleep(wait)
+        return max(0.0, wait)
+
+    def ok(self) -> None:
+        def up(st):
+            self._defaults(st)
+            st["rate"] = min(self.max_rate, st["rate"] + self.step)
+            if st["strikes"] and time.time() > st["cooldown_until"] + self.backoff:
+                st["strikes"] = 0
+
+        self.state.transact(up)
+
+    def throttled(self) -> None:
+        def down(st):
+            self._defaults(st)
+            now = time.time()
+            if now < st["cooldown_until"]:
+                return None      # worker lain sudah mengerem
+            st["strikes"] += 1
+            st["rate"] = max(self.min_rate, st["rate"] / 2)
+            pause = min(self.max_backoff, self.backoff * 2 ** (st["strikes"] - 1))
+            st["cooldown_until"] = now + pause
+            st["tat"] = st["cooldown_until"]
+            return st["rate"], pause
+
+        STATS.incr("rate.throttled")
+        hit = self.state.transact(down)
+        if hit:
+            print(f"[!] Strava membatasi request: laju → {hit[0]:.2f} req/s, jeda {hit[1]:.0f}s", file=sys.stderr)
+
+    def current_rate(self) -> float:
+        def read(st):
+            self._defaults(st)
+            return st["rate"]
+
+        return self.state.transact(read)
+
+    def close(self) -> None:
+        self.state.close()
+
+LIMITER: Optional[RateLimiter] = None
+
+def _navigate(drv: webdriver.Chrome, url: str) -> None:
+    if LIMITER is not None:
+        LIMITER.acquire()
+    drv.get(url)
+
+def _check_throttle(html: str, status: Optional[int] = None) -> None:
+    """Halaman throttle → beri tahu limiter lalu ScrapeError('throttled'); selain itu hitung sukses."""
+    if is_throttled(html, status):
+        if LIMITER is not None:
+            LIMITER.throttled()
+        raise ScrapeError("throttled", "Strava membatasi request (rate limit)")
+    if LIMITER is not None:
+        LIMITER.ok()
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Ekstraksi JSON / payload
+# ──────────────────────────────────────────────────────────────────────────────
+_LXML_PARSER = lxml_html.HTMLParser(encoding="utf-8", huge_tree=True) if lxml_html is not None else None
+
+def _sanitize(raw: str) -> str:
+    junk = "]) }while(1);</x>"
+    return raw[len(junk) :] if raw.startswith(junk) else raw
+
+def _json_from_script_texts(next_txt: Optional[str], json_txts: Iterable[str]) -> Dict[str, Any]:
+    if next_txt:
+        try:
+            return json.loads(_sanitize(next_txt))
+        except Exception:
+            pass
+    for txt in json_txts:
+        if '"pageProps"' in txt and '"activity"' in txt:
+            try:
+                return json.loads(txt)
+            except Exception:
+                continue
+    return {}
+
+_RE_ELAPSED = re.compile("Elapsed Time", re.I)
+_RE_PACE = re.compile(r"\bPace\b", re.I)
+
+def _only_string(el) -> Optional[str]:
+    """Padanan lxml untuk Tag.string milik BeautifulSoup (tepat satu anak teks)."""
+    n_children = (1 if el.text else 0) + sum(1 + (1 if c.tail else 0) for c in el)
+    if n_children != 1:
+        return None
+    if el.text:
+        return el.text
+    child = el[0]
+    if not isinstance(child.tag, str):          # komentar
+        return child.text
+    return _only_string(child)
+
+def _scan_lxml(html: str) -> Dict[str, Any]:
+    try:
+        root = lxml_html.fromstring(html.encode("utf-8"), parser=_LXML_PARSER)
+    except (lxml_etree.ParserError, ValueError):
+        return _scan_empty()
+
+    next_txt: Optional[str] = None
+    json_txts: List[str] = []
+    time_raw = title = elapsed = pace = None
+    lab_elapsed = lab_pace = None
+
+    # satu kali jalan di pohon dokumen untuk semua field
+    for el in root.iter("script", "time", "span"):
+        tag = el.tag
+        if tag == "script":
+            if next_txt is None and el.get("id") == "__NEXT_DATA__":
+                next_txt = el.text or ""
+            elif el.get("type") == "application/json":
+                json_txts.append(el.text or "")
+        elif tag == "time":
+            # regex lama: <time ...>teks</time> pertama yang tanpa elemen anak
+            if time_raw is None and len(el) == 0 and el.text:
+                time_raw = el.text.strip()
+        else:
+            if title is None and "title" in (el.get("class") or "").split():
+                title = el.text_content()
+            if lab_elapsed is None or lab_pace is None:
+                txt = _only_string(el)
+                if txt is not None:
+                    if lab_elapsed is None and _RE_ELAPSED.search(txt):
+                        lab_elapsed = el
+                    if lab_pace is None and _RE_PACE.search(txt):
+                        lab_pace = el
+
+    if lab_elapsed is not None:
+        # find_parent().find_next("strong") → strong pertama setelah awal parent
+        parent = lab_elapsed.getparent()
+        hit = parent.xpath("(descendant::strong | following::strong)[1]") if parent is not None else []
+        if hit:
+            elapsed = hit[0].text_content().strip()
+    if lab_pace is not None:
+        # find_previous("strong") → strong terdekat sebelum label (termasuk leluhur)
+        hit = lab_pace.xpath("(ancestor::strong | preceding::strong)[last()]")
+        if hit:
+            pace = hit[0].text_content().strip()
+
+    return {
+        "next_data": _json_from_script_texts(next_txt, json_txts),
+        "time": time_raw,
+        "title": title,
+        "elapsed": elapsed,
+        "pace": pace,
+    }
+
+def _scan_bs4(html: str) -> Dict[str, Any]:
+    """Fallback bila lxml tidak terpasang: tetap satu soup per halaman."""
+    soup = BeautifulSoup(html, "html.parser")
+    sc = soup.find("script", id="__NEXT_DATA__")
+    json_txts = (s.get_text() for s in soup.find_all("script", type="application/json"))
+    m = re.search(r'<time[^>]*>\s*([^<]+?)\s*</time>', html, re.I)
+    title_span = soup.select_one("span.title")
+
+    elapsed = pace = None
+    lab = soup.find("span", string=_RE_ELAPSED)
+    if lab:
+        strong = lab.find_parent().find_next("strong")
+        if strong:
+            elapsed = strong.text.strip()
+    lab = soup.find("span", string=_RE_PACE)
+    if lab:
+        strong = lab.find_previous("strong")
+        if strong:
+            pace = strong.text.strip()
+
+    return {
+        "next_data": _json_from_script_texts(sc.string if sc else None, json_txts),
+        "time": m.group(1).strip() if m else None,
+        "title": title_span.text if title_span else None,
+        "elapsed": elapsed,
+        "pace": pace,
+    }
+
+def _scan_empty() -> Dict[str, Any]:
+    return {"next_data": {}, "time": None, "title": None, "elapsed": None, "pace": None}
+
+def scan_page(html: str) -> Dict[str, Any]:
+    """
+    Parse halaman sekali dan ambil semua yang dibutuhkan ekstraktor:
+    JSON __NEXT_DATA__, teks <time>, span.title, Elapsed Time, Pace.
+    """
+    if not html:
+        return _scan_empty()
+    return _scan_lxml(html) if lxml_html is not None else _scan_bs4(html)
+
+def _find_json_in_scripts(html: str) -> Dict[str, Any]:
+    return scan_page(html)["next_data"]
+
+def _json_from_js_execution(drv: webdriver.Chrome) -> Dict[str, Any]:
     script = """
     try {
         var activityData = window.pageView.activity().attributes;
@@ -236,7 +2098,74 @@ def _json_from_js_execution(drv: webdriver.Chrome) -> Dict[str, Any]:
     except Exception:
         return {}
 
-def _json_from_cdp(drv: webdriver.Chrome, act_id: str, timeout: int = 5) -> Dict[str, Any]:
+# Dipasang sebelum skrip halaman berjalan. URL difilter di browser; hanya respons
+# api/v4/activities/<id> yang di-parse dan disimpan di window.__stravaCapture
+# (per dokumen, jadi tidak menumpuk antar halaman), lalu langsung diteruskan
+# ke pemanggil _CAPTURE_WAIT_JS yang sedang menunggu.
+_CAPTURE_HOOK_JS = r"""
+(function () {
+    if (window.__stravaCapture) return;
+    var RE = /api\/v4\/activities\/(\d+)(?:[?#]|$)/;
+    var cap = window.__stravaCapture = {data: {}, waiters: {}};
+    function deliver(url, text) {
+        var m = RE.exec(url || '');
+        if (!m) return;
+        var body;
+        try { body = JSON.parse(text); } catch (e) { return; }
+        cap.data[m[1]] = body;
+        (cap.waiters[m[1]] || []).splice(0).forEach(function (cb) { cb(body); });
+    }
+    var origFetch = window.fetch;
+    if (origFetch) {
+        window.fetch = function (input) {
+            var url = typeof input === 'string' ? input : (input && input.url) || '';
+            var p = origFetch.apply(this, arguments);
+            if (RE.test(url)) {
+                p.then(function (r) {
+                    r.clone().text().then(function (t) { deliver(r.url || url, t); });
+                }).catch(function () {});
+            }
+            return p;
+        };
+    }
+    var origOpen = XMLHttpRequest.prototype.open;
+    XMLHttpRequest.prototype.open = function (method, url) {
+        var u = String(url);
+        if (RE.test(u)) {
+            this.addEventListener('load', function () {
+                try {
+                    deliver(u, this.responseType === 'json' ? JSON.stringify(this.response) : this.responseText);
+                } catch (e) {}
+            });
+        }
+        return origOpen.apply(this, arguments);
+    };
+})();
+"""
+
+_CAPTURE_WAIT_JS = """
+var id = arguments[0], ms = arguments[1], done = arguments[arguments.length - 1];
+var cap = window.__stravaCapture;
+if (!cap) return done(null);
+if (cap.data[id]) return done(cap.data[id]);
+var t = setTimeout(function () { done(null); }, ms);
+(cap.waiters[id] = cap.waiters[id] || []).push(function (b) { clearTimeout(t); done(b); });
+"""
+
+def _json_from_cdp(
+    drv: webdriver.Chrome,
+    act_id: str,
+    timeout: int = 5,
+    mode: str = "hook",
+) -> Dict[str, Any]:
+    if mode == "hook":
+        try:
+            data = drv.execute_async_script(_CAPTURE_WAIT_JS, str(act_id), int(timeout * 1000))
+        except Exception:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    # mode 'log': polling performance log (butuh build_chrome(cdp_capture='log'))
     t_end = time.time() + timeout
     while time.time() < t_end:
         try:
@@ -308,38 +2237,12 @@ def _extract_data_from_legacy_scripts(html_source: str) -> Dict[str, Any]:
         print(f"[!] Regex extraction error: {e}", file=sys.stderr)
     return {}
 
-def get_activity_payload(
-    drv: webdriver.Chrome,
-    act_id: str,
-    wait: int,
-    use_cdp: bool
-) -> Dict[str, Any]:
-
-    time.sleep(5)
-    html_source = drv.page_source
-    act: Dict[str, Any] = {}
-
-    # 1) Modern NEXT.js
-    data = _find_json_in_scripts(html_source)
-    act = data.get("props", {}).get("pageProps", {}).get("activity", {})
-
-    # 2) Legacy JS
-    if not act:
-        act = _json_from_js_execution(drv)
-
-    # 3) Regex fallback lama
-    if not act:
-        act = _extract_data_from_legacy_scripts(html_source)
-
-    # 4) CDP
-    if not act and use_cdp:
-        act = _json_from_cdp(drv, act_id)
-
+def _fill_page_fields(act: Dict[str, Any], page: Dict[str, Any]) -> None:
+    """Lengkapi payload dengan field yang hanya ada di markup halaman (hasil scan_page)."""
     # ➊ tanggal dari <time>
     if "start_date" not in act:
-        m = re.search(r'<time[^>]*>\s*([^<]+?)\s*</time>', html_source, re.I)
-        if m:
-            raw = m.group(1).strip()
+        raw = page["time"]
+        if raw is not None:
             dt_obj = None
             for fmt in ("%I:%M %p on %A, %B %d, %Y",   # 2)
                         "%A, %B %d, %Y"):               # 1)
@@ -354,39 +2257,267 @@ def get_activity_payload(
             else:
                 # format belum dikenali → abaikan (atau simpan string mentah)
                 act["start_date"] = None
-                
-    # === Tambahan: ambil <time> + sport/elapsed/pace ================
-
-    soup = BeautifulSoup(html_source, "html.parser")
 
     # ➋ sport type  (Walk / Run / Ride …)
     if "sport_type" not in act:
-        title_span = soup.select_one("span.title")
-        if title_span and "–" in title_span.text:
-            act["sport_type"] = title_span.text.split("–")[-1].strip()
+        title = page["title"]
+        if title and "–" in title:
+            act["sport_type"] = title.split("–")[-1].strip()
 
     # ➌ elapsed time
-    if "elapsed_time" not in act:
-        lab = soup.find("span", string=re.compile("Elapsed Time", re.I))
-        if lab:
-            strong = lab.find_parent().find_next("strong")
-            if strong:
-                txt = strong.text.strip()
-                act["elapsed_time"]      = txt
-                act["elapsed_time_sec"]  = _hms_to_sec(txt)
+    if "elapsed_time" not in act and page["elapsed"] is not None:
+        txt = page["elapsed"]
+        act["elapsed_time"]      = txt
+        act["elapsed_time_sec"]  = _hms_to_sec(txt)
 
     # ➍ pace
-    if "pace_per_km" not in act:
-        lab = soup.find("span", string=re.compile(r"\bPace\b", re.I))
-        if lab:
-            strong = lab.find_previous("strong")  # li > strong sebelum span.label
-            if strong:
-                txt = strong.text.strip()         # '9:42 /km'
-                act["pace_per_km"]     = txt
-                act["pace_sec_per_km"] = _pace_to_sec(txt)
+    if "pace_per_km" not in act and page["pace"] is not None:
+        txt = page["pace"]                # '9:42 /km'
+        act["pace_per_km"]     = txt
+        act["pace_sec_per_km"] = _pace_to_sec(txt)
+
+def payload_from_html(html_source: str) -> Dict[str, Any]:
+    """
+    Ekstraksi statis dari HTML mentah (tanpa browser): __NEXT_DATA__ lalu
+    regex legacy. Return {} bila keduanya kosong, supaya pemanggil bisa
+    jatuh kembali ke Selenium.
+    """
+    page = scan_page(html_source)
+    act = page["next_data"].get("props", {}).get("pageProps", {}).get("activity", {})
+    tier = "next"
+    if not act:
+        tier = "regex"
+        act = _extract_data_from_legacy_scripts(html_source)
+    STATS.incr(f"http.tier.{tier if act else 'none'}")
+    if not act:
+        return {}
+    _fill_page_fields(act, page)
+    return act
+
+# Penanda bahwa data aktivitas sudah ada di halaman. Dievaluasi di browser
+# sehingga satu round-trip WebDriver per polling.
+_READY_JS = """
+var actId = arguments[0];
+if (document.getElementById('__NEXT_DATA__')) return 'next';
+var sc = document.querySelectorAll('script[type="application/json"]');
+for (var i = 0; i < sc.length; i++) {
+    var t = sc[i].textContent || '';
+    if (t.indexOf('"pageProps"') >= 0 && t.indexOf('"activity"') >= 0) return 'next';
+}
+try {
+    var a = window.pageView && window.pageView.activity && window.pageView.activity();
+    if (a && a.attributes && Object.keys(a.attributes).length) return 'legacy';
+} catch (e) {}
+try {
+    var hit = performance.getEntriesByType('resource').some(function (e) {
+        return e.name.indexOf('api/v4/activities/' + actId) >= 0 && e.responseEnd > 0;
+    });
+    if (hit) return 'api';
+} catch (e) {}
+return document.readyState;
+"""
+
+def wait_activity_ready(
+    drv: webdriver.Chrome,
+    act_id: str,
+    timeout: float,
+    settle: float = 1.5,
+) -> str:
+    """
+    Tunggu sampai data aktivitas tersedia (__NEXT_DATA__, window.pageView,
+    atau respons api/v4/activities/<id>), maksimal `timeout` detik.
+    Bila dokumen sudah 'complete' tapi penanda belum muncul, tunggu paling lama
+    `settle` detik lagi lalu lanjut (halaman error / format tak dikenal).
+    Return penanda yang ditemukan: 'next' | 'legacy' | 'api' | 'settled' | 'timeout'.
+    """
+    state = {"hit": "timeout", "complete_at": None}
+
+    def _ready(d) -> bool:
+        r = d.execute_script(_READY_JS, str(act_id))
+        if r in ("next", "legacy", "api"):
+            state["hit"] = r
+            return True
+        if r == "complete":
+            now = time.monotonic()
+            if state["complete_at"] is None:
+                state["complete_at"] = now
+            elif now - state["complete_at"] >= settle:
+                state["hit"] = "settled"
+                return True
+        return False
+
+    try:
+        WebDriverWait(drv, timeout, poll_frequency=0.1).until(_ready)
+    except TimeoutException:
+        pass
+    return state["hit"]
+
+# ───────── urutan tier adaptif ─────────
+class TierPlanner:
+    """
+    Statistik hit/biaya per tier fallback (js / regex / cdp) dalam jendela
+    bergulir `window` halaman terakhir. plan() mengurutkan tier menurut
+    perkiraan biaya per sukses (rata-rata detik / hit-rate); tier yang hampir
+    tak pernah berhasil digeser ke paling belakang (tetap jadi cadangan
+    terakhir), dan tiap `explore_every` halaman dicoba lebih dulu supaya
+    statistiknya tetap mengikuti perubahan varian halaman Strava.
+    Tier "next" tidak ikut diurutkan: scan_page tetap dibutuhkan untuk field
+    halaman, jadi selalu dicek lebih dulu tanpa biaya tambahan.
+    """
+
+    def __init__(
+        self,
+        tiers: Tuple[str, ...] = ("js", "regex", "cdp"),
+        window: int = 200,
+        min_samples: int = 20,
+        skip_below: float = 0.02,
+        explore_every: int = 25,
+        adaptive: bool = True,
+    ):
+        self.tiers = tiers
+        self.min_samples = min_samples
+        self.skip_below = skip_below
+        self.explore_every = max(1, explore_every)
+        self.adaptive = adaptive
+        self._lock = threading.Lock()
+        self._hist: Dict[str, Deque[Tuple[bool, float]]] = {t: deque(maxlen=window) for t in tiers}
+        self._n_plans = 0
+        self._seen: set = set()     # tier yang pernah tersedia di plan()
+
+    def _rate(self, tier: str) -> Tuple[int, float, float]:
+        # dipanggil dengan _lock dipegang → (n, hit-rate, rata-rata detik)
+        h = self._hist[tier]
+        if not h:
+            return 0, 0.0, 0.0
+        return len(h), sum(1 for hit, _ in h if hit) / len(h), sum(s for _, s in h) / len(h)
+
+    def _order(self, avail: List[str], explore: bool) -> List[str]:
+        # dipanggil dengan _lock dipegang
+        keyed, skipped = [], []
+        for i, t in enumerate(avail):
+            n, rate, cost = self._rate(t)
+            if n < self.min_samples:
+                keyed.append(((0, i), t))            # belum cukup data: urutan lama
+            elif rate < self.skip_below:
+                skipped.append(t)
+            else:
+                keyed.append(((1, cost / rate), t))
+        order = [t for _, t in sorted(keyed)]
+        # tier yang jarang berhasil tidak dibuang: dicoba terakhir (lazy), atau
+        # paling depan saat eksplorasi supaya statistiknya ter-update
+        return skipped + order if explore else order + skipped
+
+    def plan(self, available: Iterable[str]) -> List[str]:
+        """Urutan tier yang dicoba untuk satu halaman (subset dari `available`)."""
+        wanted = set(available)
+        avail = [t for t in self.tiers if t in wanted]
+        if not self.adaptive:
+            return avail
+        with self._lock:
+            self._n_plans += 1
+            self._seen.update(avail)
+            return self._order(avail, explore=self._n_plans % self.explore_every == 0)
+
+    def record(self, tier: str, hit: bool, sec: float) -> None:
+        with self._lock:
+            if tier in self._hist:
+                self._hist[tier].append((hit, sec))
+
+    def summary(self) -> str:
+        with self._lock:
+            rows = {t: self._rate(t) for t in self.tiers}
+            # hanya tier yang tersedia di run ini (mis. cdp tanpa --use-cdp tidak)
+            avail = [t for t in self.tiers if t in self._seen or rows[t][0]]
+            order = self._order(avail, explore=False) if self.adaptive else avail
+        parts = [
+            f"{t}={rate:.0%} hit, {cost * 1e3:.0f}ms (n={n})"
+            for t, (n, rate, cost) in rows.items() if n
+        ]
+        if not parts:
+            return ""
+        return ", ".join(parts) + f"; urutan sekarang: {' → '.join(order)}"
+
+TIER_PLANNER = TierPlanner()
+
+def _browser_tiers(
+    drv: webdriver.Chrome,
+    act_id: str,
+    html_source: Optional[str],
+    use_cdp: bool,
+    cdp_capture: str,
+) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    Jalankan tier fallback dengan urutan dari TIER_PLANNER sampai ada yang
+    berhasil. html_source=None → tier regex tidak dipakai (pipeline parse:
+    regex dijalankan di process pool). Return (data, tier) atau ({}, None).
+    """
+    runners: Dict[str, Callable[[], Dict[str, Any]]] = {
+        "js": lambda: _json_from_js_execution(drv),
+    }
+    if html_source is not None:
+        runners["regex"] = lambda: _extract_data_from_legacy_scripts(html_source)
+    if use_cdp:
+        runners["cdp"] = lambda: _json_from_cdp(drv, act_id, mode=cdp_capture)
+    for tier in TIER_PLANNER.plan(runners):
+        t0 = time.monotonic()
+        act = runners[tier]()
+        sec = time.monotonic() - t0
+        STATS.observe(f"tier.{tier}", sec)
+        TIER_PLANNER.record(tier, bool(act), sec)
+        if act:
+            return act, tier
+    return {}, None
+
+def get_activity_payload(
+    drv: webdriver.Chrome,
+    act_id: str,
+    wait: int,
+    use_cdp: bool,
+    ath_id: Optional[str] = None,
+    cdp_capture: str = "hook",
+) -> Dict[str, Any]:
+
+    t0 = time.monotonic()
+    wait_activity_ready(drv, act_id, timeout=wait)
+    STATS.observe("activity.ready", time.monotonic() - t0)
+    html_source = drv.page_source
+    _check_throttle(html_source)
+    captured: Optional[Dict[str, Any]] = None    # data di luar HTML, untuk cache/replay
+
+    # 1) Modern NEXT.js  (scan_page: satu parse untuk semua field)
+    with STATS.timed("activity.parse"):
+        page = scan_page(html_source)
+    act = page["next_data"].get("props", {}).get("pageProps", {}).get("activity", {})
+    tier: Optional[str] = "next"
+
+    # 2-4) Legacy JS / regex / CDP, urutan adaptif (TIER_PLANNER)
+    if not act:
+        act, tier = _browser_tiers(drv, act_id, html_source, use_cdp, cdp_capture)
+        if tier in ("js", "cdp"):
+            captured = {"tier": tier, "data": act}
 
+    STATS.incr(f"tier.{tier if act else 'none'}")
+    _cache_put("activity", act_id, html_source, ath_id=ath_id, captured=captured)
+    _fill_page_fields(act, page)
     return act
 
+def _replay_tiers(html_source: str, captured: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], str]:
+    page = scan_page(html_source)
+    act = page["next_data"].get("props", {}).get("pageProps", {}).get("activity", {})
+    tier, data = (captured or {}).get("tier"), (captured or {}).get("data") or {}
+    hit = "next"
+    # data yang ditangkap di browser = tier yang dulu berhasil; regex hanya bila tidak ada
+    if not act and tier in ("js", "cdp") and data:
+        act, hit = data, tier
+    if not act:
+        act, hit = _extract_data_from_legacy_scripts(html_source), "regex"
+    _fill_page_fields(act, page)
+    return act, (hit if act else "none")
+
+def replay_payload(html_source: str, captured: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Hasil yang sama dengan get_activity_payload, dari HTML + JSON yang di-cache."""
+    return _replay_tiers(html_source, captured)[0]
+
 
 # ───────── helper parsers ─────────
 def _to_int(v) -> Optional[int]:
@@ -453,71 +2584,1711 @@ def _pace_to_sec(s: str) -> Optional[int]:
 # Ambil aktivitas terbaru per atlet
 # ──────────────────────────────────────────────────────────────────────────────
 
-def recent_activity_ids(
-    drv: webdriver.Chrome,
-    athlete_id: str,
-    *,
-    limit: int,
-    wait: int,
-    scroll: int = 6,
-) -> List[str]:
-    url = f"https://www.strava.com/athletes/{athlete_id}"
-    drv.get(url)
+class ScrapeError(RuntimeError):
+    """Kegagalan yang sudah diketahui penyebabnya; `reason` dicatat di jurnal."""
 
-    WebDriverWait(drv, wait).until(
-        lambda d: f"/athletes/{athlete_id}" in d.current_url
-    )
-    html = drv.page_source
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
 
-    # ── DETEKSI PROFIL PRIVAT / TIDAK ADA ──────────────────────────
+def _check_profile(html: str) -> None:
+    """DETEKSI PROFIL PRIVAT / TIDAK ADA → ScrapeError('private')."""
     if ("limited_profile" in html or
         "This profile is private" in html or
         "page you requested is not available" in html):
-        raise RuntimeError("Profil di-private / tidak ditemukan")
+        raise ScrapeError("private", "Profil di-private / tidak ditemukan")
 
-    # 0️⃣ regex Activity-<id> di script feed ------------------------
-    ids_re = re.findall(r'Activity-(\d{6,})', html)
-    if ids_re:
-        ids_sorted = sorted({int(i) for i in ids_re}, reverse=True)
-        return [str(i) for i in ids_sorted[:limit]]
+class FeedItem(NamedTuple):
+    """
+    Satu aktivitas di feed profil; owner_id None bila pemiliknya tidak terbaca.
+    node = node recentActivities-nya (hanya bila diminta, untuk --summary-only).
+    """
+    act_id: str
+    owner_id: Optional[str]
+    node: Optional[Dict[str, Any]] = None
 
-    # 1️⃣ window.__NEXT_DATA__ --------------------------------------
-    nodes = drv.execute_script("""
-        try {
-          return window.__NEXT_DATA__
-            ?.props?.pageProps?.athlete?.recentActivities?.nodes || [];
-        } catch(e) { return []; }
-    """)
-    if nodes:
-        nodes.sort(key=lambda n: int(n["id"]), reverse=True)
-        return [str(n["id"]) for n in nodes[:limit] if n.get("id")]
+def _newest(
+    pairs: Iterable[Tuple[Any, Any]],
+    limit: int,
+    after: Optional[int] = None,
+    athlete_id: Optional[str] = None,
+    nodes: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> List[FeedItem]:
+    """
+    (act_id, owner) unik terbaru (desc); dengan `after`, hanya yang > watermark.
+    Dengan `athlete_id`, aktivitas milik atlet lain (aktivitas grup di feed)
+    dibuang sebelum `limit` dipotong → tidak pernah dibuka.
+    """
+    owners: Dict[int, Optional[str]] = {}
+    for aid, owner in pairs:
+        aid = int(aid)
+        if owners.get(aid) is None:
+            owners[aid] = str(owner) if owner else None
+    uniq = sorted(owners, reverse=True)
+    if after is not None:
+        uniq = [i for i in uniq if i > after]
+    if athlete_id is not None:
+        own = [i for i in uniq if owners[i] is None or owners[i] == str(athlete_id)]
+        if len(own) < len(uniq):
+            STATS.incr("feed.foreign", len(uniq) - len(own))
+        uniq = own
+    nodes = nodes or {}
+    return [FeedItem(str(i), owners[i], nodes.get(str(i))) for i in uniq[:limit]]
 
-    # 2️⃣ DOM + scroll fallback ------------------------------------
-    def _extract_ids_js():
+# pemilik tiap entri feed: link /athletes/<id> pertama setelah id="Activity-<id>"
+_FEED_ENTRY_RE = re.compile(r'Activity-(\d{6,})')
+_FEED_OWNER_RE = re.compile(r'href="/athletes/(\d+)"')
+
+def _feed_items_from_html(
+    html: str,
+    limit: int,
+    after: Optional[int] = None,
+    athlete_id: Optional[str] = None,
+    nodes: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Optional[List[FeedItem]]:
+    """Aktivitas dari pola Activity-<id> di markup/script feed; None bila pola tidak ada."""
+    hits = list(_FEED_ENTRY_RE.finditer(html))
+    if not hits:
+        return None
+    pairs = []
+    for i, m in enumerate(hits):
+        end = hits[i + 1].start() if i + 1 < len(hits) else len(html)
+        owner = _FEED_OWNER_RE.search(html, m.end(), min(end, m.end() + 4000))
+        pairs.append((m.group(1), owner.group(1) if owner else None))
+    return _newest(pairs, limit, after, athlete_id, nodes)
+
+def _node_owner(node: Dict[str, Any]) -> Optional[Any]:
+    return (node.get("athlete") or {}).get("id") or node.get("athleteId")
+
+def _feed_nodes_from_html(html: str) -> List[Dict[str, Any]]:
+    """Versi statis dari window.__NEXT_DATA__...recentActivities.nodes."""
+    data = _find_json_in_scripts(html)
+    try:
+        nodes = data["props"]["pageProps"]["athlete"]["recentActivities"]["nodes"]
+    except (KeyError, TypeError):
+        return []
+    return [n for n in nodes or [] if isinstance(n, dict) and n.get("id")]
+
+def _nodes_by_id(nodes: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    return {str(n["id"]): n for n in nodes if isinstance(n, dict) and n.get("id")}
+
+def profile_ids_from_html(
+    html: str,
+    limit: int,
+    after: Optional[int] = None,
+    athlete_id: Optional[str] = None,
+    summaries: bool = False,
+) -> Optional[List[FeedItem]]:
+    """
+    Ekstraksi statis aktivitas dari halaman profil (tanpa browser).
+    None = feed tidak terbaca tanpa JS; [] = tidak ada aktivitas di atas `after`.
+    summaries=True → FeedItem.node diisi (untuk --summary-only).
+    """
+    _check_profile(html)
+    nodes = _feed_nodes_from_html(html) if summaries else None
+    items = _feed_items_from_html(html, limit, after, athlete_id, _nodes_by_id(nodes or ()))
+    if items is not None:
+        return items
+    if nodes is None:
+        nodes = _feed_nodes_from_html(html)
+    if not nodes:
+        return None
+    return _newest(
+        ((n["id"], _node_owner(n)) for n in nodes), limit, after, athlete_id,
+        _nodes_by_id(nodes) if summaries else None,
+    )
+
+# ───────── --summary-only: baris aktivitas langsung dari node feed ─────────
+# node recentActivities (camelCase) → key payload halaman aktivitas (extract_metrics)
+_SUMMARY_FIELDS = {
+    "startDate": "start_date",
+    "distance": "distance",
+    "movingTime": "moving_time",
+    "elevationGain": "elev_gain",
+    "sportType": "sport_type",
+    "elapsedTime": "elapsed_time_sec",
+    "calories": "calories",
+    "averageCadence": "avg_cadence",
+    "trainer": "trainer",
+    "name": "name",
+}
+SUMMARY_REQUIRED = ("start_date", "distance", "moving_time", "elev_gain", "sport_type")
+
+def summary_payload(node: Optional[Dict[str, Any]], owner_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Payload bergaya halaman aktivitas dari satu node feed; None bila salah
+    satu field SUMMARY_REQUIRED tidak ada (halaman aktivitas tetap dibuka).
+    """
+    if not node:
+        return None
+    act = {key: node[src] for src, key in _SUMMARY_FIELDS.items() if node.get(src) is not None}
+    if any(act.get(k) is None for k in SUMMARY_REQUIRED):
+        return None
+    ath = node.get("athlete") or {}
+    act["id"] = node.get("id")
+    act["athlete"] = {
+        "id": ath.get("id") or owner_id,
+        "display_name": ath.get("name") or ath.get("displayName"),
+    }
+    act["source"] = "feed_summary"
+    return act
+
+def recent_activity_ids(
+    drv: webdriver.Chrome,
+    athlete_id: str,
+    *,
+    limit: int,
+    wait: int,
+    scroll: int = 6,
+    after: Optional[int] = None,
+    summaries: bool = False,
+) -> List[FeedItem]:
+    """
+    Aktivitas terbaru milik atlet (maks. `limit`) beserta pemiliknya menurut
+    feed. Aktivitas atlet lain yang ikut tampil (aktivitas grup) dibuang di
+    sini, sebelum halamannya dibuka. Dengan `after` (watermark: activity_id
+    tertinggi yang sudah di-scrape) hanya ID di atasnya yang dikembalikan dan
+    scroll berhenti begitu watermark tercapai. summaries=True → FeedItem.node
+    diisi dari __NEXT_DATA__ (untuk --summary-only).
+    """
+    url = f"{STRAVA_URL}/athletes/{athlete_id}"
+    _navigate(drv, url)
+
+    WebDriverWait(drv, wait).until(
+        lambda d: f"/athletes/{athlete_id}" in d.current_url
+    )
+    html = drv.page_source
+    _check_throttle(html)
+    _check_profile(html)
+    # baru di-cache setelah lolos cek: halaman throttle/privat jangan di-replay
+    _cache_put("athlete", athlete_id, html, ath_id=athlete_id)
+
+    # 0️⃣ regex Activity-<id> di script feed ------------------------
+    static_nodes = _nodes_by_id(_feed_nodes_from_html(html)) if summaries else None
+    items = _feed_items_from_html(html, limit, after, athlete_id, static_nodes)
+    if items is not None:
+        return items
+
+    # 1️⃣ window.__NEXT_DATA__ --------------------------------------
+    nodes = drv.execute_script("""
+        try {
+          return window.__NEXT_DATA__
+            ?.props?.pageProps?.athlete?.recentActivities?.nodes || [];
+        } catch(e) { return []; }
+    """)
+    if nodes:
+        return _newest(
+            ((n["id"], _node_owner(n)) for n in nodes if n.get("id")), limit, after, athlete_id,
+            _nodes_by_id(nodes) if summaries else None,
+        )
+
+    # 2️⃣ DOM + scroll fallback ------------------------------------
+    def _extract_ids_js():
+        # [id, pemilik]: link /athletes/<id> di entri feed yang sama
         return drv.execute_script("""
             return Array.from(
                 document.querySelectorAll('a[href^="/activities/"]')
-            ).map(a => (a.getAttribute('href').match(/\\d+/) || [])[0])
-             .filter(Boolean);
+            ).map(a => {
+                var id = (a.getAttribute('href').match(/\\d+/) || [])[0];
+                var entry = a.closest('[id^="Activity-"], .feed-entry, .activity');
+                var who = entry && entry.querySelector('a[href^="/athletes/"]');
+                var owner = who ? (who.getAttribute('href').match(/\\d+/) || [])[0] : null;
+                return [id, owner || null];
+            }).filter(p => p[0]);
         """)
-    ids = OrderedDict()
+    pairs: Dict[str, Optional[str]] = OrderedDict()
+    n_own = 0
+    reached = False                 # sudah melihat aktivitas ≤ watermark
     for _ in range(max(scroll, 1)):
-        for aid in _extract_ids_js():
-            ids[aid] = None
-            if len(ids) >= limit:
+        for aid, owner in _extract_ids_js():
+            if after is not None and int(aid) <= after:
+                reached = True
+                continue
+            if aid in pairs:
+                continue
+            pairs[aid] = owner
+            if not owner or owner == str(athlete_id):
+                n_own += 1
+            if n_own >= limit:
                 break
-        if len(ids) >= limit:
+        if n_own >= limit or reached:
             break
         drv.execute_script("window.scrollBy(0, window.innerHeight);")
         time.sleep(1.2)
 
-    if not ids:
-        raise RuntimeError("Tidak ada aktivitas ditemukan.")
-    return sorted(ids.keys(), key=int, reverse=True)[:limit]
+    items = _newest(pairs.items(), limit, after, athlete_id)
+    if not items and not reached:
+        raise ScrapeError("no_activity", "Tidak ada aktivitas ditemukan.")
+    return items
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Jurnal checkpoint & --resume
+# ──────────────────────────────────────────────────────────────────────────────
+_JOURNAL_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS runs (
+      run_id  INTEGER PRIMARY KEY AUTOINCREMENT,
+      started REAL NOT NULL,
+      argv    TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS events (
+      id      INTEGER PRIMARY KEY AUTOINCREMENT,
+      run_id  INTEGER NOT NULL,
+      ts      REAL    NOT NULL,
+      kind    TEXT    NOT NULL,           -- athlete | activity
+      ath_id  TEXT    NOT NULL,
+      act_id  TEXT,
+      status  TEXT    NOT NULL,           -- start | queued | ok | fail | done
+      reason  TEXT,
+      detail  TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS events_run ON events (run_id, id)",
+)
+
+# Alasan gagal yang layak diulang secara default saat --resume
+RETRY_REASONS = ("error", "timeout", "driver_crash", "empty_payload", "interrupted", "throttled")
+
+class Journal:
+    """
+    Jurnal append-only di SQLite (WAL): setiap atlet/aktivitas dicatat saat
+    dicoba, berhasil atau gagal beserta alasannya. Tiap run tanpa --resume
+    mendapat run_id baru; --resume melanjutkan run terakhir.
+    """
+
+    def __init__(self, path: str, *, resume: bool = False):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        for ddl in _JOURNAL_DDL:
+            self.conn.execute(ddl)
+        self._lock = threading.Lock()
+        row = self.conn.execute("SELECT MAX(run_id) FROM runs").fetchone()
+        if resume and row and row[0] is not None:
+            self.run_id = int(row[0])
+        else:
+            cur = self.conn.execute(
+                "INSERT INTO runs (started, argv) VALUES (?, ?)", (time.time(), " ".join(sys.argv[1:])),
+            )
+            self.run_id = int(cur.lastrowid)
+
+    def record(
+        self,
+        kind: str,
+        ath_id: str,
+        act_id: Optional[str],
+        status: str,
+        reason: Optional[str] = None,
+        detail: Optional[str] = None,
+    ) -> None:
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO events (run_id, ts, kind, ath_id, act_id, status, reason, detail) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.run_id, time.time(), kind, str(ath_id), act_id, status, reason,
+                 (detail or "")[:500] or None),
+            )
+
+    def plan_resume(
+        self,
+        *,
+        max_retries: int,
+        retry_reasons: Iterable[str],
+    ) -> Tuple[set, set, List[Tuple[str, str]]]:
+        """
+        Dari jurnal run ini hitung:
+          • atlet yang profilnya sudah terbaca (tidak perlu dibuka lagi)
+          • atlet yang perlu diulang (gagal / terputus saat membaca profil)
+          • aktivitas yang perlu diulang (gagal, atau sudah diantre/dimulai
+            tetapi run mati sebelum ada hasil)
+        Item yang gagal dengan alasan di luar `retry_reasons`, atau sudah gagal
+        `max_retries` kali, tidak diulang.
+        """
+        retry_reasons = set(retry_reasons)
+        last: Dict[Tuple[str, str, Optional[str]], Tuple[str, Optional[str]]] = {}
+        fails: Dict[Tuple[str, str, Optional[str]], int] = {}
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT kind, ath_id, act_id, status, reason FROM events WHERE run_id = ? ORDER BY id",
+                (self.run_id,),
+            ).fetchall()
+        for kind, ath_id, act_id, status, reason in rows:
+            key = (kind, ath_id, act_id)
+            if status == "done":
+                continue
+            last[key] = (status, reason)
+            if status == "fail":
+                fails[key] = fails.get(key, 0) + 1
+
+        def _retry(key, status, reason) -> bool:
+            if status in ("start", "queued"):
+                return True                      # terputus (crash / Ctrl-C)
+            if status != "fail":
+                return False
+            return reason in retry_reasons and fails.get(key, 0) < max_retries
+
+        seen, retry_athletes = set(), set()
+        retry_acts: List[Tuple[str, str]] = []
+        for key, (status, reason) in last.items():
+            kind, ath_id, act_id = key
+            if kind == "athlete":
+                if _retry(key, status, reason):
+                    retry_athletes.add(ath_id)
+                else:
+                    seen.add(ath_id)
+            elif _retry(key, status, reason):
+                retry_acts.append((ath_id, act_id))
+        return seen, retry_athletes, retry_acts
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Mode incremental: lewati aktivitas yang sudah tersimpan
+# ──────────────────────────────────────────────────────────────────────────────
+class KnownActivities:
+    """
+    Indeks activity_id yang sudah ada di strava_activities. activity_id adalah
+    PRIMARY KEY, jadi pasangan (strava_id, activity_id) cukup diwakili
+    activity_id saja: array('Q') terurut + bisect (8 byte/ID), ditambah set
+    kecil untuk ID yang tersimpan selama run berjalan.
+    """
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self._arr = array("Q", sorted(set(ids)))
+        self._new: set = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._arr) + len(self._new)
+
+    def __contains__(self, act_id) -> bool:
+        key = int(act_id)
+        i = bisect.bisect_left(self._arr, key)
+        if i < len(self._arr) and self._arr[i] == key:
+            return True
+        with self._lock:
+            return key in self._new
+
+    def add(self, act_id) -> None:
+        with self._lock:
+            self._new.add(int(act_id))
+
+def load_known_activities(
+    conn,
+    athlete_ids: List[str],
+    *,
+    refresh_days: Optional[float] = None,
+    chunk: int = 1000,
+) -> KnownActivities:
+    """
+    Muat activity_id milik atlet shard ini, per batch `chunk` atlet.
+    Dengan `refresh_days`, baris yang scraped_at-nya lebih tua dianggap belum
+    ada sehingga akan di-scrape ulang.
+    """
+    ids = array("Q")
+    cur = conn.cursor(mysql.cursors.SSCursor)
+    try:
+        for i in range(0, len(athlete_ids), chunk):
+            part = athlete_ids[i:i + chunk]
+            sql = (
+                "SELECT activity_id FROM strava_activities "
+                f"WHERE strava_id IN ({','.join(['%s'] * len(part))})"
+            )
+            params: List[Any] = list(part)
+            if refresh_days is not None:
+                sql += " AND scraped_at >= NOW() - INTERVAL %s SECOND"
+                params.append(int(refresh_days * 86400))
+            cur.execute(sql, params)
+            ids.extend(int(row[0]) for row in cur)
+    finally:
+        cur.close()
+    return KnownActivities(ids)
+
+class RunState:
+    """Status bersama satu run yang dibaca semua worker dan engine."""
+
+    def __init__(
+        self,
+        known: Optional[KnownActivities] = None,
+        watermarks: Optional[Dict[str, int]] = None,
+        journal: Optional[Journal] = None,
+        schedule: Optional[AthleteSchedule] = None,
+    ):
+        self.known = known
+        self.watermarks = watermarks
+        self.journal = journal
+        self.schedule = schedule
+        self.n_skipped_known = 0
+        self.n_nothing_new = 0
+        self.n_duplicate = 0
+        self._handled: set = set()   # activity_id yang sudah diambil alih run ini (int)
+        self._lock = threading.Lock()
+
+    @property
+    def incremental(self) -> bool:
+        return self.known is not None or self.watermarks is not None
+
+    def after(self, ath_id: str) -> Optional[int]:
+        """Watermark atlet: activity_id tertinggi yang sudah tersimpan."""
+        if self.watermarks is None:
+            return None
+        with self._lock:
+            return self.watermarks.get(str(ath_id))
+
+    def filter_new(self, ath_id: str, act_ids: List[str]) -> List[str]:
+        """
+        Buang aktivitas yang sudah ada di DB, atau yang sudah ditangani run ini
+        lewat atlet lain, sebelum drv.get()/fetch.
+        """
+        fresh = act_ids
+        if self.known is not None:
+            fresh = [a for a in act_ids if a not in self.known]
+        with self._lock:
+            self.n_skipped_known += len(act_ids) - len(fresh)
+            claimed = []
+            for a in fresh:
+                if int(a) not in self._handled:
+                    self._handled.add(int(a))
+                    claimed.append(a)
+            self.n_duplicate += len(fresh) - len(claimed)
+            fresh = claimed
+            if self.incremental and not fresh:
+                self.n_nothing_new += 1
+        return fresh
+
+    def visited(self, ath_id: str, act_ids: Optional[List[str]] = None, reason: Optional[str] = None) -> None:
+        """Hasil kunjungan profil untuk jadwal atlet (--schedule)."""
+        if self.schedule is not None:
+            self.schedule.visited(ath_id, act_ids, reason)
+
+    def release(self, act_id: str) -> None:
+        """Lepas klaim: mismatch (ambil lagi lewat pemiliknya) atau engine HTTP gagal di tengah jalan."""
+        with self._lock:
+            self._handled.discard(int(act_id))
+
+    def record(
+        self,
+        kind: str,
+        ath_id: str,
+        act_id: Optional[str],
+        status: str,
+        reason: Optional[str] = None,
+        detail: Optional[str] = None,
+    ) -> None:
+        if status == "ok":
+            STATS.incr(f"{kind}.ok")
+        elif status == "fail":
+            STATS.incr(f"{kind}.fail.{reason or 'error'}")
+        if self.journal is None:
+            return
+        try:
+            self.journal.record(kind, ath_id, act_id, status, reason, detail)
+        except Exception as e:
+            print(f"[!] Gagal menulis jurnal: {e}", file=sys.stderr)
+
+    def mark_saved(self, ath_id: str, act_id: str) -> None:
+        if self.known is not None:
+            self.known.add(act_id)
+        if self.watermarks is not None:
+            with self._lock:
+                key = str(ath_id)
+                self.watermarks[key] = max(self.watermarks.get(key, 0), int(act_id))
+
+    def summary(self) -> str:
+        lines = []
+        if self.incremental:
+            lines.append(
+                f"[i] Incremental: {self.n_skipped_known} aktivitas dilewati (sudah di DB), "
+                f"{self.n_nothing_new} atlet tanpa aktivitas baru."
+            )
+        foreign = STATS.counts("feed.foreign").get("feed.foreign", 0)
+        if foreign or self.n_duplicate:
+            lines.append(
+                f"[i] Feed: {foreign} aktivitas atlet lain dibuang, "
+                f"{self.n_duplicate} aktivitas duplikat tidak dibuka ulang."
+            )
+        return "\n".join(lines)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Antrian kerja berbasis lease (pengganti --total-shards statis)
+# ──────────────────────────────────────────────────────────────────────────────
+_QUEUE_DDL_MYSQL = """
+        CREATE TABLE IF NOT EXISTS strava_work_queue (
+          run_id      VARCHAR(64)     NOT NULL,
+          strava_id   BIGINT UNSIGNED NOT NULL,
+          status      VARCHAR(8)      NOT NULL DEFAULT 'pending',
+          lease_owner VARCHAR(96)     NULL,
+          claim_token VARCHAR(32)     NULL,
+          lease_until BIGINT          NULL,
+          attempts    INT             NOT NULL DEFAULT 0,
+          PRIMARY KEY (run_id, strava_id),
+          KEY claim (run_id, status, lease_until),
+          KEY token (claim_token)
+        ) ENGINE=InnoDB
+"""
+
+_QUEUE_DDL_SQLITE = (
+    """
+    CREATE TABLE IF NOT EXISTS strava_work_queue (
+      run_id      TEXT    NOT NULL,
+      strava_id   INTEGER NOT NULL,
+      status      TEXT    NOT NULL DEFAULT 'pending',
+      lease_owner TEXT,
+      claim_token TEXT,
+      lease_until INTEGER,
+      attempts    INTEGER NOT NULL DEFAULT 0,
+      PRIMARY KEY (run_id, strava_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS queue_claim ON strava_work_queue (run_id, status, lease_until)",
+    "CREATE INDEX IF NOT EXISTS queue_token ON strava_work_queue (claim_token)",
+)
+
+class LeaseQueue:
+    """
+    Antrian atlet di tabel strava_work_queue (MySQL, atau SQLite untuk uji
+    lokal). Tiap mesin mengklaim batch kecil dengan lease berbatas waktu yang
+    diperpanjang thread heartbeat selama dikerjakan. Lease yang kedaluwarsa
+    (mesin crash / dimatikan) otomatis bisa diklaim mesin lain, jadi mesin
+    boleh bergabung atau keluar kapan saja.
+    """
+
+    def __init__(
+        self,
+        conn,
+        run_id: str,
+        *,
+        sqlite: bool = False,
+        lease_sec: int = 300,
+        batch: int = 5,
+        max_attempts: int = 3,
+        poll_sec: float = 30.0,
+    ):
+        self.conn = conn
+        self.run_id = run_id
+        self.sqlite = sqlite
+        self.lease_sec = lease_sec
+        self.batch = max(1, batch)
+        self.max_attempts = max_attempts
+        self.poll_sec = poll_sec
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"[:96]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+        self.n_claimed = 0
+
+    # ── SQL helper (MySQL %s / SQLite ?) ───────────────────────────
+    def _sql(self, sql: str) -> str:
+        if self.sqlite:
+            return sql.replace("%s", "?").format(
+                now="CAST(strftime('%s','now') AS INTEGER)", ignore="OR IGNORE",
+            )
+        return sql.format(now="UNIX_TIMESTAMP()", ignore="IGNORE")
+
+    def _exec(self, sql: str, params: Iterable[Any] = (), *, many: bool = False) -> List[Tuple]:
+        params = list(params)
+
+        def body(conn) -> List[Tuple]:
+            cur = conn.cursor() if self.sqlite else conn.cursor(mysql.cursors.Cursor)
+            try:
+                if many:
+                    cur.executemany(self._sql(sql), params)
+                    return []
+                cur.execute(self._sql(sql), tuple(params))
+                return list(cur.fetchall()) if cur.description else []
+            finally:
+                cur.close()
+
+        with self._lock:
+            return db_call(self.conn, body)
+
+    # ── API ────────────────────────────────────────────────────────
+    def ensure(self) -> None:
+        if self.sqlite:
+            for ddl in _QUEUE_DDL_SQLITE:
+                self._exec(ddl)
+        else:
+            self._exec(_QUEUE_DDL_MYSQL)
+
+    def seed(self, athlete_ids: Iterable[str], chunk: int = 1000) -> None:
+        """Masukkan atlet ke run ini; idempoten, jadi tiap mesin yang bergabung boleh memanggilnya."""
+        buf: List[Tuple[str, str]] = []
+        for ath_id in athlete_ids:
+            buf.append((self.run_id, str(ath_id)))
+            if len(buf) >= chunk:
+                self._exec("INSERT {ignore} INTO strava_work_queue (run_id, strava_id) VALUES (%s,%s)", buf, many=True)
+                buf = []
+        if buf:
+            self._exec("INSERT {ignore} INTO strava_work_queue (run_id, strava_id) VALUES (%s,%s)", buf, many=True)
+
+    def claim(self) -> List[str]:
+        # lease kedaluwarsa yang sudah kehabisan jatah percobaan → failed
+        self._exec(
+            """UPDATE strava_work_queue SET status = 'failed', lease_owner = NULL
+               WHERE run_id = %s AND status = 'leased' AND lease_until < {now} AND attempts >= %s""",
+            (self.run_id, self.max_attempts),
+        )
+        token = uuid.uuid4().hex
+        claimable = """run_id = %s AND (status = 'pending' OR (status = 'leased' AND lease_until < {now}))"""
+        set_lease = """SET status = 'leased', lease_owner = %s, claim_token = %s,
+                           lease_until = {now} + %s, attempts = attempts + 1"""
+        if self.sqlite:
+            self._exec(
+                f"""UPDATE strava_work_queue {set_lease}
+                    WHERE rowid IN (SELECT rowid FROM strava_work_queue
+                                    WHERE {claimable} ORDER BY strava_id LIMIT %s)""",
+                (self.owner, token, self.lease_sec, self.run_id, self.batch),
+            )
+        else:
+            self._exec(
+                f"""UPDATE strava_work_queue {set_lease}
+                    WHERE {claimable} ORDER BY strava_id LIMIT %s""",
+                (self.owner, token, self.lease_sec, self.run_id, self.batch),
+            )
+        rows = self._exec(
+            "SELECT strava_id FROM strava_work_queue WHERE run_id = %s AND claim_token = %s ORDER BY strava_id",
+            (self.run_id, token),
+        )
+        self.n_claimed += len(rows)
+        return [str(r[0]) for r in rows]
+
+    def extend(self) -> None:
+        self._exec(
+            """UPDATE strava_work_queue SET lease_until = {now} + %s
+               WHERE run_id = %s AND lease_owner = %s AND status = 'leased'""",
+            (self.lease_sec, self.run_id, self.owner),
+        )
+
+    def complete(self, ath_id: str, ok: bool = True) -> None:
+        """Tandai selesai; bila gagal, kembalikan ke antrian sampai max_attempts."""
+        if ok:
+            self._exec(
+                """UPDATE strava_work_queue SET status = 'done', lease_owner = NULL, claim_token = NULL
+                   WHERE run_id = %s AND strava_id = %s AND lease_owner = %s""",
+                (self.run_id, ath_id, self.owner),
+            )
+        else:
+            self._exec(
+                """UPDATE strava_work_queue
+                   SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'pending' END,
+                       lease_owner = NULL, claim_token = NULL, lease_until = NULL
+                   WHERE run_id = %s AND strava_id = %s AND lease_owner = %s""",
+                (self.max_attempts, self.run_id, ath_id, self.owner),
+            )
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._exec(
+            "SELECT status, COUNT(*) FROM strava_work_queue WHERE run_id = %s GROUP BY status",
+            (self.run_id,),
+        )
+        return {str(st): int(n) for st, n in rows}
+
+    def pending(self) -> int:
+        """Atlet 'pending' run ini, mis. yang gagal setelah iterator habis."""
+        rows = self._exec(
+            "SELECT COUNT(*) FROM strava_work_queue WHERE run_id = %s AND status = 'pending'",
+            (self.run_id,),
+        )
+        return int(rows[0][0]) if rows else 0
+
+    def _leased_by_others(self) -> int:
+        rows = self._exec(
+            """SELECT COUNT(*) FROM strava_work_queue
+               WHERE run_id = %s AND status = 'leased' AND lease_owner <> %s""",
+            (self.run_id, self.owner),
+        )
+        return int(rows[0][0]) if rows else 0
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Klaim batch demi batch. Bila tidak ada yang bisa diklaim tetapi mesin
+        lain masih memegang lease, tunggu: lease itu bisa kedaluwarsa dan
+        diambil alih di sini.
+        """
+        while not self._stop.is_set():
+            ids = self.claim()
+            if ids:
+                yield from ids
+                continue
+            if self._leased_by_others() == 0:
+                return
+            self._stop.wait(self.poll_sec)
+
+    def _beat(self) -> None:
+        while not self._stop.wait(max(5.0, self.lease_sec / 3)):
+            try:
+                self.extend()
+            except Exception as e:
+                print(f"[!] Gagal memperpanjang lease: {e}", file=sys.stderr)
+
+    def start(self) -> None:
+        self._heartbeat = threading.Thread(target=self._beat, name="lease-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join(timeout=5)
+        # lease yang belum selesai dilepas supaya langsung bisa diambil mesin lain
+        try:
+            self._exec(
+                """UPDATE strava_work_queue SET status = 'pending', lease_owner = NULL,
+                          claim_token = NULL, lease_until = NULL, attempts = attempts - 1
+                   WHERE run_id = %s AND lease_owner = %s AND status = 'leased'""",
+                (self.run_id, self.owner),
+            )
+        except Exception as e:
+            print(f"[!] Gagal melepas lease: {e}", file=sys.stderr)
+
+def run_until_drained(queue: Optional[LeaseQueue], run_once: Callable[[], None]) -> None:
+    """
+    run_once() (satu putaran engine atas iterator antrian), lalu ulangi
+    selama antrian masih punya atlet 'pending'. Iterator berhenti begitu
+    klaim kosong, padahal atlet yang masih dikerjakan di sini bisa gagal
+    sesudahnya dan complete(ok=False) mengembalikannya ke 'pending'; tanpa
+    putaran ulang retry itu hilang di mesin terakhir yang masih jalan.
+    """
+    while True:
+        claimed = queue.n_claimed if queue is not None else 0
+        run_once()
+        if queue is None or queue.n_claimed == claimed or not queue.pending():
+            return
+        print(f"[i] Antrian '{queue.run_id}': {queue.pending()} atlet gagal dikembalikan, diklaim ulang.")
+
+def open_queue_db(path: str):
+    """Koneksi SQLite untuk --queue-db (uji lokal / satu mesin)."""
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Worker pool: beberapa Chrome paralel dalam satu proses
+# ──────────────────────────────────────────────────────────────────────────────
+# File/folder profil yang tidak perlu (atau tidak bisa) disalin per worker
+_PROFILE_SKIP = (
+    "Singleton*", "lockfile", "*.lock",
+    "Cache", "Code Cache", "GPUCache", "ShaderCache", "GrShaderCache",
+    "Service Worker", "Crashpad",
+)
+
+# Potongan pesan WebDriver yang menandakan sesi Chrome sudah mati
+_DRIVER_DEAD = (
+    "invalid session id",
+    "chrome not reachable",
+    "disconnected",
+    "session deleted",
+    "target window already closed",
+)
+
+def clone_profile(profile: str, worker_id: Any) -> str:
+    """Salin profil Chrome ke direktori sementara supaya tiap worker punya user-data-dir sendiri."""
+    src = os.path.expanduser(profile)
+    dst = tempfile.mkdtemp(prefix=f"strava-w{worker_id}-")
+    try:
+        shutil.copytree(
+            src, dst,
+            dirs_exist_ok=True,
+            symlinks=True,
+            ignore=shutil.ignore_patterns(*_PROFILE_SKIP),
+        )
+    except shutil.Error as e:
+        # file yang sedang dikunci Chrome lain boleh terlewat
+        print(f"[!] Worker {worker_id}: {len(e.args[0])} file profil tidak tersalin", file=sys.stderr)
+    return dst
+
+def _driver_dead(exc: BaseException) -> bool:
+    if isinstance(exc, (InvalidSessionIdException, NoSuchWindowException)):
+        return True
+    msg = str(exc).lower()
+    return any(s in msg for s in _DRIVER_DEAD)
+
+def _reason(exc: BaseException) -> str:
+    if isinstance(exc, ScrapeError):
+        return exc.reason
+    if _driver_dead(exc):
+        return "driver_crash"
+    if isinstance(exc, TimeoutException):
+        return "timeout"
+    return "error"
+
+def _owned_by(payload: Dict[str, Any], ath_id: str, act_id: str) -> bool:
+    pl_ath = str(
+        payload.get("athlete", {}).get("id") or
+        payload.get("athlete_id", "")
+    )
+    if pl_ath and pl_ath != str(ath_id):
+        print(f"[!] Skip {act_id}: milik atlet {pl_ath}, bukan {ath_id}")
+        return False
+    return True
+
+def scrape_activity(
+    drv: webdriver.Chrome,
+    ath_id: str,
+    act_id: str,
+    *,
+    wait: int,
+    use_cdp: bool,
+    save: Callable[[str, str, Dict[str, Any]], None],
+    cdp_capture: str = "hook",
+) -> str:
+    """Buka satu aktivitas, ekstrak payload, simpan. Return 'ok' | 'empty_payload' | 'mismatch'."""
+    t0 = time.monotonic()
+    with STATS.timed("activity.get"):
+        _navigate(drv, f"{STRAVA_URL}/activities/{act_id}")
+    payload = get_activity_payload(
+        drv, act_id, wait=wait, use_cdp=use_cdp, ath_id=ath_id, cdp_capture=cdp_capture,
+    )
+    page_sec = time.monotonic() - t0
+    STATS.observe("activity.page", page_sec)
+    n_bytes = page_bytes(drv)
+    if n_bytes is not None:
+        STATS.observe("activity.kb", n_bytes / 1024)
+    if not payload:
+        print(f"[!] payload kosong {act_id}")
+        return "empty_payload"
+    if not _owned_by(payload, ath_id, act_id):
+        return "mismatch"
+
+    save(ath_id, act_id, payload)
+    kb = f", {n_bytes / 1024:.0f} KB" if n_bytes is not None else ""
+    print(f"[DB] activity {act_id} ⇒ antre DB ({page_sec:.1f}s{kb})")
+    return "ok"
+
+def store_summaries(
+    ath_id: str,
+    items: List[FeedItem],
+    act_ids: List[str],
+    save: Callable[[str, str, Dict[str, Any]], None],
+    state: "RunState",
+) -> Tuple[int, List[str]]:
+    """
+    --summary-only: simpan aktivitas yang node feed-nya lengkap tanpa membuka
+    halamannya. Return (jumlah tersimpan, act_id yang tetap perlu dibuka).
+    """
+    by_id = {it.act_id: it for it in items}
+    rest: List[str] = []
+    n_saved = 0
+    for act_id in act_ids:
+        it = by_id.get(act_id)
+        payload = summary_payload(it.node, it.owner_id) if it is not None else None
+        if payload is None or not _owned_by(payload, ath_id, act_id):
+            STATS.incr("summary.miss")
+            rest.append(act_id)
+            continue
+        save(ath_id, act_id, payload)
+        state.record("activity", ath_id, act_id, "ok", detail="feed")
+        STATS.incr("summary.hit")
+        n_saved += 1
+        print(f"[DB] activity {act_id} ⇒ antre DB (feed)")
+    return n_saved, rest
+
+# ───────── pipeline fetch → parse (--parse-procs) ─────────
+# Data aktivitas ikut ada di HTML (Next.js / pageView legacy) → cukup diparse di proses lain
+_INLINE_ACTIVITY_RE = re.compile(r'"activity"\s*:\s*\{|pageView\.activity\(\)\.set\(')
+
+def fetch_activity_bundle(
+    drv: webdriver.Chrome,
+    ath_id: str,
+    act_id: str,
+    *,
+    wait: int,
+    use_cdp: bool,
+    cdp_capture: str = "hook",
+) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Tahap fetch pipeline: navigasi + tunggu, lalu ambil HTML mentah. Tier
+    yang butuh browser (js/cdp) hanya dijalankan bila datanya tidak ada di
+    HTML. Return (html, captured) untuk parse_bundle().
+    """
+    with STATS.timed("activity.get"):
+        _navigate(drv, f"{STRAVA_URL}/activities/{act_id}")
+    t0 = time.monotonic()
+    wait_activity_ready(drv, act_id, timeout=wait)
+    STATS.observe("activity.ready", time.monotonic() - t0)
+    html_source = drv.page_source
+    _check_throttle(html_source)
+    captured: Optional[Dict[str, Any]] = None
+    if not _INLINE_ACTIVITY_RE.search(html_source):
+        act, tier = _browser_tiers(drv, act_id, None, use_cdp, cdp_capture)
+        if act:
+            captured = {"tier": tier, "data": act}
+    _cache_put("activity", act_id, html_source, ath_id=ath_id, captured=captured)
+    return html_source, captured
+
+def parse_bundle(
+    ath_id: str, act_id: str, html_source: str, captured: Optional[Dict[str, Any]],
+) -> Tuple[Dict[str, Any], Optional[Tuple], str, float]:
+    """Tahap parse (di process pool): (payload, baris DB, tier, detik parse)."""
+    t0 = time.monotonic()
+    payload, tier = _replay_tiers(html_source, captured)
+    row = activity_row(ath_id, act_id, payload) if payload else None
+    return payload, row, tier, time.monotonic() - t0
+
+try:
+    import psutil
+except ImportError:          # opsional, hanya untuk --max-driver-mb
+    psutil = None
+
+def _quit_driver(drv: Optional[webdriver.Chrome]) -> None:
+    if drv is None:
+        return
+    try:
+        drv.quit()
+    except Exception:
+        pass
+
+def driver_rss_mb(drv: webdriver.Chrome) -> Optional[float]:
+    """RSS chromedriver + semua proses Chrome di bawahnya (butuh psutil)."""
+    if psutil is None:
+        return None
+    try:
+        root = psutil.Process(drv.service.process.pid)
+        procs = [root] + root.children(recursive=True)
+    except Exception:
+        return None
+    total = 0
+    for p in procs:
+        try:
+            total += p.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / (1024 * 1024)
+
+class DriverManager:
+    """
+    Siklus hidup Chrome untuk satu worker:
+      • health check (satu execute_script) sebelum setiap navigasi
+      • daur ulang setelah `recycle_pages` halaman atau RSS > `max_rss_mb`
+      • opsional satu driver cadangan (warm spare) yang dibangun di latar,
+        sehingga daur ulang / crash tidak menunggu Chrome baru start
+    `factory(slot)` membangun driver; slot 0/1 bergantian supaya driver aktif
+    dan cadangan tidak memakai user-data-dir yang sama.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[int], webdriver.Chrome],
+        *,
+        recycle_pages: int = 0,
+        max_rss_mb: float = 0,
+        spare: bool = False,
+    ):
+        self.factory = factory
+        self.recycle_pages = recycle_pages
+        self.max_rss_mb = max_rss_mb
+        self.spare = spare
+        self._drv: Optional[webdriver.Chrome] = None
+        self._slot = 0
+        self._pages = 0
+        self._spare: Optional[Future] = None
+        self._spare_slot = 1
+        self._ex = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chrome-spare") if spare else None
+
+    def _build_spare(self, slot: int, retire: Optional[webdriver.Chrome] = None) -> None:
+        def job() -> webdriver.Chrome:
+            _quit_driver(retire)          # lepas user-data-dir slot ini dulu
+            return self.factory(slot)
+
+        self._spare_slot = slot
+        self._spare = self._ex.submit(job)
+
+    def _take_spare(self) -> Optional[webdriver.Chrome]:
+        fut, self._spare = self._spare, None
+        if fut is None:
+            return None
+        try:
+            drv = fut.result()
+        except Exception as e:
+            print(f"[!] Driver cadangan gagal dibangun: {e}", file=sys.stderr)
+            return None
+        self._slot = self._spare_slot
+        return drv
+
+    @staticmethod
+    def _healthy(drv: webdriver.Chrome) -> bool:
+        try:
+            return drv.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def get(self) -> webdriver.Chrome:
+        """Driver sehat siap navigasi; bangun / tukar bila perlu (bisa raise RuntimeError)."""
+        if self._drv is not None and not self._healthy(self._drv):
+            STATS.incr("driver.unhealthy")
+            self.discard()
+        if self._drv is None:
+            drv = self._take_spare()
+            if drv is None:
+                with STATS.timed("driver.start"):
+                    drv = self.factory(self._slot)
+            self._drv, self._pages = drv, 0
+            if self.spare and self._spare is None:
+                self._build_spare(1 - self._slot)
+        return self._drv
+
+    def page_done(self) -> None:
+        if self._drv is None:
+            return
+        self._pages += 1
+        reason = None
+        if self.recycle_pages and self._pages >= self.recycle_pages:
+            reason = f"{self._pages} halaman"
+        elif self.max_rss_mb:
+            rss = driver_rss_mb(self._drv)
+            if rss is not None and rss > self.max_rss_mb:
+                reason = f"RSS {rss:.0f} MB"
+        if reason:
+            self.recycle(reason)
+
+    def recycle(self, reason: str = "") -> None:
+        STATS.incr("driver.recycled")
+        old, self._drv = self._drv, None
+        if self._spare is not None:
+            new = self._take_spare()
+            if new is not None:
+                self._drv, self._pages = new, 0
+                self._build_spare(1 - self._slot, retire=old)
+                return
+        _quit_driver(old)
+
+    def discard(self) -> None:
+        """Buang driver aktif (crash / tidak sehat); get() berikutnya memakai cadangan."""
+        old, self._drv = self._drv, None
+        _quit_driver(old)
+
+    def close(self) -> None:
+        self.discard()
+        if self._spare is not None:
+            try:
+                _quit_driver(self._spare.result())
+            except Exception:
+                pass
+            self._spare = None
+        if self._ex is not None:
+            self._ex.shutdown(wait=True)
+
+class ScrapePool:
+    """
+    N worker thread, masing-masing dengan Chrome (dan salinan profil) sendiri,
+    mengambil pekerjaan dari satu antrian bersama:
+      • tugas aktivitas  → didahulukan supaya atlet cepat tuntas
+      • tugas atlet      → diambil dari iterator sumber bila antrian kosong
+    Driver yang crash dibangun ulang dan item yang sedang dikerjakan diulang
+    sekali; worker lain tidak terganggu.
+    Dengan --parse-procs worker hanya mengambil halaman; ekstraksi + metrik
+    dikerjakan process pool (maks. 4 halaman antre per proses, lebih dari itu
+    worker menunggu) dan hasilnya langsung diteruskan ke `save`.
+    """
+
+    max_start_fail = 3
+    max_throttle_retry = 3
+
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        save: Callable[[str, str, Dict[str, Any]], None],
+        n_workers: int = 1,
+        state: Optional[RunState] = None,
+        on_athlete_done: Optional[Callable[[str, bool], None]] = None,
+    ):
+        self.args = args
+        self.save = save
+        self.n_workers = max(1, n_workers)
+        self.state = state or RunState()
+        self.on_athlete_done = on_athlete_done
+        self._tasks: Deque[Tuple[str, str, Optional[str], int]] = deque()
+        self._src: Iterable[str] = iter(())
+        self._src_done = False
+        self._src_pulling = False     # satu worker sedang next(sumber) di luar lock
+        self._busy = 0                # tugas atlet yang sedang diproses
+        self._open: Dict[str, List[Any]] = {}   # ath_id → [tugas tersisa, ok]
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._profiles: Dict[Tuple[int, int], str] = {}
+        self._blocklist = lean_blocklist(args)
+        self._bar: Optional[tqdm] = None
+        self.n_saved = 0
+        self._parser: Optional[ProcessPoolExecutor] = None
+        self._parse_slots: Optional[threading.BoundedSemaphore] = None
+        if args.parse_procs > 0:
+            # spawn: proses parse dibuat saat thread Chrome sudah berjalan (fork tidak aman)
+            self._parser = ProcessPoolExecutor(args.parse_procs, mp_context=multiprocessing.get_context("spawn"))
+            self._parse_slots = threading.BoundedSemaphore(4 * args.parse_procs)
+
+    # ── antrian ────────────────────────────────────────────────────
+    def _next_task(self) -> Optional[Tuple[str, str, Optional[str], int]]:
+        while not self._stop.is_set():
+            with self._cond:
+                if self._tasks:
+                    task = self._tasks.popleft()
+                    if task[0] == "ath":
+                        self._busy += 1
+                    return task
+                if self._src_done or self._src_pulling:
+                    if self._src_done and self._busy == 0 and not self._src_pulling:
+                        # sumber habis & tidak ada atlet yang masih bisa menambah tugas
+                        self._cond.notify_all()
+                        return None
+                    self._cond.wait(timeout=1.0)
+                    continue
+                self._src_pulling = True
+
+            # sumber bisa memblok (mis. klaim lease ke DB) → jangan tahan lock
+            try:
+                ath_id = next(self._src, None)
+            except Exception as e:
+                print(f"[!] Sumber atlet gagal: {e}", file=sys.stderr)
+                ath_id = None
+            with self._cond:
+                self._src_pulling = False
+                self._cond.notify_all()
+                if ath_id is None:
+                    self._src_done = True
+                    continue
+                ath_id = str(ath_id)
+                self._busy += 1
+                self._open[ath_id] = [1, True]
+                return ("ath", ath_id, None, 0)
+        return None
+
+    def _push(self, tasks: Iterable[Tuple[str, str, Optional[str], int]]) -> None:
+        with self._cond:
+            for task in tasks:
+                self._open.setdefault(task[1], [0, True])[0] += 1
+                self._tasks.append(task)
+            self._cond.notify_all()
+
+    def has_tasks(self) -> bool:
+        with self._cond:
+            return bool(self._tasks)
+
+    def add_activities(self, items: Iterable[Tuple[str, str]]) -> None:
+        """Antrikan (ath_id, act_id) langsung, mis. sisa dari engine HTTP."""
+        self._push(("act", ath_id, act_id, 0) for ath_id, act_id in items)
+
+    def _mark_failed(self, ath_id: str) -> None:
+        with self._cond:
+            if ath_id in self._open:
+                self._open[ath_id][1] = False
+
+    def _finish(self, task: Tuple[str, str, Optional[str], int]) -> None:
+        done: Optional[Tuple[str, bool]] = None
+        with self._cond:
+            if task[0] == "ath":
+                self._busy -= 1
+                if self._bar is not None:
+                    self._bar.update(1)
+            entry = self._open.get(task[1])
+            if entry is not None:
+                entry[0] -= 1
+                if entry[0] <= 0:
+                    del self._open[task[1]]
+                    done = (task[1], entry[1])
+            self._cond.notify_all()
+        if done and self.on_athlete_done is not None:
+            self.on_athlete_done(*done)
+
+    # ── driver ─────────────────────────────────────────────────────
+    def _start_driver(self, wid: int, slot: int = 0) -> webdriver.Chrome:
+        profile = self.args.chrome_profile
+        if profile and (self.n_workers > 1 or self.args.warm_spare):
+            key = (wid, slot)
+            if key not in self._profiles:
+                self._profiles[key] = clone_profile(profile, f"{wid}{'ab'[slot]}")
+            profile = self._profiles[key]
+        return build_chrome(
+            headless=self.args.headless,
+            profile=profile,
+            chrome_bin=self.args.chrome_binary,
+            cdp_capture=self.args.cdp_capture if self.args.use_cdp else None,
+            blocklist=self._blocklist,
+        )
+
+    # ── worker ─────────────────────────────────────────────────────
+    def _requeue_throttled(self, e: BaseException, task: Tuple[str, str, Optional[str], int]) -> bool:
+        """Item yang kena throttle diantrikan ulang (limiter sudah menahan laju); True bila diantrikan."""
+        if _reason(e) != "throttled" or task[3] >= self.max_throttle_retry:
+            return False
+        kind, ath_id, act_id, tries = task
+        self.state.record("athlete" if kind == "ath" else "activity", ath_id, act_id, "fail", "throttled", str(e))
+        self._push([(kind, ath_id, act_id, tries + 1)])
+        return True
+
+    def _do_athlete(self, drv: webdriver.Chrome, ath_id: str, tries: int = 0) -> None:
+        self.state.record("athlete", ath_id, None, "start")
+        try:
+            with STATS.timed("athlete.page"):
+                items = recent_activity_ids(
+                    drv, ath_id,
+                    limit=self.args.per_athlete,
+                    wait=self.args.wait,
+                    after=self.state.after(ath_id),
+                    summaries=self.args.summary_only,
+                )
+        except Exception as e:
+            if _driver_dead(e):
+                raise
+            if self._requeue_throttled(e, ("ath", ath_id, None, tries)):
+                return
+            print(f"[!] Gagal ambil recent {ath_id}: {e}", file=sys.stderr)
+            self.state.record("athlete", ath_id, None, "fail", _reason(e), str(e))
+            self.state.visited(ath_id, reason=_reason(e))
+            self._mark_failed(ath_id)
+            return
+        self.state.visited(ath_id, [it.act_id for it in items])
+        act_ids = self.state.filter_new(ath_id, [it.act_id for it in items])
+        self.state.record("athlete", ath_id, None, "ok", detail=f"{len(act_ids)} baru")
+        if self.args.summary_only:
+            n_feed, act_ids = store_summaries(ath_id, items, act_ids, self.save, self.state)
+            if n_feed:
+                with self._cond:
+                    self.n_saved += n_feed
+        for act_id in act_ids:
+            self.state.record("activity", ath_id, act_id, "queued")
+        self._push(("act", ath_id, act_id, 0) for act_id in act_ids)
+
+    def _do_activity(self, drv: webdriver.Chrome, ath_id: str, act_id: str, tries: int = 0) -> bool:
+        """Return True bila hasilnya diselesaikan belakangan oleh tahap parse (--parse-procs)."""
+        self.state.record("activity", ath_id, act_id, "start")
+        try:
+            if self._parser is not None:
+                self._submit_parse(drv, ("act", ath_id, act_id, tries))
+                return True
+            status = scrape_activity(
+                drv, ath_id, act_id,
+                wait=self.args.wait,
+                use_cdp=self.args.use_cdp,
+                save=self.save,
+                cdp_capture=self.args.cdp_capture,
+            )
+        except Exception as e:
+            if _driver_dead(e):
+                raise
+            if self._requeue_throttled(e, ("act", ath_id, act_id, tries)):
+                return False
+            print(f"[!] Error scrape {act_id}: {e}", file=sys.stderr)
+            self.state.record("activity", ath_id, act_id, "fail", _reason(e), str(e))
+            return False
+        self._activity_done(ath_id, act_id, status)
+        return False
+
+    def _activity_done(self, ath_id: str, act_id: str, status: str) -> None:
+        if status == "mismatch":
+            self.state.release(act_id)
+        if status != "ok":
+            self.state.record("activity", ath_id, act_id, "fail", status)
+            return
+        self.state.record("activity", ath_id, act_id, "ok")
+        with self._cond:
+            self.n_saved += 1
+            if self._bar is not None:
+                self._bar.set_postfix(act=self.n_saved, refresh=False)
+
+    # ── pipeline parse ─────────────────────────────────────────────
+    def _submit_parse(self, drv: webdriver.Chrome, task: Tuple[str, str, Optional[str], int]) -> None:
+        _, ath_id, act_id, _ = task
+        t0 = time.monotonic()
+        html_source, captured = fetch_activity_bundle(
+            drv, ath_id, act_id,
+            wait=self.args.wait,
+            use_cdp=self.args.use_cdp,
+            cdp_capture=self.args.cdp_capture,
+        )
+        page_sec = time.monotonic() - t0
+        STATS.observe("activity.page", page_sec)
+        n_bytes = page_bytes(drv)
+        if n_bytes is not None:
+            STATS.observe("activity.kb", n_bytes / 1024)
+        self._parse_slots.acquire()          # antrian parse penuh → worker ini menunggu (backpressure)
+        try:
+            fut = self._parser.submit(parse_bundle, ath_id, act_id, html_source, captured)
+        except BaseException:
+            self._parse_slots.release()
+            raise
+        fut.add_done_callback(lambda f: self._parsed(f, task, page_sec))
+
+    def _parsed(self, fut: Future, task: Tuple[str, str, Optional[str], int], page_sec: float) -> None:
+        # dipanggil dari thread internal ProcessPoolExecutor
+        _, ath_id, act_id, _ = task
+        try:
+            try:
+                payload, row, tier, parse_sec = fut.result()
+            except (Exception, CancelledError) as e:
+                print(f"[!] Error parse {act_id}: {e!r}", file=sys.stderr)
+                self.state.record("activity", ath_id, act_id, "fail", "parse_error", repr(e))
+                return
+            STATS.observe("activity.parse", parse_sec)
+            STATS.incr(f"tier.{tier}")
+            if not payload:
+                print(f"[!] payload kosong {act_id}")
+                status = "empty_payload"
+            elif not _owned_by(payload, ath_id, act_id):
+                status = "mismatch"
+            else:
+                self.save(ath_id, act_id, payload, row)
+                print(f"[DB] activity {act_id} ⇒ antre DB ({page_sec:.1f}s)")
+                status = "ok"
+            self._activity_done(ath_id, act_id, status)
+        except Exception as e:
+            print(f"[!] Gagal simpan {act_id}: {e}", file=sys.stderr)
+            self.state.record("activity", ath_id, act_id, "fail", _reason(e), str(e))
+        finally:
+            self._parse_slots.release()
+            self._finish(task)
+
+    def _worker(self, wid: int) -> None:
+        mgr = DriverManager(
+            lambda slot: self._start_driver(wid, slot),
+            recycle_pages=self.args.recycle_pages,
+            max_rss_mb=self.args.max_driver_mb,
+            spare=self.args.warm_spare,
+        )
+        fails = 0
+        try:
+            while not self._stop.is_set():
+                task = self._next_task()
+                if task is None:
+                    return
+                kind, ath_id, act_id, tries = task
+                try:
+                    # health check / daur ulang tepat sebelum navigasi
+                    drv = mgr.get()
+                    fails = 0
+                except Exception as e:
+                    fails += 1
+                    print(f"[!] Worker {wid}: {e}", file=sys.stderr)
+                    self._push([task])           # kembalikan ke antrian untuk worker lain
+                    self._finish(task)
+                    if fails >= self.max_start_fail:
+                        print(f"[!] Worker {wid} berhenti.", file=sys.stderr)
+                        return
+                    time.sleep(2 * fails)
+                    continue
+                deferred = False
+                try:
+                    if kind == "ath":
+                        self._do_athlete(drv, ath_id, tries)
+                    else:
+                        deferred = self._do_activity(drv, ath_id, act_id, tries)
+                    mgr.page_done()
+                except Exception as e:
+                    item = ath_id if kind == "ath" else act_id
+                    print(f"[!] Worker {wid}: Chrome mati saat {kind} {item} ({e.__class__.__name__}), membangun ulang …", file=sys.stderr)
+                    mgr.discard()
+                    self.state.record(
+                        "athlete" if kind == "ath" else "activity", ath_id, act_id,
+                        "fail", "driver_crash", str(e),
+                    )
+                    if tries < 1:
+                        self._push([(kind, ath_id, act_id, tries + 1)])
+                    elif kind == "ath":
+                        self._mark_failed(ath_id)
+                finally:
+                    if not deferred:             # selain itu _finish dipanggil _parsed()
+                        self._finish(task)
+        finally:
+            mgr.close()
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def run(self, athlete_ids: Iterable[str], *, total: Optional[int] = None, desc: str = "Scraping athletes") -> None:
+        self._src = iter(athlete_ids)
+        self._bar = tqdm(total=total, desc=desc, unit="athlete", ncols=80, leave=True)
+        threads = [
+            threading.Thread(target=self._worker, args=(wid,), name=f"chrome-{wid}", daemon=True)
+            for wid in range(1, self.n_workers + 1)
+        ]
+        for t in threads:
+            t.start()
+        try:
+            for t in threads:
+                while t.is_alive():
+                    t.join(0.5)   # join bertahap agar Ctrl-C tetap tertangkap
+        except KeyboardInterrupt:
+            print("\n[!] Dihentikan, menunggu worker menutup Chrome …", file=sys.stderr)
+            self.stop()
+            for t in threads:
+                t.join(timeout=self.args.wait + 5)
+            raise
+        finally:
+            if self._parser is not None:
+                self._parser.shutdown(wait=True)     # tunggu halaman yang masih diparse
+            self._bar.close()
+            for path in self._profiles.values():
+                shutil.rmtree(path, ignore_errors=True)
+            with self._cond:
+                left = len(self._tasks)
+            if left and not self._stop.is_set():
+                print(f"[!] {left} tugas tidak terselesaikan (semua worker berhenti).", file=sys.stderr)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Engine HTTP: fetch HTML mentah dengan cookie sesi Chrome
+# ──────────────────────────────────────────────────────────────────────────────
+try:
+    import aiohttp
+    from yarl import URL
+except ImportError:          # opsional, hanya untuk --engine http
+    aiohttp = None
+
+def export_session(args: argparse.Namespace) -> Tuple[List[Dict[str, Any]], str]:
+    """Buka Chrome dengan --chrome-profile sekali saja untuk mengambil cookie login + user-agent."""
+    drv = build_chrome(
+        headless=True,
+        profile=args.chrome_profile,
+        chrome_bin=args.chrome_binary,
+    )
+    try:
+        drv.get(f"{STRAVA_URL}/dashboard")
+        WebDriverWait(drv, args.wait).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
+        )
+        if "/login" in drv.current_url:
+            print("[!] Profil Chrome belum login Strava; engine HTTP akan banyak fallback.", file=sys.stderr)
+        ua = drv.execute_script("return navigator.userAgent").replace("HeadlessChrome", "Chrome")
+        return drv.get_cookies(), ua
+    finally:
+        drv.quit()
+
+class HttpEngine:
+    """
+    Ambil /athletes/<id> dan /activities/<id> lewat satu ClientSession
+    (koneksi keep-alive di-pool) dengan konkurensi terbatas, lalu ekstrak
+    secara statis. Item yang tidak bisa diekstrak tanpa JS dikumpulkan
+    untuk diproses ulang oleh Selenium.
+    """
+
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        save: Callable[[str, str, Dict[str, Any]], None],
+        cookies: List[Dict[str, Any]],
+        user_agent: str,
+        state: Optional[RunState] = None,
+        on_athlete_done: Optional[Callable[[str, bool], None]] = None,
+    ):
+        self.args = args
+        self.save = save
+        self.state = state or RunState()
+        self.on_athlete_done = on_athlete_done
+        self.cookies = cookies
+        self.user_agent = user_agent
+        self.concurrency = max(1, args.http_concurrency)
+        self.fallback_athletes: List[str] = []
+        self.fallback_activities: List[Tuple[str, str]] = []
+        self.n_saved = 0
+
+    async def _fetch(self, session: "aiohttp.ClientSession", path: str, stage: str) -> str:
+        if LIMITER is not None:
+            await asyncio.get_running_loop().run_in_executor(None, LIMITER.acquire)
+        t0 = time.monotonic()
+        async with session.get(f"{STRAVA_URL}{path}") as resp:
+            html = await resp.text(errors="replace")
+            final_url = str(resp.url)
+            status = resp.status
+        STATS.observe(stage, time.monotonic() - t0)
+        if "/login" in final_url:
+            return ""          # sesi kadaluarsa → biar Selenium yang ambil
+        _check_throttle(html, status)
+        return html
+
+    async def _athlete(self, session, ath_id: str) -> None:
+        self.state.record("athlete", ath_id, None, "start")
+        try:
+            html = await self._fetch(session, f"/athletes/{ath_id}", "http.athlete")
+        except ScrapeError:
+            self.fallback_athletes.append(ath_id)
+            return
+        try:
+            items = profile_ids_from_html(
+                html, self.args.per_athlete, after=self.state.after(ath_id), athlete_id=ath_id,
+                summaries=self.args.summary_only,
+            ) if html else None
+        except ScrapeError as e:
+            print(f"[!] Gagal ambil recent {ath_id}: {e}", file=sys.stderr)
+            self.state.record("athlete", ath_id, None, "fail", e.reason, str(e))
+            self.state.visited(ath_id, reason=e.reason)
+            self._done(ath_id, False)
+            return
+        # setelah _check_profile (di profile_ids_from_html); throttle dicek _fetch
+        _cache_put("athlete", ath_id, html, ath_id=ath_id)
+        if items is None:
+            self.fallback_athletes.append(ath_id)
+            return
+        self.state.visited(ath_id, [it.act_id for it in items])
+        act_ids = self.state.filter_new(ath_id, [it.act_id for it in items])
+        self.state.record("athlete", ath_id, None, "ok", detail=f"{len(act_ids)} baru")
+        if self.args.summary_only:
+            n_feed, act_ids = store_summaries(ath_id, items, act_ids, self.save, self.state)
+            self.n_saved += n_feed
+        n_fallback = 0       # per atlet: list fallback dipakai bersama antar-coroutine
+        for i, act_id in enumerate(act_ids):
+            self.state.record("activity", ath_id, act_id, "queued")
+            try:
+                if not await self._activity(session, ath_id, act_id):
+                    n_fallback += 1
+            except BaseException:
+                # atlet jatuh ke Selenium → klaim yang belum tuntas dilepas,
+                # kalau tidak filter_new di sana mengembalikan [] untuknya
+                for rest in act_ids[i:]:
+                    self.state.release(rest)
+                raise
+        if not n_fallback:
+            # selesai di sini; kalau ada fallback, pool Selenium yang menuntaskan
+            self._done(ath_id, True)
+
+    def _done(self, ath_id: str, ok: bool) -> None:
+        if self.on_athlete_done is not None:
+            self.on_athlete_done(ath_id, ok)
+
+    async def _activity(self, session, ath_id: str, act_id: str) -> bool:
+        """False bila aktivitas dilempar ke Selenium (fallback)."""
+        try:
+            html = await self._fetch(session, f"/activities/{act_id}", "http.activity")
+        except ScrapeError:          # throttle → Selenium, setelah jeda limiter
+            self.fallback_activities.append((ath_id, act_id))
+            return False
+        _cache_put("activity", act_id, html, ath_id=ath_id)
+        payload = payload_from_html(html) if html else {}
+        if not payload:
+            self.fallback_activities.append((ath_id, act_id))
+            return False
+        if not _owned_by(payload, ath_id, act_id):
+            self.state.release(act_id)
+            self.state.record("activity", ath_id, act_id, "fail", "mismatch")
+            return True
+        self.save(ath_id, act_id, payload)
+        self.state.record("activity", ath_id, act_id, "ok")
+        self.n_saved += 1
+        print(f"[DB] activity {act_id} ⇒ antre DB (http)")
+        return True
+
+    async def _run(self, athlete_ids: Iterable[str], total: Optional[int]) -> None:
+        jar = aiohttp.CookieJar()
+        jar.update_cookies({c["name"]: c["value"] for c in self.cookies}, URL(STRAVA_URL))
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(total=self.args.wait * 3)
+        headers = {"User-Agent": self.user_agent, "Accept-Language": "en-US,en;q=0.9"}
+        src = iter(athlete_ids)
+        src_lock = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        bar = tqdm(total=total, desc="Scraping athletes (http)", unit="athlete", ncols=80, leave=True)
+
+        async with aiohttp.ClientSession(
+            connector=connector, cookie_jar=jar, headers=headers, timeout=timeout,
+        ) as session:
+            async def consumer() -> None:
+                while True:
+                    # iterator bersama; next() bisa memblok (klaim lease) → thread
+                    async with src_lock:
+                        ath_id = await loop.run_in_executor(None, next, src, None)
+                    if ath_id is None:
+                        return
+                    try:
+                        await self._athlete(session, str(ath_id))
+                    except Exception as e:
+                        print(f"[!] HTTP gagal {ath_id}: {e}", file=sys.stderr)
+                        self.fallback_athletes.append(str(ath_id))
+                    bar.update(1)
+                    bar.set_postfix(act=self.n_saved, refresh=False)
+
+            try:
+                await asyncio.gather(*(consumer() for _ in range(self.concurrency)))
+            finally:
+                bar.close()
+
+    def run(self, athlete_ids: Iterable[str], *, total: Optional[int] = None) -> None:
+        asyncio.run(self._run(athlete_ids, total))
+        print(
+            f"[i] Engine HTTP: {self.n_saved} aktivitas tersimpan, fallback Selenium "
+            f"{len(self.fallback_athletes)} atlet + {len(self.fallback_activities)} aktivitas."
+        )
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Replay: ekstraksi ulang dari cache tanpa browser
+# ──────────────────────────────────────────────────────────────────────────────
+def _replay_init(root: str) -> None:
+    # tiap proses membuka index SQLite sendiri (koneksi tidak boleh dibagi antar proses)
+    global PAGE_CACHE
+    PAGE_CACHE = PageCache(root, ttl_days=None, max_mb=None)
+
+def _replay_one(act_id: str) -> Tuple[str, Optional[str], Dict[str, Any]]:
+    hit = PAGE_CACHE.get("activity", act_id) if PAGE_CACHE is not None else None
+    if hit is None:
+        return act_id, None, {}
+    html, captured, ath_id = hit
+    return act_id, ath_id, replay_payload(html, captured)
+
+def replay_cache(
+    cache: PageCache,
+    save: Callable[[str, str, Dict[str, Any]], None],
+    *,
+    athletes: Optional[Iterable[str]] = None,
+    procs: Optional[int] = None,
+) -> Tuple[int, int]:
+    """
+    Jalankan ulang ekstraksi untuk semua halaman aktivitas di cache memakai
+    process pool (parse = CPU-bound). Return (tersimpan, kosong/dilewati).
+    """
+    only = set(map(str, athletes)) if athletes else None
+    todo = [k for k, a in cache.keys("activity") if only is None or a in only]
+    n_ok = n_skip = 0
+    bar = tqdm(total=len(todo), desc="Replay cache", unit="act", ncols=80, leave=True)
+    with ProcessPoolExecutor(max_workers=procs, initializer=_replay_init, initargs=(cache.root,)) as ex:
+        for act_id, ath_id, payload in ex.map(_replay_one, todo, chunksize=16):
+            bar.update(1)
+            if not payload or not ath_id or not _owned_by(payload, ath_id, act_id):
+                n_skip += 1
+                continue
+            save(ath_id, act_id, payload)
+            n_ok += 1
+    bar.close()
+    print(f"[i] Replay: {n_ok} aktivitas diekstrak ulang, {n_skip} dilewati.")
+    return n_ok, n_skip
 
 # ──────────────────────────────────────────────────────────────────────────────
 # MAIN
 # ──────────────────────────────────────────────────────────────────────────────
+def _print_stats() -> None:
+    summary = STATS.summary()
+    if summary:
+        print("[i] Latensi per tahap:")
+        print(summary)
+    for prefix, title in (("tier.", "Tier ekstraksi (Selenium)"), ("http.tier.", "Tier ekstraksi (HTTP)")):
+        tiers = STATS.counts(prefix)
+        n = sum(tiers.values())
+        if n:
+            print(f"[i] {title}: " + ", ".join(
+                f"{k[len(prefix):]}={v} ({v / n:.0%})" for k, v in sorted(tiers.items(), key=lambda kv: -kv[1])
+            ))
+    feed = STATS.counts("summary.")
+    if feed:
+        print(f"[i] --summary-only: {feed.get('summary.hit', 0)} aktivitas dari feed profil, "
+              f"{feed.get('summary.miss', 0)} tetap membuka halaman aktivitas.")
+    planner = TIER_PLANNER.summary()
+    if planner:
+        print(f"[i] Tier fallback (jendela terakhir): {planner}")
+    fails = {k: v for k, v in STATS.counts().items() if ".fail." in k}
+    if fails:
+        print("[i] Gagal per alasan: " + ", ".join(f"{k}={v}" for k, v in sorted(fails.items())))
+    n_ready = STATS.count("activity.ready")
+    if n_ready:
+        # dulu: time.sleep(5) tetap per halaman aktivitas
+        saved = 5 * n_ready - STATS.total("activity.ready")
+        print(f"[i] Hemat ±{saved:.0f}s dibanding sleep tetap 5s ({n_ready} halaman).")
+    n_kb, n_page = STATS.count("activity.kb"), STATS.count("activity.page")
+    if n_kb and n_page:
+        kb = STATS.total("activity.kb")
+        print(f"[i] Rata-rata per aktivitas: {kb / n_kb:.0f} KB, {STATS.total('activity.page') / n_page:.2f}s "
+              f"(total {kb / 1024:.1f} MB).")
+
 def main() -> None:
     ap = argparse.ArgumentParser("Strava scraper + MySQL")
     src = ap.add_mutually_exclusive_group()
@@ -529,39 +4300,218 @@ def main() -> None:
     ap.add_argument("--shard-id", type=int, default=1, help="Bagian yang akan dijalankan oleh PC ini (misal: 1, 2, atau 3).")
     # ------------------------------------
 
+    ap.add_argument("--queue", metavar="RUN_ID",
+                    help="Mode antrian kerja: atlet diklaim per batch dengan lease dari tabel strava_work_queue (pengganti --total-shards).")
+    ap.add_argument("--queue-db", metavar="FILE.sqlite", help="Simpan antrian di SQLite lokal, bukan MySQL (uji lokal).")
+    ap.add_argument("--lease-sec", type=int, default=300, help="Durasi lease per atlet (diperpanjang otomatis).")
+    ap.add_argument("--claim-batch", type=int, default=5, help="Jumlah atlet per klaim.")
+
     ap.add_argument("--per-athlete", type=int, default=1, help="Jumlah aktivitas terbaru per atlet.")
+    ap.add_argument("--workers", type=int, default=1, help="Jumlah Chrome paralel dalam satu proses (tiap worker memakai salinan profil).")
     ap.add_argument("--headless", action="store_true", help="Headless Chrome.")
+    ap.add_argument("--recycle-pages", type=int, default=250, help="Ganti Chrome setiap N halaman (0 = tidak pernah).")
+    ap.add_argument("--max-driver-mb", type=float, default=0,
+                    help="Ganti Chrome bila RSS-nya melebihi N MB (butuh psutil; 0 = nonaktif).")
+    ap.add_argument("--warm-spare", action="store_true",
+                    help="Siapkan satu Chrome cadangan per worker untuk penggantian instan (memori 2x).")
     ap.add_argument("--wait", type=int, default=10, help="Timeout load halaman.")
     ap.add_argument("--chrome-profile", help="Path Chrome profile login Strava.")
     ap.add_argument("--chromedriver", help="Path chromedriver (opsional).")
     ap.add_argument("--chrome-binary", help="Path chrome.exe custom.")
     ap.add_argument("--use-cdp", action="store_true", help="Gunakan fallback CDP.")
+    ap.add_argument("--lean", action="store_true",
+                    help="Profil ringan: pageLoadStrategy eager, blokir gambar/font/peta/analytics lewat CDP.")
+    ap.add_argument("--block-pattern", action="append", metavar="POLA",
+                    help="Tambahan pola URL yang diblokir saat --lean (wildcard '*', boleh berulang).")
+    ap.add_argument("--blocklist-file", metavar="FILE", help="File pola blokir tambahan (satu per baris, '#' = komentar).")
+    ap.add_argument("--cdp-capture", choices=("hook", "log"), default="hook",
+                    help="Cara fallback CDP menangkap respons api/v4/activities: hook fetch/XHR di browser atau performance log (lama).")
+    ap.add_argument("--incremental", action="store_true", help="Lewati aktivitas yang sudah ada di strava_activities.")
+    ap.add_argument("--schedule", action="store_true",
+                    help="Urutkan atlet menurut aktivitas (aktif dulu) dan tunda atlet diam/privat dengan backoff eksponensial.")
+    ap.add_argument("--revisit-base-hours", type=float, default=12,
+                    help="Jeda kunjungan ulang pertama untuk atlet tanpa aktivitas baru / privat (jam, dobel tiap kali).")
+    ap.add_argument("--revisit-max-days", type=float, default=30, help="Batas atas jeda kunjungan ulang (hari).")
+    ap.add_argument("--summary-only", action="store_true",
+                    help="Simpan aktivitas langsung dari ringkasan feed profil; halaman aktivitas hanya dibuka bila field wajib tidak ada.")
+    ap.add_argument("--refresh-older-than", type=float, metavar="HARI",
+                    help="Dengan --incremental: tetap scrape ulang aktivitas yang scraped_at-nya lebih tua dari N hari.")
+    ap.add_argument("--journal", nargs="?", const="scrape_journal.sqlite", default=None, metavar="FILE",
+                    help="Aktifkan jurnal checkpoint append-only (SQLite); tanpa FILE = scrape_journal.sqlite. "
+                         "Default nonaktif, kecuali dengan --resume.")
+    ap.add_argument("--resume", action="store_true", help="Lanjutkan run terakhir di jurnal: lewati yang selesai, ulangi yang gagal.")
+    ap.add_argument("--max-retries", type=int, default=3, help="Batas percobaan ulang per item saat --resume.")
+    ap.add_argument("--retry-reasons", default=",".join(RETRY_REASONS),
+                    help="Alasan gagal yang diulang saat --resume (dipisah koma).")
+    ap.add_argument("--db-batch-size", type=int, default=100, help="Jumlah baris per INSERT multi-baris.")
+    ap.add_argument("--unchanged", choices=("write", "touch", "skip"), default="write",
+                    help="Baris yang content_hash-nya sama: tulis ulang (lama), hanya perbarui scraped_at, atau lewati.")
+    ap.add_argument("--compress-payload", action="store_true",
+                    help="Simpan payload terkompresi (zlib) di kolom payload_z; kolom payload dibiarkan NULL.")
+    ap.add_argument("--db-pool-size", type=int, default=4, help="Jumlah koneksi MySQL dalam pool (lewat satu tunnel SSH).")
+    ap.add_argument("--ndjson-out", metavar="FILE", help="Tulis juga setiap aktivitas ke file NDJSON (append; akhiran .gz = gzip).")
+    ap.add_argument("--parquet-out", metavar="DIR",
+                    help="Tulis juga ke dataset Parquet terpartisi date=/sport= (butuh pyarrow). "
+                         "Footer file ditulis saat file ditutup: bila proses crash, baris yang masih "
+                         "di buffer dan file yang masih terbuka (< --parquet-roll-rows baris per "
+                         "partisi) hilang.")
+    ap.add_argument("--parquet-roll-rows", type=int, default=200000,
+                    help="Tutup file Parquet partisi dan mulai part baru setiap N baris.")
+    ap.add_argument("--parquet-row-group-rows", type=int, default=50000,
+                    help="Buffer baris per partisi dan tulis satu row group setiap N baris (maks. --parquet-roll-rows).")
+    ap.add_argument("--no-db", action="store_true",
+                    help="Tanpa SSH tunnel/MySQL: atlet dari --athletes-file/--athlete-id, hasil hanya ke --ndjson-out/--parquet-out.")
+    ap.add_argument("--db-flush-sec", type=float, default=5.0, help="Flush buffer DB paling lambat tiap N detik.")
+    ap.add_argument("--engine", choices=("selenium", "http"), default="selenium",
+                    help="http = fetch HTML mentah pakai cookie --chrome-profile (butuh aiohttp), fallback ke Selenium.")
+    ap.add_argument("--http-concurrency", type=int, default=16, help="Maksimum request paralel engine HTTP.")
+    ap.add_argument("--rate", type=float, default=0.0,
+                    help="Aktifkan limiter: laju awal request ke Strava (req/s). Default 0 = tanpa limiter.")
+    ap.add_argument("--max-rate", type=float, default=10.0, help="Batas atas laju saat limiter menaikkan laju (AIMD).")
+    ap.add_argument("--rate-burst", type=int, default=3, help="Jumlah request yang boleh dikirim beruntun.")
+    rate_src = ap.add_mutually_exclusive_group()
+    rate_src.add_argument("--rate-file", metavar="FILE", help="Bagi state limiter lewat file terkunci (semua proses di satu mesin).")
+    rate_src.add_argument("--rate-db", action="store_true", help="Bagi state limiter lewat tabel strava_rate_limit (semua mesin/shard).")
+    ap.add_argument("--metrics-file", metavar="FILE.ndjson", help="Tulis setiap timing/penghitung sebagai NDJSON.")
+    ap.add_argument("--metrics-port", type=int, help="Sajikan metrik format Prometheus di http://0.0.0.0:PORT/metrics.")
+    ap.add_argument("--cache-dir", metavar="DIR", help="Simpan page_source mentah (terkompresi) di DIR untuk --replay.")
+    ap.add_argument("--cache-ttl-days", type=float, default=30, help="Umur maksimum entri cache (hari).")
+    ap.add_argument("--cache-max-mb", type=float, default=2048, help="Batas ukuran cache; entri tertua dibuang lebih dulu.")
+    ap.add_argument("--replay", action="store_true",
+                    help="Tanpa browser: ekstrak ulang semua aktivitas di --cache-dir lalu upsert ke DB.")
+    ap.add_argument("--replay-procs", type=int, help="Jumlah proses parse saat --replay (default: jumlah CPU).")
+    ap.add_argument("--parse-procs", type=int, default=0,
+                    help="Pipeline: ekstraksi + metrik di N proses terpisah, Chrome hanya mengambil halaman (0 = di thread worker).")
+    ap.add_argument("--tier-order", choices=("adaptive", "fixed"), default="adaptive",
+                    help="Urutan tier fallback js/regex/cdp: menurut hit-rate terakhir atau urutan tetap lama.")
     args = ap.parse_args()
 
     # --- Validasi Argumen Pembagian ---
     if args.shard_id > args.total_shards or args.shard_id < 1:
         sys.exit("[!] --shard-id harus di antara 1 dan --total-shards.")
+    if args.workers < 1:
+        sys.exit("[!] --workers minimal 1.")
+    if args.queue and args.total_shards > 1:
+        sys.exit("[!] --queue menggantikan --total-shards; pakai salah satu.")
+    if args.resume and not args.journal:
+        args.journal = "scrape_journal.sqlite"       # --resume tanpa path = jurnal default
+    if args.resume and args.queue:
+        sys.exit("[!] Mode --queue sudah menyimpan progres di tabel antrian; --resume tidak diperlukan.")
+    if args.queue_db and not args.queue:
+        sys.exit("[!] --queue-db hanya berlaku bersama --queue.")
+    if args.refresh_older_than is not None and not args.incremental:
+        sys.exit("[!] --refresh-older-than hanya berlaku bersama --incremental.")
+    if args.engine == "http" and aiohttp is None:
+        sys.exit("[!] --engine http membutuhkan paket aiohttp (pip install aiohttp).")
+    if (args.block_pattern or args.blocklist_file) and not args.lean:
+        sys.exit("[!] --block-pattern / --blocklist-file hanya berlaku bersama --lean.")
+    if args.max_driver_mb and psutil is None:
+        sys.exit("[!] --max-driver-mb membutuhkan paket psutil (pip install psutil).")
+    if args.rate < 0:
+        sys.exit("[!] --rate tidak boleh negatif.")
+    if args.rate == 0 and (args.rate_file or args.rate_db):
+        sys.exit("[!] --rate-file / --rate-db butuh --rate > 0.")
+    if args.replay and not args.cache_dir:
+        sys.exit("[!] --replay membutuhkan --cache-dir.")
+    if args.parse_procs < 0:
+        sys.exit("[!] --parse-procs tidak boleh negatif.")
+    if args.parquet_out and pa is None:
+        sys.exit("[!] --parquet-out membutuhkan paket pyarrow (pip install pyarrow).")
+    if args.no_db:
+        if not (args.ndjson_out or args.parquet_out):
+            sys.exit("[!] --no-db membutuhkan --ndjson-out dan/atau --parquet-out.")
+        if not (args.athlete_id or args.athletes_file or args.replay):
+            sys.exit("[!] --no-db membutuhkan --athletes-file atau --athlete-id.")
+        needs_db = [
+            flag for flag, on in (
+                ("--incremental", args.incremental),
+                ("--schedule", args.schedule),
+                ("--unchanged", args.unchanged != "write"),
+                ("--compress-payload", args.compress_payload),
+                ("--rate-db", args.rate_db),
+                ("--queue tanpa --queue-db", args.queue and not args.queue_db),
+            ) if on
+        ]
+        if needs_db:
+            sys.exit(f"[!] --no-db tidak bisa dipakai bersama {', '.join(needs_db)} (butuh MySQL).")
     # ------------------------------------
 
-    with open_tunnel() as tunnel:
-        conn = db_connect(tunnel)
+    TIER_PLANNER.adaptive = args.tier_order == "adaptive"
+
+    if args.metrics_file:
+        STATS.open_ndjson(args.metrics_file)
+    if args.metrics_port:
+        STATS.serve(args.metrics_port)
+        print(f"[i] Metrik Prometheus di :{args.metrics_port}/metrics")
+
+    global PAGE_CACHE
+    if args.cache_dir:
+        PAGE_CACHE = PageCache(args.cache_dir, ttl_days=args.cache_ttl_days, max_mb=args.cache_max_mb)
+        n_pages, n_obj = PAGE_CACHE.evict()
+        if n_pages or n_obj:
+            print(f"[i] Cache: {n_pages} entri kedaluwarsa dibuang, {n_obj} objek dihapus.")
+
+    with (nullcontext() if args.no_db else open_tunnel()) as tunnel:
+        db = None if args.no_db else DbPool(tunnel, size=args.db_pool_size)
+
+        global LIMITER
+        if args.rate > 0 and not args.replay:
+            if args.rate_db:
+                rate_state = DbRateState(db)
+            elif args.rate_file:
+                rate_state = FileRateState(args.rate_file)
+            else:
+                rate_state = None
+            LIMITER = RateLimiter(rate_state, rate=args.rate, max_rate=args.max_rate, burst=args.rate_burst)
+
+        if args.replay:
+            writer = ActivityWriter(db, batch_size=args.db_batch_size, flush_sec=args.db_flush_sec,
+                                    sinks=open_sinks(args))
+            try:
+                replay_cache(PAGE_CACHE, writer.add,
+                             athletes=args.athlete_id or None, procs=args.replay_procs)
+            finally:
+                writer.close()
+                if db is not None:
+                    db.close()
+                PAGE_CACHE.close()
+                STATS.close()
+                print("[✔] Selesai.")
+            return
 
         athlete_ids: List[str] = []
+        stream: Optional[Iterator[str]] = None
+        # shard, jadwal, incremental dan content_hash butuh seluruh daftar di awal
+        needs_list = ((args.total_shards > 1 and not args.queue) or args.schedule
+                      or args.incremental or args.unchanged != "write")
         if args.athlete_id:
             athlete_ids.extend(args.athlete_id)
         elif args.athletes_file and os.path.isfile(args.athletes_file):
             with open(args.athletes_file) as f:
                 athlete_ids.extend([l.strip() for l in f if l.strip().isdigit()])
+        elif args.no_db:
+            sys.exit(f"[!] File atlet {args.athletes_file} tidak ditemukan.")
+        elif needs_list:
+            athlete_ids = db.run(fetch_strava_ids)
         else:
-            athlete_ids = fetch_strava_ids(conn)
+            stream = stream_strava_ids(db)
+            first = next(stream, None)
+            if first is None:
+                sys.exit("[!] Tidak ada atlet (strava_id) ditemukan.")
+            stream = itertools.chain([first], stream)
 
-        if not athlete_ids:
+        if stream is None and not athlete_ids:
             sys.exit("[!] Tidak ada atlet (strava_id) ditemukan.")
 
-        print(f"[i] Total {len(athlete_ids)} atlet ditemukan di database.")
+        if stream is not None:
+            print("[i] Atlet dari database dimuat ringkas (8 byte/ID) dan diteruskan bertahap ke engine.")
+        else:
+            print(f"[i] Total {len(athlete_ids)} atlet ditemukan{'' if args.no_db else ' di database'}.")
 
         # --- LOGIKA PEMBAGIAN BEBAN KERJA ---
-        if args.total_shards > 1:
+        if args.queue:
+            print(f"[i] Mode antrian: run '{args.queue}', atlet dibagi dinamis lewat lease.")
+        elif args.total_shards > 1:
             total_athletes = len(athlete_ids)
             # Menghitung ukuran setiap bagian dan sisa
             chunk_size = total_athletes // args.total_shards
@@ -577,69 +4527,154 @@ def main() -> None:
             print(f"[i] Menjalankan bagian {args.shard_id} dari {args.total_shards}.")
             print(f"[i] PC ini akan memproses {len(processed_ids)} atlet (dari indeks {start_index} sampai {end_index-1}).")
             athlete_ids = processed_ids
-        else:
+        elif stream is None:
             print(f"[i] Memproses semua {len(athlete_ids)} atlet.")
         # ------------------------------------
 
-        if not athlete_ids:
+        if stream is None and not athlete_ids:
             sys.exit("[!] Tidak ada atlet yang perlu diproses untuk bagian ini.")
 
-        drv = build_chrome(
-            headless=args.headless,
-            profile=args.chrome_profile,
-            chrome_bin=args.chrome_binary,
+        state = RunState()
+        retry_acts: List[Tuple[str, str]] = []
+        if args.journal:
+            state.journal = Journal(args.journal, resume=args.resume)
+            if args.resume:
+                seen, retry_ath, retry_acts = state.journal.plan_resume(
+                    max_retries=args.max_retries,
+                    retry_reasons=args.retry_reasons.split(","),
+                )
+                if stream is not None:
+                    stream = (a for a in stream if a not in seen or a in retry_ath)
+                    print(f"[i] Resume run #{state.journal.run_id}: atlet yang selesai dilewati, "
+                          f"{len(retry_ath)} atlet + {len(retry_acts)} aktivitas diulang.")
+                else:
+                    before = len(athlete_ids)
+                    athlete_ids = [a for a in athlete_ids if a not in seen or a in retry_ath]
+                    print(f"[i] Resume run #{state.journal.run_id}: {before - len(athlete_ids)} atlet selesai dilewati, "
+                          f"{len(retry_ath)} atlet + {len(retry_acts)} aktivitas diulang.")
+            else:
+                print(f"[i] Jurnal {args.journal}: run #{state.journal.run_id}.")
+
+        if args.schedule:
+            db.run(ensure_athlete_schedule)
+            state.schedule = db.run(lambda c: load_athlete_schedule(
+                c, athlete_ids, base_hours=args.revisit_base_hours, max_days=args.revisit_max_days,
+            ))
+            athlete_ids, n_later = state.schedule.order(athlete_ids)
+            print(f"[i] Jadwal: {len(athlete_ids)} atlet jatuh tempo (aktif lebih dulu), "
+                  f"{n_later} ditunda sampai jadwal kunjungan berikutnya.")
+            if not athlete_ids:
+                sys.exit("[i] Tidak ada atlet yang jatuh tempo pada run ini.")
+
+        if args.incremental:
+            db.run(ensure_athlete_state)
+            state.known = db.run(lambda c: load_known_activities(
+                c, athlete_ids, refresh_days=args.refresh_older_than,
+            ))
+            state.watermarks = db.run(lambda c: load_watermarks(
+                c, athlete_ids, refresh_days=args.refresh_older_than,
+            ))
+            print(f"[i] Incremental: {len(state.known)} aktivitas sudah ada di DB, "
+                  f"{len(state.watermarks)} atlet punya watermark.")
+
+        hashes: Optional[ContentHashes] = None
+        if args.unchanged != "write" or args.compress_payload:
+            db.run(ensure_activity_columns)
+        if args.unchanged != "write":
+            hashes = db.run(lambda c: load_content_hashes(c, athlete_ids))
+            print(f"[i] {len(hashes)} content_hash dimuat; baris tak berubah → {args.unchanged}.")
+
+        # writer, antrian dan limiter berbagi pool (satu tunnel SSH)
+        writer = ActivityWriter(
+            db,
+            batch_size=args.db_batch_size,
+            flush_sec=args.db_flush_sec,
+            watermarks=args.incremental,
+            hashes=hashes,
+            unchanged=args.unchanged,
+            compress=args.compress_payload,
+            sinks=open_sinks(args),
         )
 
-        try:
-            for ath_id in tqdm(
-                athlete_ids,
-                desc=f"Scraping athletes (Shard {args.shard_id}/{args.total_shards})",
-                unit="athlete",
-                ncols=80,
-                leave=True,
-            ):
-                # ... (sisa loop utama tetap sama) ...
-                try:
-                    act_ids = recent_activity_ids(
-                        drv, ath_id,
-                        limit=args.per_athlete,
-                        wait=args.wait,
-                    )
-                except Exception as e:
-                    print(f"[!] Gagal ambil recent {ath_id}: {e}", file=sys.stderr)
-                    continue
+        def _save(ath_id: str, act_id: str, payload: Dict[str, Any], row: Optional[Tuple] = None) -> None:
+            writer.add(ath_id, act_id, payload, row)
+            state.mark_saved(ath_id, act_id)
 
-                for act_id in tqdm(
-                    act_ids,
-                    desc=f"Ath {ath_id}",
-                    unit="act",
-                    ncols=70,
-                    leave=False,
-                ):
-                    try:
-                        drv.get(f"https://www.strava.com/activities/{act_id}")
-                        payload = get_activity_payload(
-                            drv, act_id, wait=args.wait, use_cdp=args.use_cdp
-                        )
-                        if not payload:
-                            print(f"[!] payload kosong {act_id}")
-                            continue
+        queue: Optional[LeaseQueue] = None
 
-                        pl_ath = str(
-                            payload.get("athlete", {}).get("id") or
-                            payload.get("athlete_id", "")
-                        )
-                        if pl_ath and pl_ath != str(ath_id):
-                            print(f"[!] Skip {act_id}: milik atlet {pl_ath}, bukan {ath_id}")
-                            continue
-                        
-                        save_activity(conn, ath_id, act_id, payload)
-                        print(f"[DB] activity {act_id} ⇒ DB OK")
-                    except Exception as e:
-                        print(f"[!] Error scrape {act_id}: {e}", file=sys.stderr)
+        def on_done(ath_id: str, ok: bool) -> None:
+            if ok:
+                state.record("athlete", ath_id, None, "done")
+            if queue is not None:
+                queue.complete(ath_id, ok)
+
+        source: Iterable[str] = athlete_ids if stream is None else stream
+        total: Optional[int] = len(athlete_ids) if stream is None else None
+        desc = f"Scraping athletes (Shard {args.shard_id}/{args.total_shards})"
+        if args.queue:
+            if args.queue_db:
+                queue = LeaseQueue(open_queue_db(args.queue_db), args.queue, sqlite=True,
+                                   lease_sec=args.lease_sec, batch=args.claim_batch)
+            else:
+                queue = LeaseQueue(db, args.queue,
+                                   lease_sec=args.lease_sec, batch=args.claim_batch)
+            queue.ensure()
+            queue.seed(source)
+            queue.start()
+            source, total, desc = queue, None, f"Scraping athletes (queue {args.queue})"
+
+        def run_once() -> None:
+            pool = ScrapePool(args, _save, n_workers=args.workers, state=state, on_athlete_done=on_done)
+            pool.add_activities(list(retry_acts))
+            retry_acts.clear()
+            fallback: Iterable[str] = source
+            n = total
+            if args.engine == "http":
+                http = HttpEngine(args, _save, cookies, ua, state=state, on_athlete_done=on_done)
+                http.run(source, total=n)
+                # sisa yang butuh render JS → Selenium
+                fallback = http.fallback_athletes
+                n = len(http.fallback_athletes)
+                pool.add_activities(http.fallback_activities)
+
+            if args.engine != "http" or n or pool.has_tasks():
+                if args.workers > 1:
+                    print(f"[i] Menjalankan {args.workers} Chrome paralel.")
+                pool.run(fallback, total=n, desc=desc)
+
+        try:
+            if args.engine == "http":
+                cookies, ua = export_session(args)
+            # --queue: atlet sendiri yang gagal setelah klaim habis diklaim ulang
+            run_until_drained(queue, run_once)
         finally:
-            drv.quit()
-            conn.close()
+            if queue is not None:
+                queue.close()
+                print(f"[i] Status antrian '{args.queue}': {queue.counts()}")
+            if LIMITER is not None:
+                try:
+                    print(f"[i] Laju akhir limiter: {LIMITER.current_rate():.2f} req/s")
+                except Exception:
+                    pass
+                LIMITER.close()
+            writer.close()
+            if state.schedule is not None:
+                try:
+                    n = db.run(state.schedule.save)
+                    print(f"[DB] Jadwal {n} atlet diperbarui.")
+                except Exception as e:
+                    print(f"[!] Gagal menyimpan jadwal atlet: {e}", file=sys.stderr)
+                print(state.schedule.summary())
+            if db is not None:
+                db.close()
+            if state.journal is not None:
+                state.journal.close()
+            if PAGE_CACHE is not None:
+                PAGE_CACHE.close()
+            if state.summary():
+                print(state.summary())
+            _print_stats()
+            STATS.close()
             print("[✔] Selesai.")
 
 if __name__ == "__main__":
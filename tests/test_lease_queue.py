@@ -0,0 +1,52 @@
+"""LeaseQueue (SQLite --queue-db): retry atlet terakhir yang gagal setelah klaim habis."""
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import scrape_strava_db_split as scraper  # noqa: E402
+
+
+def make_queue(tmp_path, ids):
+    queue = scraper.LeaseQueue(scraper.open_queue_db(str(tmp_path / "q.sqlite")), "t", sqlite=True, batch=2)
+    queue.ensure()
+    queue.seed(ids)
+    return queue
+
+
+def test_last_athlete_failing_once_is_retried(tmp_path):
+    queue = make_queue(tmp_path, ["1", "2", "3"])
+    tries = Counter()
+
+    def run_once():
+        # seperti worker pool: iterator sudah habis saat atlet terakhir selesai
+        claimed = list(queue)
+        for ath_id in claimed:
+            tries[ath_id] += 1
+            queue.complete(ath_id, ok=not (ath_id == "3" and tries[ath_id] == 1))
+
+    scraper.run_until_drained(queue, run_once)
+    assert tries == {"1": 1, "2": 1, "3": 2}
+    assert queue.counts() == {"done": 3}
+    queue.close()
+
+
+def test_retry_stops_at_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, ["1"])
+    tries = Counter()
+
+    def run_once():
+        for ath_id in list(queue):
+            tries[ath_id] += 1
+            queue.complete(ath_id, ok=False)
+
+    scraper.run_until_drained(queue, run_once)
+    assert tries["1"] == queue.max_attempts
+    assert queue.counts() == {"failed": 1}
+    queue.close()
+
+
+def test_no_queue_runs_once():
+    calls = []
+    scraper.run_until_drained(None, lambda: calls.append(1))
+    assert calls == [1]
@@ -0,0 +1,71 @@
+"""ParquetSink: baris di-buffer per partisi, satu row group per N baris."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import scrape_strava_db_split as scraper  # noqa: E402
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def row(i, date="2024-05-01 07:00:00", sport="Run"):
+    return (i, 42, date, 10000, 50, 3600, 500.0, 80.0, 0, sport, 3700, 360, "6:00 /km", "A", "{}")
+
+
+def parts(root):
+    return sorted(os.path.join(d, f) for d, _, fs in os.walk(root) for f in fs)
+
+
+def test_small_flushes_share_row_groups(tmp_path):
+    sink = scraper.ParquetSink(str(tmp_path), roll_rows=1000, row_group_rows=250)
+    for b in range(20):                       # 20 flush kecil x 20 baris
+        sink.write([row(b * 20 + i) for i in range(20)], [])
+    assert parts(tmp_path)                    # 400 baris >= 250: row group pertama sudah ditulis
+    sink.close()
+    files = parts(tmp_path)
+    assert len(files) == 1
+    meta = pq.ParquetFile(files[0]).metadata
+    assert meta.num_rows == 400
+    assert [meta.row_group(i).num_rows for i in range(meta.num_row_groups)] == [250, 150]
+
+
+def test_roll_and_partitions(tmp_path):
+    sink = scraper.ParquetSink(str(tmp_path), roll_rows=100, row_group_rows=1000)
+    sink.write([row(i) for i in range(150)] + [row(999, sport="Ride")], [])
+    sink.write([row(200 + i) for i in range(10)], [])
+    sink.close()
+    files = parts(tmp_path)
+    assert len(files) == 3
+    assert sum(pq.ParquetFile(f).metadata.num_rows for f in files) == 161
+    assert all(pq.ParquetFile(f).metadata.num_row_groups == 1 for f in files)
+
+
+def test_bad_row_is_not_buffered(tmp_path):
+    sink = scraper.ParquetSink(str(tmp_path), roll_rows=1000, row_group_rows=10)
+    with pytest.raises(Exception):
+        sink.write([row(1), row(2)[:14] + ({"bukan": "string"},)], [])
+    sink.write([row(3)], [])
+    sink.close()
+    assert [pq.read_table(f).column("activity_id").to_pylist() for f in parts(tmp_path)] == [[3]]
+
+
+def test_failed_row_group_stays_buffered(tmp_path, monkeypatch, capsys):
+    sink = scraper.ParquetSink(str(tmp_path), roll_rows=1000, row_group_rows=10)
+    real = scraper.pq.ParquetWriter.write_table
+    calls = []
+
+    def flaky(self, table, **kw):
+        calls.append(table.num_rows)
+        if len(calls) == 1:
+            raise OSError("disk penuh")
+        return real(self, table, **kw)
+
+    monkeypatch.setattr(scraper.pq.ParquetWriter, "write_table", flaky)
+    sink.write([row(i) for i in range(10)], [])   # tidak dilempar: batch sudah di buffer
+    assert "baris tetap di buffer" in capsys.readouterr().err
+    sink.write([row(10 + i) for i in range(5)], [])
+    sink.close()
+    ids = sorted(i for f in parts(tmp_path) for i in pq.read_table(f).column("activity_id").to_pylist())
+    assert ids == list(range(15))
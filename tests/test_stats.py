@@ -0,0 +1,34 @@
+"""Stats: memori per tahap tetap, /metrics berupa histogram Prometheus."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import scrape_strava_db_split as scraper  # noqa: E402
+
+
+def test_stats_bounded_sample_exact_totals():
+    stats = scraper.Stats()
+    n = scraper.STATS_RESERVOIR * 3
+    for i in range(n):
+        stats.observe("activity.page", (i % 100) / 100)
+    assert stats.count("activity.page") == n
+    assert abs(stats.total("activity.page") - sum((i % 100) / 100 for i in range(n))) < 1e-6
+    assert len(stats.values("activity.page")) == scraper.STATS_RESERVOIR
+    assert "n=12288" in stats.summary()
+
+
+def test_stats_prometheus_histogram():
+    stats = scraper.Stats()
+    for v in (0.003, 0.2, 0.2, 7.0, 500.0):
+        stats.observe("activity.get", v)
+    stats.observe("activity.kb", 300)
+    stats.incr("tier.next")
+    text = stats.prometheus()
+    assert "# TYPE strava_stage_seconds histogram" in text
+    assert 'strava_stage_seconds_bucket{stage="activity.get",le="0.005"} 1' in text
+    assert 'strava_stage_seconds_bucket{stage="activity.get",le="0.25"} 3' in text
+    assert 'strava_stage_seconds_bucket{stage="activity.get",le="120"} 4' in text
+    assert 'strava_stage_seconds_bucket{stage="activity.get",le="+Inf"} 5' in text
+    assert 'strava_stage_seconds_count{stage="activity.get"} 5' in text
+    assert 'strava_stage_kilobytes_bucket{stage="activity.kb",le="512"} 1' in text
+    assert 'strava_events_total{event="tier.next"} 1' in text
@@ -0,0 +1,64 @@
+"""Daftar atlet dari DB: jalur stream default main() pada koneksi DictCursor."""
+import os
+import sys
+
+import pymysql as mysql
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import scrape_strava_db_split as scraper  # noqa: E402
+
+
+class FakeCursor:
+    def __init__(self, conn, dict_rows: bool):
+        self.conn = conn
+        self.dict_rows = dict_rows
+        self.rows = []
+
+    def execute(self, sql, params=None):
+        self.conn.n_queries += 1
+        self.rows = [{"strava_id": v} if self.dict_rows else (v,) for v in self.conn.ids]
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    """Meniru pymysql dengan cursorclass=DictCursor seperti DB_BASE_CFG."""
+
+    def __init__(self, ids):
+        self.ids = ids
+        self.n_queries = 0
+
+    def cursor(self, cursor=None):
+        cls = cursor or mysql.cursors.DictCursor
+        return FakeCursor(self, issubclass(cls, mysql.cursors.DictCursorMixin))
+
+
+def test_stream_strava_ids_dict_cursor():
+    conn = FakeConn([10000001, "10000002", 10000003, "abc"])
+    assert list(scraper.stream_strava_ids(conn)) == ["10000001", "10000002", "10000003", "abc"]
+
+
+def test_stream_strava_ids_single_scan():
+    conn = FakeConn(list(range(1, 20001)))
+    ids = scraper.stream_strava_ids(conn)
+    assert next(ids) == "1"
+    assert sum(1 for _ in ids) == 19999
+    assert conn.n_queries == 1
+
+
+def test_stream_strava_ids_compact():
+    conn = FakeConn([5, 7])
+    ids, other = scraper.fetch_strava_ids_compact(conn)
+    assert ids.typecode == "Q" and list(ids) == [5, 7] and other == []
+
+
+def test_fetch_strava_ids_same_order():
+    conn = FakeConn([3, 1, 2])
+    assert scraper.fetch_strava_ids(conn) == ["3", "1", "2"]